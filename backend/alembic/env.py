@@ -8,7 +8,12 @@ from alembic import context
 
 # Import your models here
 from app.models.user import User
+from app.models.note import Note, NoteLink
+from app.models.tag import Tag, note_tags
+from app.models.migration import MigrationCheckpoint
+from app.models.shard import UserShard, IdSequence
 from app.db.database import Base
+from app.db.online_migrations import is_dry_run
 from app.core.config import settings
 
 # this is the Alembic Config object, which provides
@@ -42,12 +47,13 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = settings.DATABASE_URL
+    url = config.attributes.get("database_url", settings.DATABASE_URL)
     context.configure(
         url=url,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
     )
 
     with context.begin_transaction():
@@ -55,7 +61,29 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    dry_run = is_dry_run()
+    if dry_run:
+        # Run everything in one outer transaction and throw it away
+        transaction = connection.begin()
+        if connection.dialect.name == "sqlite":
+            # pysqlite doesn't open a transaction before DDL on its own
+            connection.exec_driver_sql("BEGIN")
+
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite can't ALTER most things in place; recreate tables instead
+        render_as_batch=connection.dialect.name == "sqlite",
+        # Short transactions, so online migrations don't hold locks across revisions
+        transaction_per_migration=True,
+    )
+
+    if dry_run:
+        try:
+            context.run_migrations()
+        finally:
+            transaction.rollback()
+        return
 
     with context.begin_transaction():
         context.run_migrations()
@@ -66,8 +94,8 @@ async def run_async_migrations() -> None:
     and associate a connection with the context.
 
     """
-    configuration = config.get_section(config.config_ini_section)
-    configuration["sqlalchemy.url"] = settings.DATABASE_URL
+    configuration = config.get_section(config.config_ini_section, {})
+    configuration["sqlalchemy.url"] = config.attributes.get("database_url", settings.DATABASE_URL)
     connectable = async_engine_from_config(
         configuration,
         prefix="sqlalchemy.",
@@ -0,0 +1,40 @@
+"""create note links table
+
+Revision ID: 3e7a90b5c4f2
+Revises: 8c2f4e61a9d3
+Create Date: 2026-10-19 11:40:02.517604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e7a90b5c4f2'
+down_revision: Union[str, None] = '8c2f4e61a9d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing notes get their link keys from `python -m app.notes.links`
+    op.add_column('notes', sa.Column('link_key', sa.String(), server_default='', nullable=False))
+    op.create_index('ix_notes_owner_id_link_key', 'notes', ['owner_id', 'link_key'], unique=False)
+    op.create_table('note_links',
+    sa.Column('source_id', sa.Integer(), nullable=False),
+    sa.Column('target_key', sa.String(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['source_id'], ['notes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('source_id', 'target_key')
+    )
+    op.create_index('ix_note_links_owner_id_target_key', 'note_links', ['owner_id', 'target_key', 'source_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_note_links_owner_id_target_key', table_name='note_links')
+    op.drop_table('note_links')
+    op.drop_index('ix_notes_owner_id_link_key', table_name='notes')
+    op.drop_column('notes', 'link_key')
@@ -0,0 +1,33 @@
+"""create migration checkpoints table
+
+Revision ID: b71d2c9e4a05
+Revises: 3e7a90b5c4f2
+Create Date: 2026-10-19 14:21:37.804512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71d2c9e4a05'
+down_revision: Union[str, None] = '3e7a90b5c4f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('migration_checkpoints',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_key', sa.String(), nullable=True),
+    sa.Column('rows_done', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('migration_checkpoints')
@@ -0,0 +1,45 @@
+"""create shard directory tables
+
+Revision ID: d4e8a1f63b27
+Revises: b71d2c9e4a05
+Create Date: 2026-10-19 16:02:11.417385
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8a1f63b27'
+down_revision: Union[str, None] = 'b71d2c9e4a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_shards',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.String(), nullable=False),
+    sa.Column('locked', sa.Boolean(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('id_sequences',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('next_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Continue after the ids already handed out by this database
+    for table in ('notes', 'tags'):
+        op.execute(
+            f"INSERT INTO id_sequences (name, next_id) "
+            f"SELECT '{table}', COALESCE(MAX(id), 0) + 1 FROM {table}"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('id_sequences')
+    op.drop_table('user_shards')
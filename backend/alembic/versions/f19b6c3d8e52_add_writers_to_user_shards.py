@@ -0,0 +1,27 @@
+"""add writers to user shards
+
+Revision ID: f19b6c3d8e52
+Revises: d4e8a1f63b27
+Create Date: 2026-10-19 18:41:27.093518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19b6c3d8e52'
+down_revision: Union[str, None] = 'd4e8a1f63b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user_shards', sa.Column('writers', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user_shards') as batch_op:
+        batch_op.drop_column('writers')
@@ -3,8 +3,14 @@ API v1 router configuration.
 """
 from fastapi import APIRouter
 from .auth import router as auth_router
+from .notes import router as notes_router
+from .profiles import router as profiles_router
+from .batch import router as batch_router
 
 router = APIRouter(prefix="/v1")
 
 # Include routers
 router.include_router(auth_router)
+router.include_router(notes_router)
+router.include_router(profiles_router)
+router.include_router(batch_router)
@@ -1,9 +1,13 @@
 """
 Authentication endpoints for user registration, login, and token management.
 """
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db
+from app.core.serialization import NegotiatedResponse, NegotiatedRoute
+from app.db.database import get_db, get_read_db
+from app.db.sharding import shard_router
 from app.models.user import User
 from app.schemas import (
     Token,
@@ -15,25 +19,37 @@ from app.security import (
     get_password_hash,
     validate_password,
     get_current_user,
-    verify_token
+    verify_token,
+    password_limiter
 )
 from app.auth.jwt import jwt_auth
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["auth"],
+    route_class=NegotiatedRoute,
+    default_response_class=NegotiatedResponse
+)
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(
     user_data: UserCreate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
 ):
     """
     Register a new user.
     """
-    # Check if email already exists
-    query = await db.execute(
+    # Check if email already exists; on a reader, so hashing below never
+    # keeps the single writer connection waiting
+    query = await read_db.execute(
         User.__table__.select().where(User.email == user_data.email)
     )
-    if query.first() is not None:
+    exists = query.first() is not None
+    await read_db.close()
+    if exists:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -48,22 +64,36 @@ async def register(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_limiter.run(get_password_hash, user_data.password)
     db_user = User(
         email=user_data.email,
         hashed_password=hashed_password
     )
     
     db.add(db_user)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Registered concurrently, or not yet visible on the reader
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     await db.refresh(db_user)
+    await db.close()
+    try:
+        await shard_router.place_user(db_user.id, db_user.email)
+    except Exception:
+        # The account exists; the user's first note write finishes placing them
+        logger.exception("Could not place user %s on a shard", db_user.id)
     
     return db_user
 
 @router.post("/login", response_model=Token)
 async def login(
     user_data: UserLogin,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Authenticate user and return tokens.
@@ -114,7 +144,7 @@ async def refresh_token(
 @router.get("/me", response_model=UserResponse)
 async def get_user_info(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get current user information.
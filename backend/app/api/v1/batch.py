@@ -0,0 +1,163 @@
+"""
+Batch endpoint running several API requests in one round trip.
+"""
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote
+import msgpack
+from fastapi import APIRouter, HTTPException, Request, status
+from starlette.types import ASGIApp, Message, Scope
+from app.core.config import settings
+from app.core.serialization import MSGPACK, NegotiatedResponse, NegotiatedRoute
+from app.schemas import BatchRequest, BatchResponse, BatchSubRequest, BatchSubResponse
+from app.schemas.batch import is_batch_path
+from app.security import verify_request_token
+
+router = APIRouter(
+    tags=["batch"],
+    route_class=NegotiatedRoute,
+    default_response_class=NegotiatedResponse
+)
+
+# Sub-requests with these methods may run concurrently; any other method
+# waits for everything before it and runs alone
+CONCURRENT_METHODS = {"GET"}
+
+# Batch headers every sub-request inherits unless it sets its own
+INHERITED_HEADERS = ("authorization", "host", "user-agent")
+
+def _sub_scope(scope: Scope, sub: BatchSubRequest, body: bytes, state: Dict[str, Any]) -> Scope:
+    # Checked again here, so nesting can't slip past the schema
+    if is_batch_path(sub.path):
+        raise ValueError("Batches can't be nested")
+    path, _, query = sub.path.partition("?")
+    headers = {name.lower(): value for name, value in sub.headers.items()}
+
+    batch_headers = {name.decode("latin-1"): value for name, value in scope["headers"]}
+    for name in INHERITED_HEADERS:
+        if name in batch_headers and name not in headers:
+            headers[name] = batch_headers[name].decode("latin-1")
+    if sub.body is not None:
+        headers.setdefault("content-type", "application/json")
+    headers["content-length"] = str(len(body))
+
+    return {
+        "type": "http",
+        "asgi": scope["asgi"],
+        "http_version": scope.get("http_version", "1.1"),
+        "method": sub.method,
+        "scheme": scope.get("scheme", "http"),
+        "path": unquote(path),
+        "raw_path": path.encode(),
+        "root_path": scope.get("root_path", ""),
+        "query_string": query.encode(),
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()],
+        "client": scope.get("client"),
+        "server": scope.get("server"),
+        "state": dict(state),
+    }
+
+def _decode_body(content_type: str, body: bytes) -> Optional[Any]:
+    if not body:
+        return None
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    if content_type.startswith(MSGPACK):
+        return msgpack.unpackb(body)
+    return body.decode("utf-8", errors="replace")
+
+async def dispatch(app: ASGIApp, scope: Scope, sub: BatchSubRequest, state: Dict[str, Any]) -> BatchSubResponse:
+    """
+    Run one sub-request through the full ASGI app, middleware included.
+    """
+    body = b"" if sub.body is None else json.dumps(sub.body).encode()
+    response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+    response_headers: Dict[str, str] = {}
+    chunks: List[bytes] = []
+    complete = asyncio.Event()
+    request_sent = False
+
+    async def receive() -> Message:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Nothing more to read; disconnect only once the response is done
+        await complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        nonlocal response_status
+        if message["type"] == "http.response.start":
+            response_status = message["status"]
+            for name, value in message.get("headers", []):
+                response_headers[name.decode("latin-1")] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                complete.set()
+
+    try:
+        sub_scope = _sub_scope(scope, sub, body, state)
+    except ValueError as exc:
+        return BatchSubResponse(status=status.HTTP_400_BAD_REQUEST, headers={}, body={"detail": str(exc)})
+
+    try:
+        await app(sub_scope, receive, send)
+    except Exception:
+        # The error middleware already sent a 500; don't fail the whole batch
+        if not complete.is_set():
+            response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+            response_headers = {}
+            chunks = []
+    finally:
+        complete.set()
+
+    content = b"".join(chunks)
+    try:
+        decoded = _decode_body(response_headers.get("content-type", ""), content)
+    except (ValueError, msgpack.UnpackException):
+        decoded = content.decode("utf-8", errors="replace")
+
+    return BatchSubResponse(status=response_status, headers=response_headers, body=decoded)
+
+@router.post("/batch", response_model=BatchResponse)
+async def run_batch(batch: BatchRequest, request: Request):
+    """
+    Run a list of API requests and return all their responses.
+    The bearer token is verified once for the whole batch. Each sub-request
+    still passes the rate limiter and is charged like a separate call.
+    Consecutive GETs run concurrently; other methods run in order.
+    """
+    state: Dict[str, Any] = {}
+    authorization = request.headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        token = authorization[7:]
+        payload = verify_request_token(request, token)
+        if payload is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        state["verified_token"] = (token, payload)
+
+    responses: List[Optional[BatchSubResponse]] = [None] * len(batch.requests)
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    async def run(index: int) -> None:
+        async with semaphore:
+            responses[index] = await dispatch(request.app, request.scope, batch.requests[index], state)
+
+    concurrent: List[int] = []
+    for index, sub in enumerate(batch.requests):
+        if sub.method in CONCURRENT_METHODS:
+            concurrent.append(index)
+            continue
+        await asyncio.gather(*(run(i) for i in concurrent))
+        concurrent = []
+        await run(index)
+    await asyncio.gather(*(run(i) for i in concurrent))
+
+    return BatchResponse(responses=responses)
@@ -0,0 +1,305 @@
+"""
+Note endpoints for creating, listing, tagging, and linking notes.
+"""
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.core.serialization import NegotiatedResponse, NegotiatedRoute
+from app.db.sharding import get_shard_db, get_shard_read_db, shard_router
+from app.models.note import Note
+from app.schemas import (
+    NoteCreate,
+    NoteUpdate,
+    NoteResponse,
+    TagFacet,
+    NoteRef,
+    RelatedNote,
+    NoteGraphEdge,
+    NoteGraph
+)
+from app.security import get_current_user
+from app.notes.bodies import note_bodies
+from app.notes.links import link_index
+from app.notes.similarity import similarity_index
+from app.notes.tags import tag_index
+
+router = APIRouter(
+    prefix="/notes",
+    tags=["notes"],
+    route_class=NegotiatedRoute,
+    default_response_class=NegotiatedResponse
+)
+
+# Columns of a note as returned by the API, minus tags
+NOTE_COLUMNS = (Note.id, Note.title, Note.body, Note.created_at, Note.updated_at)
+
+def _note_response(note: Note, body: str, tags: List[str]) -> NoteResponse:
+    return NoteResponse(
+        id=note.id,
+        title=note.title,
+        body=body,
+        tags=tags,
+        created_at=note.created_at,
+        updated_at=note.updated_at
+    )
+
+async def _related_response(
+    db: AsyncSession,
+    owner_id: int,
+    matches: List[Tuple[int, float]]
+) -> List[RelatedNote]:
+    if not matches:
+        return []
+
+    result = await db.execute(
+        select(Note.id, Note.title).where(
+            Note.owner_id == owner_id,
+            Note.id.in_([note_id for note_id, _ in matches])
+        )
+    )
+    titles = dict(result.all())
+
+    return [
+        RelatedNote(id=note_id, title=titles[note_id], score=round(score, 4))
+        for note_id, score in matches
+        if note_id in titles
+    ]
+
+async def _get_owned_note(db: AsyncSession, note_id: int, owner_id: int) -> Note:
+    query = await db.execute(
+        select(Note).where(Note.id == note_id, Note.owner_id == owner_id)
+    )
+    note = query.scalar_one_or_none()
+
+    if note is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found"
+        )
+
+    return note
+
+@router.post("", response_model=NoteResponse, status_code=status.HTTP_201_CREATED)
+async def create_note(
+    note_data: NoteCreate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_db)
+):
+    """
+    Create a new note.
+    """
+    owner_id = int(current_user.get("sub"))
+    note = Note(id=await shard_router.next_id("notes"), owner_id=owner_id, title=note_data.title, body="")
+    db.add(note)
+    await db.flush()
+
+    await note_bodies.save(note, note_data.body)
+    await link_index.update_note(db, note, body=note_data.body)
+    tags = await tag_index.set_note_tags(db, owner_id, note.id, note_data.tags)
+    try:
+        await db.commit()
+    except BaseException:
+        await note_bodies.remove(note.id)
+        raise
+    await db.refresh(note)
+    # Hand the connection back before waiting on the similarity index
+    await db.close()
+    await run_in_threadpool(
+        similarity_index.update_note, owner_id, note.id, f"{note.title}\n{note_data.body}"
+    )
+
+    return _note_response(note, note_data.body, tags)
+
+@router.get("", response_model=List[NoteResponse])
+async def list_notes(
+    tag: List[str] = Query(default=[]),
+    before_id: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_read_db)
+):
+    """
+    List notes, newest first, optionally only those carrying every given tag.
+    """
+    owner_id = int(current_user.get("sub"))
+    query = select(*NOTE_COLUMNS).where(Note.owner_id == owner_id)
+
+    if tag:
+        tagged = await tag_index.filter_notes(db, owner_id, tag)
+        if tagged is None:
+            return NegotiatedResponse([])
+        query = query.where(Note.id.in_(tagged))
+
+    if before_id is not None:
+        query = query.where(Note.id < before_id)
+
+    result = await db.execute(query.order_by(Note.id.desc()).limit(limit))
+    rows = result.all()
+    bodies = await note_bodies.load(rows)
+    tags = await tag_index.get_note_tags(db, [row.id for row in rows])
+
+    # Rows come straight from the table, so skip response model validation
+    return NegotiatedResponse([
+        {**row._mapping, "body": bodies[row.id], "tags": tags[row.id]}
+        for row in rows
+    ])
+
+@router.get("/tags", response_model=List[TagFacet])
+async def get_tag_facets(
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_read_db)
+):
+    """
+    Get the current user's tags with note counts.
+    """
+    owner_id = int(current_user.get("sub"))
+    facets = await tag_index.facets(db, owner_id)
+
+    return NegotiatedResponse([{"name": name, "count": count} for name, count in facets])
+
+@router.get("/similar", response_model=List[RelatedNote])
+async def find_similar_notes(
+    q: str = Query(min_length=1, max_length=10_000),
+    limit: int = Query(default=10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_read_db)
+):
+    """
+    Find the notes most similar to a free-text query.
+    """
+    owner_id = int(current_user.get("sub"))
+    index = await similarity_index.get(db, owner_id)
+
+    # Off the event loop: searches wait while a compaction holds the index lock
+    matches = await run_in_threadpool(index.similar, q, limit)
+
+    return await _related_response(db, owner_id, matches)
+
+@router.get("/{note_id}", response_model=NoteResponse)
+async def get_note(
+    note_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_read_db)
+):
+    """
+    Get a single note.
+    """
+    note = await _get_owned_note(db, note_id, int(current_user.get("sub")))
+    bodies = await note_bodies.load([note])
+    tags = await tag_index.get_note_tags(db, [note.id])
+
+    return _note_response(note, bodies[note.id], tags[note.id])
+
+@router.get("/{note_id}/backlinks", response_model=List[NoteRef])
+async def get_backlinks(
+    note_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_read_db)
+):
+    """
+    Get the notes linking to a note.
+    """
+    note = await _get_owned_note(db, note_id, int(current_user.get("sub")))
+    backlinks = await link_index.backlinks(db, note)
+
+    return [NoteRef(id=source_id, title=title) for source_id, title in backlinks]
+
+@router.get("/{note_id}/related", response_model=List[RelatedNote])
+async def get_related_notes(
+    note_id: int,
+    limit: int = Query(default=10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_read_db)
+):
+    """
+    Get the notes most similar to a note.
+    """
+    owner_id = int(current_user.get("sub"))
+    note = await _get_owned_note(db, note_id, owner_id)
+    index = await similarity_index.get(db, owner_id)
+
+    matches = await run_in_threadpool(index.related, note.id, limit)
+
+    return await _related_response(db, owner_id, matches)
+
+@router.get("/{note_id}/graph", response_model=NoteGraph)
+async def get_note_graph(
+    note_id: int,
+    depth: int = Query(default=1, ge=1, le=3),
+    limit: int = Query(default=50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_read_db)
+):
+    """
+    Get the local link graph around a note.
+    """
+    note = await _get_owned_note(db, note_id, int(current_user.get("sub")))
+    nodes, edges = await link_index.graph(db, note, depth=depth, max_nodes=limit)
+
+    return NoteGraph(
+        nodes=[NoteRef(id=node_id, title=title) for node_id, title in nodes.items()],
+        edges=[NoteGraphEdge(source=source, target=target) for source, target in sorted(edges)]
+    )
+
+@router.patch("/{note_id}", response_model=NoteResponse)
+async def update_note(
+    note_id: int,
+    note_data: NoteUpdate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_db)
+):
+    """
+    Update a note's title, body, or tags.
+    """
+    owner_id = int(current_user.get("sub"))
+    note = await _get_owned_note(db, note_id, owner_id)
+
+    if note_data.body is not None:
+        body = note_data.body
+        await note_bodies.save(note, body)
+    else:
+        body = (await note_bodies.load([note]))[note.id]
+
+    if note_data.title is not None:
+        note.title = note_data.title
+    if note_data.title is not None or note_data.body is not None:
+        await link_index.update_note(db, note, body=body)
+
+    if note_data.tags is not None:
+        tags = await tag_index.set_note_tags(db, owner_id, note.id, note_data.tags)
+    else:
+        tags = (await tag_index.get_note_tags(db, [note.id]))[note.id]
+
+    await db.commit()
+    await db.refresh(note)
+    # Hand the connection back before waiting on the similarity index
+    await db.close()
+    if note_data.title is not None or note_data.body is not None:
+        await run_in_threadpool(
+            similarity_index.update_note, owner_id, note.id, f"{note.title}\n{body}"
+        )
+
+    return _note_response(note, body, tags)
+
+@router.delete("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_note(
+    note_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_shard_db)
+):
+    """
+    Delete a note.
+    """
+    owner_id = int(current_user.get("sub"))
+    note = await _get_owned_note(db, note_id, owner_id)
+
+    await tag_index.remove_note(db, note.id)
+    await link_index.remove_note(db, note.id)
+    await db.delete(note)
+    await db.commit()
+    await note_bodies.remove(note_id)
+    await run_in_threadpool(similarity_index.remove_note, owner_id, note_id)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
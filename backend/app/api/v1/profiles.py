@@ -0,0 +1,84 @@
+"""
+Admin endpoints for downloading request profiles.
+"""
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.profiling import (
+    Profile,
+    profile_store,
+    to_collapsed,
+    to_speedscope,
+    verify_profile_token
+)
+from app.schemas import ProfileSummary
+
+async def require_profile_token(x_profile: Optional[str] = Header(default=None)):
+    """
+    Allow only callers holding a valid signed profiling header.
+    """
+    if x_profile is None or not verify_profile_token(x_profile):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Valid X-Profile header required"
+        )
+
+router = APIRouter(
+    prefix="/admin/profiles",
+    tags=["admin"],
+    dependencies=[Depends(require_profile_token)]
+)
+
+def _get_profile(profile_id: str) -> Profile:
+    profile = profile_store.get(profile_id)
+
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+
+    return profile
+
+@router.get("", response_model=List[ProfileSummary])
+async def list_profiles():
+    """
+    List the stored profiles, newest first.
+    """
+    return [
+        ProfileSummary(
+            id=profile.id,
+            method=profile.method,
+            path=profile.path,
+            status_code=profile.status_code,
+            started_at=datetime.fromtimestamp(profile.started_at, timezone.utc),
+            duration_ms=round(profile.duration * 1000, 3),
+            samples=profile.sample_count
+        )
+        for profile in profile_store.recent()
+    ]
+
+@router.get("/{profile_id}/collapsed", response_class=PlainTextResponse)
+async def download_collapsed(profile_id: str):
+    """
+    Download a profile as collapsed stacks for flame graph tools.
+    """
+    profile = _get_profile(profile_id)
+
+    return PlainTextResponse(
+        to_collapsed(profile),
+        headers={"Content-Disposition": f'attachment; filename="{profile.id}.collapsed.txt"'}
+    )
+
+@router.get("/{profile_id}/speedscope")
+async def download_speedscope(profile_id: str):
+    """
+    Download a profile in speedscope's JSON format.
+    """
+    profile = _get_profile(profile_id)
+
+    return JSONResponse(
+        to_speedscope(profile),
+        headers={"Content-Disposition": f'attachment; filename="{profile.id}.speedscope.json"'}
+    )
@@ -11,7 +11,8 @@ from app.security import (
     verify_password,
     create_access_token,
     create_refresh_token,
-    get_current_user
+    get_current_user,
+    password_limiter
 )
 
 class JWTAuth:
@@ -39,7 +40,7 @@ class JWTAuth:
             return None
             
         # Verify password
-        if not verify_password(password, user.hashed_password):
+        if not await password_limiter.run(verify_password, password, user.hashed_password):
             return None
             
         return user
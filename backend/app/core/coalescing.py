@@ -0,0 +1,189 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+Clients reconnecting after a network blip tend to fire the same GETs at the
+same moment. Requests with the same (user, method, path, query) that arrive
+while one of them is running wait for it and replay a copy of its response
+instead of running their own queries. Only authenticated GETs are coalesced
+and the user is part of the key, so no response ever crosses users.
+
+Errors are never cached, but a failing leader's error is shared with the
+requests waiting on it instead of each of them retrying against a struggling
+database. A leader whose client went away hands over to one of its followers.
+
+Successful responses can also be reused for a short `ttl`; any other request
+by the same user (a write) invalidates their cached and in-flight results, so
+users always read their own writes.
+"""
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.security import verify_request_token
+
+COALESCED_METHODS = {"GET"}
+
+# Request headers the response depends on besides the user, path and query;
+# X-Profile alone authorizes the profile endpoints
+VARY_HEADERS = (b"accept", b"accept-encoding", b"x-profile")
+
+Key = Tuple
+
+class _LeaderGone(Exception):
+    """The leading request was cancelled before it finished its response."""
+
+def _copy(message: Message) -> Message:
+    # Outer middleware may append headers in place; keep every copy separate
+    if message["type"] == "http.response.start":
+        return {**message, "headers": list(message.get("headers", []))}
+    return dict(message)
+
+def _is_complete(messages: List[Message]) -> bool:
+    if not messages or messages[-1]["type"] != "http.response.body":
+        return False
+    return not messages[-1].get("more_body", False)
+
+class CoalescingMiddleware:
+    """
+    Runs one of several identical concurrent GETs by a user and shares its
+    response with the rest; optionally reuses successful responses for `ttl`
+    seconds.
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.app = app
+        self.ttl = settings.COALESCE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or settings.COALESCE_MAX_ENTRIES
+        self.enabled = settings.COALESCE_REQUESTS if enabled is None else enabled
+        self._in_flight: Dict[Key, asyncio.Future] = {}
+        self._results: "OrderedDict[Key, Tuple[float, List[Message]]]" = OrderedDict()
+        # Bumped on each write by a user, retiring their earlier results
+        self._generations: Dict[str, int] = {}
+        self._counter = itertools.count(1)
+
+    def _user(self, scope: Scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                if authorization[:7].lower() != "bearer ":
+                    return None
+                payload = verify_request_token(Request(scope), authorization[7:])
+                return None if not payload or not payload.get("sub") else str(payload["sub"])
+        return None
+
+    def _key(self, scope: Scope, user: str) -> Key:
+        headers = dict(scope["headers"])
+        return (
+            user,
+            self._generations.get(user, 0),
+            scope["method"],
+            scope["path"],
+            scope["query_string"],
+            *(headers.get(name, b"") for name in VARY_HEADERS),
+        )
+
+    def _invalidate(self, user: str) -> None:
+        if len(self._generations) >= self.max_entries:
+            self._generations.clear()
+            self._results.clear()
+        self._generations[user] = next(self._counter)
+
+    def _cached(self, key: Key) -> Optional[List[Message]]:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._results[key]
+            return None
+        return entry[1]
+
+    def _store(self, key: Key, messages: List[Message]) -> None:
+        self._results[key] = (time.monotonic() + self.ttl, messages)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def _replay(self, messages: List[Message], send: Send) -> None:
+        for message in messages:
+            await send(_copy(message))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        user = self._user(scope)
+        if user is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] not in COALESCED_METHODS:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self._invalidate(user)
+            return
+
+        while True:
+            key = self._key(scope, user)
+            messages = self._cached(key)
+            if messages is not None:
+                await self._replay(messages, send)
+                return
+
+            leader = self._in_flight.get(key)
+            if leader is None:
+                break
+            try:
+                # Shielded: a follower giving up must not cancel the leader
+                messages = await asyncio.shield(leader)
+            except _LeaderGone:
+                continue
+            await self._replay(messages, send)
+            return
+
+        await self._lead(key, scope, receive, send)
+
+    async def _lead(self, key: Key, scope: Scope, receive: Receive, send: Send) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        messages: List[Message] = []
+
+        async def record(message: Message) -> None:
+            messages.append(_copy(message))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, record)
+        except BaseException as exc:
+            if _is_complete(messages):
+                future.set_result(messages)
+            elif isinstance(exc, asyncio.CancelledError):
+                future.set_exception(_LeaderGone())
+            else:
+                future.set_exception(exc)
+            raise
+        else:
+            if not _is_complete(messages):
+                # Nothing to share; let the followers run on their own
+                future.set_exception(_LeaderGone())
+                return
+            future.set_result(messages)
+            status = messages[0].get("status", 500)
+            user, generation = key[0], key[1]
+            # Skip results a write by the same user may have overtaken
+            if self.ttl > 0 and 200 <= status < 300 and self._generations.get(user, 0) == generation:
+                self._store(key, messages)
+        finally:
+            del self._in_flight[key]
+            if future.done() and not future.cancelled():
+                future.exception()  # Mark retrieved when nobody was waiting
@@ -2,6 +2,7 @@
 Application configuration settings.
 """
 from typing import Optional
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -19,8 +20,64 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
     # Database
-    DATABASE_URL: Optional[str] = None
+    DATABASE_URL: Optional[str] = None  # Defaults to the embedded SQLite file
     TEST_DATABASE_URL: str = "sqlite+aiosqlite:///:memory:"
+    RUN_MIGRATIONS_ON_STARTUP: Optional[bool] = None  # Defaults to on in embedded mode
+    SEED_SNAPSHOT_DIR: str = "data/snapshots"  # Seeded benchmark databases
+    
+    # Sharding
+    SHARD_URLS: list[str] = []  # Databases holding per-user notes; empty keeps them in DATABASE_URL
+    SHARD_DIRECTORY_TTL: float = 5.0  # Seconds a cached directory entry is trusted
+    SHARD_ID_BLOCK_SIZE: int = 100  # Note and tag ids reserved per sequence update
+    
+    # Embedded SQLite mode (portable desktop build)
+    EMBEDDED_DATABASE_PATH: str = "data/noteko.db"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # Bytes
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # Page cache per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_READER_POOL_SIZE: int = 4
+    
+    # Online migrations
+    MIGRATION_BATCH_SIZE: int = 1000  # Rows per backfill batch
+    MIGRATION_MAX_REPLICATION_LAG: float = 1.0  # Seconds before backfills back off
+    MIGRATION_MAX_QUERY_LATENCY: float = 0.05  # Seconds for the probe query
+    MIGRATION_BATCH_PAUSE: float = 0.0  # Seconds between batches
+    
+    # Admission control
+    RATE_LIMIT_CALLS: int = 60  # Budget units per period, per IP and per user
+    RATE_LIMIT_PERIOD: int = 60  # Seconds
+    PASSWORD_HASH_CONCURRENCY: int = 4  # Concurrent bcrypt operations
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    PASSWORD_HASH_TIMEOUT: float = 5.0  # Seconds to wait for a bcrypt slot
+    
+    # Password policy
+    PASSWORD_MIN_LENGTH: int = 8
+    PASSWORD_MAX_LENGTH: Optional[int] = None
+    PASSWORD_REQUIRED_CLASSES: list[str] = ["upper", "lower", "digit", "special"]
+    
+    # Batch requests
+    BATCH_MAX_REQUESTS: int = 20  # Sub-requests per batch
+    BATCH_CONCURRENCY: int = 4  # Sub-requests of a batch in flight at once
+    
+    # Request coalescing
+    COALESCE_REQUESTS: bool = True  # Share one run among a user's identical concurrent GETs
+    COALESCE_TTL: float = 0.0  # Seconds a successful response is reused; 0 only joins requests in flight
+    COALESCE_MAX_ENTRIES: int = 10_000  # Cached responses kept
+    
+    # Request profiling
+    PROFILER_SAMPLE_RATE: float = 0.0  # Fraction of requests profiled without the admin header
+    PROFILER_INTERVAL: float = 0.002  # Seconds between stack samples
+    PROFILER_BUFFER_SIZE: int = 50  # Finished profiles kept for download
+    PROFILER_TOKEN_TTL: int = 900  # Seconds a signed profiling header stays valid
+    
+    # Note body storage
+    BODY_STORE: Optional[str] = None  # "log" or "memory"; unset keeps bodies in the notes table
+    BODY_STORE_PATH: str = "data/bodies"
+    BODY_STORE_SEGMENT_SIZE: int = 64 * 1024 * 1024  # Bytes per segment file
+    BODY_STORE_FSYNC: bool = True
+    
+    # Related notes
+    SIMILARITY_INDEX_DIR: str = "data/similarity"
     
     # CORS
     ALLOWED_ORIGINS: list[str] = ["*"]
@@ -30,6 +87,13 @@ class Settings(BaseSettings):
         env_file_encoding="utf-8",
         case_sensitive=True
     )
+    
+    @model_validator(mode="after")
+    def default_to_embedded_database(self) -> "Settings":
+        """Use the embedded SQLite file when no database URL is configured."""
+        if not self.DATABASE_URL:
+            self.DATABASE_URL = f"sqlite+aiosqlite:///{self.EMBEDDED_DATABASE_PATH}"
+        return self
 
 # Global settings instance
 settings = Settings()
@@ -0,0 +1,113 @@
+"""
+Response serialization with content negotiation.
+
+Responses are encoded with orjson, or with msgpack when the client's Accept
+header prefers it, and msgpack request bodies are accepted wherever JSON is.
+Endpoints returning large lists can hand `NegotiatedResponse` plain row
+mappings directly, skipping FastAPI's validation and encoding of the return
+value.
+"""
+from contextvars import ContextVar
+from datetime import date, datetime, time
+from typing import Any, Callable, Coroutine, Optional
+import msgpack
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = {MSGPACK, "application/x-msgpack"}
+
+# Response format chosen for the request being handled
+_response_format: ContextVar[str] = ContextVar("response_format", default=JSON)
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Pick JSON or msgpack for an Accept header, honouring q-values.
+    Anything without an explicit preference for msgpack gets JSON.
+    """
+    if not accept or "msgpack" not in accept:
+        return JSON
+
+    best, best_quality = JSON, 0.0
+    for media_range in accept.split(","):
+        media_type, *params = media_range.strip().split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.strip().lower()
+        if media_type in MSGPACK_TYPES:
+            media_type = MSGPACK
+        elif media_type not in (JSON, "application/*", "*/*"):
+            continue
+        if quality > best_quality:
+            best, best_quality = (MSGPACK if media_type == MSGPACK else JSON), quality
+    return best
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        text = value.isoformat()
+        # Same as pydantic and orjson's OPT_UTC_Z: a zero UTC offset is "Z"
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return jsonable_encoder(value)
+
+class NegotiatedResponse(JSONResponse):
+    """
+    JSON response encoded with orjson, or msgpack if the client asked for it.
+    The content may hold datetimes and other values orjson encodes natively.
+    """
+    def __init__(self, content: Any, *args, **kwargs):
+        super().__init__(content, *args, **kwargs)
+        self.headers["Vary"] = "Accept"
+
+    def render(self, content: Any) -> bytes:
+        if _response_format.get() == MSGPACK:
+            self.media_type = MSGPACK
+            return msgpack.packb(content, default=_msgpack_default)
+        return orjson.dumps(
+            content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        )
+
+class MsgpackRequest(Request):
+    """
+    Request whose msgpack body is presented to FastAPI as already-parsed JSON.
+    """
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body())
+        return self._json
+
+class NegotiatedRoute(APIRoute):
+    """
+    Route that decodes msgpack request bodies and picks the response format
+    from the Accept header. Pair with `NegotiatedResponse` as response class.
+    """
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type in MSGPACK_TYPES:
+                # FastAPI only parses bodies it takes for JSON
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (name, b"application/json" if name == b"content-type" else value)
+                    for name, value in request.scope["headers"]
+                ]
+                request = MsgpackRequest(scope, request.receive)
+
+            token = _response_format.set(negotiate(request.headers.get("accept")))
+            try:
+                return await handler(request)
+            finally:
+                _response_format.reset(token)
+
+        return negotiated_handler
@@ -1,9 +1,88 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from pathlib import Path
+from typing import Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+ALEMBIC_DIR = Path(__file__).resolve().parents[2] / "alembic"
+
+def is_embedded(url: str) -> bool:
+    """
+    Check whether a database URL points at a local SQLite file.
+    """
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+def _sqlite_pragmas(read_only: bool):
+    """
+    Build a connect hook tuning each SQLite connection for concurrent WAL access.
+    """
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")  # Negative = KiB
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return set_pragmas
+
+def create_engines(url: str) -> Tuple[AsyncEngine, AsyncEngine]:
+    """
+    Create the (writer, reader) engines.
+    In embedded mode all writes go through a single connection, so concurrent
+    writers queue for it in order instead of contending for SQLite's file lock,
+    while reads spread over a pool of read-only WAL connections.
+    Otherwise both are the same engine.
+    """
+    if not is_embedded(url):
+        engine = create_async_engine(url, echo=True)
+        return engine, engine
+
+    Path(make_url(url).database).parent.mkdir(parents=True, exist_ok=True)
+    writer = create_async_engine(
+        url,
+        echo=True,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+    )
+    reader = create_async_engine(
+        url,
+        echo=True,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.SQLITE_READER_POOL_SIZE,
+        max_overflow=0
+    )
+    event.listen(writer.sync_engine, "connect", _sqlite_pragmas(read_only=False))
+    event.listen(reader.sync_engine, "connect", _sqlite_pragmas(read_only=True))
+    return writer, reader
+
+def run_migrations(url: Optional[str] = None) -> None:
+    """
+    Upgrade the database to the latest Alembic revision.
+    Blocking; call it from a worker thread inside the event loop.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    config.attributes["database_url"] = url or settings.DATABASE_URL
+    command.upgrade(config, "head")
+
+engine, read_engine = create_engines(settings.DATABASE_URL)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+ReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -13,3 +92,13 @@ async def get_db():
             yield session
         finally:
             await session.close()
+
+async def get_read_db():
+    """
+    Session for read-only endpoints; uses the reader pool in embedded mode.
+    """
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
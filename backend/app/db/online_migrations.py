@@ -0,0 +1,340 @@
+"""
+Online data migrations.
+
+Helpers for Alembic migrations that must run against a live database:
+keyset-chunked backfills that commit batch by batch, throttle on replication
+lag or query latency, and resume from a checkpoint table after an interruption,
+plus concurrent index builds on Postgres.
+
+A backfill belongs in a revision of its own. Schema changes before it are
+committed when the backfill starts, so a rerun after an interruption would
+otherwise try to apply them twice. Batch updates must be idempotent, since the
+batch in flight when a run stops is repeated on resume.
+
+`alembic -x dry_run=true upgrade head` runs every pending migration in one
+transaction that is rolled back at the end; backfills only report their
+estimated duration and concurrent index builds are skipped.
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.expression import TableClause
+from app.core.config import settings
+from app.models.migration import MigrationCheckpoint
+
+logger = logging.getLogger(__name__)
+
+checkpoints = MigrationCheckpoint.__table__
+
+# Seconds the slowest streaming replica is behind the primary
+REPLICATION_LAG_SQL = text(
+    "SELECT COALESCE(EXTRACT(EPOCH FROM MAX(replay_lag)), 0) FROM pg_stat_replication"
+)
+
+BatchFunction = Callable[[Connection, Any, Any], None]
+
+def _is_autocommit(conn: Connection) -> bool:
+    return conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+
+def _commit(conn: Connection) -> None:
+    # Autocommit connections (Alembic's autocommit_block) commit every statement already
+    if conn.in_transaction() and not _is_autocommit(conn):
+        conn.commit()
+
+class Throttle:
+    """
+    Paces batches so a backfill yields to production traffic.
+    After each batch it waits until replication lag and the latency of a
+    probe query are back under their limits, backing off exponentially.
+    """
+    def __init__(
+        self,
+        max_replication_lag: Optional[float] = None,
+        max_query_latency: Optional[float] = None,
+        pause: Optional[float] = None,
+        max_backoff: float = 30.0,
+        probe: str = "SELECT 1"
+    ):
+        self.max_replication_lag = (
+            settings.MIGRATION_MAX_REPLICATION_LAG if max_replication_lag is None else max_replication_lag
+        )
+        self.max_query_latency = (
+            settings.MIGRATION_MAX_QUERY_LATENCY if max_query_latency is None else max_query_latency
+        )
+        self.pause = settings.MIGRATION_BATCH_PAUSE if pause is None else pause
+        self.max_backoff = max_backoff
+        self.probe = text(probe)
+
+    def replication_lag(self, conn: Connection) -> float:
+        """
+        Measure replication lag in seconds; always 0 outside Postgres.
+        """
+        if conn.dialect.name != "postgresql":
+            return 0.0
+        return float(conn.execute(REPLICATION_LAG_SQL).scalar() or 0.0)
+
+    def query_latency(self, conn: Connection) -> float:
+        """
+        Time the probe query in seconds.
+        """
+        start = time.perf_counter()
+        conn.execute(self.probe).all()
+        return time.perf_counter() - start
+
+    def healthy(self, conn: Connection) -> bool:
+        return (
+            self.replication_lag(conn) <= self.max_replication_lag
+            and self.query_latency(conn) <= self.max_query_latency
+        )
+
+    def wait(self, conn: Connection) -> float:
+        """
+        Sleep between batches; returns the seconds slept.
+        """
+        slept = self.pause
+        if self.pause:
+            time.sleep(self.pause)
+
+        backoff = max(self.pause, 0.1)
+        while not self.healthy(conn):
+            _commit(conn)  # Don't hold a snapshot open while backing off
+            logger.info("Database under load, backing off for %.1fs", backoff)
+            time.sleep(backoff)
+            slept += backoff
+            backoff = min(backoff * 2, self.max_backoff)
+        return slept
+
+@dataclass
+class BackfillEstimate:
+    rows: int
+    batches: int
+    seconds_per_batch: float
+    seconds: float
+
+class Backfill:
+    """
+    Updates a table in key order, one committed batch at a time.
+    Each batch covers the next `batch_size` keys matching `where`; it either
+    sets `values` on them or calls `batch(conn, first_key, last_key)`.
+    The key of the last finished batch is checkpointed under `name`.
+    """
+    def __init__(
+        self,
+        name: str,
+        table: TableClause,
+        values: Optional[Dict[str, Any]] = None,
+        where: Optional[ColumnElement] = None,
+        batch: Optional[BatchFunction] = None,
+        key: str = "id",
+        batch_size: Optional[int] = None,
+        throttle: Optional[Throttle] = None
+    ):
+        if (values is None) == (batch is None):
+            raise ValueError("Give exactly one of values or batch")
+
+        self.name = name
+        self.table = table
+        self.key = table.c[key]
+        self.values = values
+        self.where = where
+        self.batch = batch
+        self.batch_size = batch_size or settings.MIGRATION_BATCH_SIZE
+        self.throttle = throttle or Throttle()
+
+    # Checkpoints
+
+    def load_checkpoint(self, conn: Connection) -> Optional[Dict[str, Any]]:
+        row = conn.execute(
+            select(checkpoints).where(checkpoints.c.name == self.name)
+        ).mappings().first()
+        if row is None:
+            return None
+        checkpoint = dict(row)
+        if checkpoint["last_key"] is not None:
+            checkpoint["last_key"] = json.loads(checkpoint["last_key"])
+        return checkpoint
+
+    def _save_checkpoint(self, conn: Connection, last_key: Any, rows_done: int, completed: bool = False) -> None:
+        values = {
+            "last_key": None if last_key is None else json.dumps(last_key),
+            "rows_done": rows_done,
+            "completed_at": func.now() if completed else None,
+            "updated_at": func.now()
+        }
+        result = conn.execute(
+            update(checkpoints).where(checkpoints.c.name == self.name).values(**values)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(checkpoints).values(name=self.name, **values))
+
+    # Batches
+
+    def _next_keys(self, conn: Connection, after: Any) -> list:
+        query = select(self.key).order_by(self.key).limit(self.batch_size)
+        if after is not None:
+            query = query.where(self.key > after)
+        if self.where is not None:
+            query = query.where(self.where)
+        return conn.execute(query).scalars().all()
+
+    def _apply(self, conn: Connection, first_key: Any, last_key: Any) -> None:
+        if self.batch is not None:
+            self.batch(conn, first_key, last_key)
+            return
+
+        statement = update(self.table).where(self.key.between(first_key, last_key))
+        if self.where is not None:
+            statement = statement.where(self.where)
+        conn.execute(statement.values(**self.values))
+
+    def run(self, conn: Connection) -> int:
+        """
+        Run or resume the backfill to completion.
+        Returns the total number of rows processed, including earlier runs.
+        """
+        checkpoint = self.load_checkpoint(conn)
+        last_key = checkpoint["last_key"] if checkpoint else None
+        rows_done = checkpoint["rows_done"] if checkpoint else 0
+        if checkpoint and checkpoint["completed_at"] is not None:
+            logger.info("Backfill %s already completed (%d rows)", self.name, rows_done)
+            return rows_done
+        if last_key is not None:
+            logger.info("Resuming backfill %s after key %r", self.name, last_key)
+
+        while True:
+            keys = self._next_keys(conn, last_key)
+            if not keys:
+                break
+
+            self._apply(conn, keys[0], keys[-1])
+            last_key = keys[-1]
+            rows_done += len(keys)
+            self._save_checkpoint(conn, last_key, rows_done)
+            _commit(conn)
+            logger.info("Backfill %s: %d rows, last key %r", self.name, rows_done, last_key)
+
+            self.throttle.wait(conn)
+
+        self._save_checkpoint(conn, last_key, rows_done, completed=True)
+        _commit(conn)
+        return rows_done
+
+    def estimate(self, conn: Connection) -> BackfillEstimate:
+        """
+        Estimate the remaining work by timing one batch and rolling it back.
+        Needs a connection in a transaction, not an autocommit one.
+        """
+        if _is_autocommit(conn):
+            raise ValueError("Estimating a backfill needs a transactional connection")
+
+        checkpoint = self.load_checkpoint(conn)
+        if checkpoint and checkpoint["completed_at"] is not None:
+            return BackfillEstimate(rows=0, batches=0, seconds_per_batch=0.0, seconds=0.0)
+        last_key = checkpoint["last_key"] if checkpoint else None
+
+        query = select(func.count()).select_from(self.table)
+        if last_key is not None:
+            query = query.where(self.key > last_key)
+        if self.where is not None:
+            query = query.where(self.where)
+        rows = conn.execute(query).scalar()
+        batches = -(-rows // self.batch_size)
+        if not batches:
+            return BackfillEstimate(rows=0, batches=0, seconds_per_batch=0.0, seconds=0.0)
+
+        transaction = conn.begin_nested() if conn.in_transaction() else conn.begin()
+        try:
+            start = time.perf_counter()
+            keys = self._next_keys(conn, last_key)
+            self._apply(conn, keys[0], keys[-1])
+            seconds_per_batch = time.perf_counter() - start
+        finally:
+            transaction.rollback()
+
+        seconds = batches * (seconds_per_batch + self.throttle.pause)
+        return BackfillEstimate(
+            rows=rows,
+            batches=batches,
+            seconds_per_batch=seconds_per_batch,
+            seconds=seconds
+        )
+
+# Alembic operations
+
+def is_dry_run() -> bool:
+    """
+    Check whether Alembic was invoked with `-x dry_run=true`.
+    """
+    from alembic import context
+
+    return context.get_x_argument(as_dictionary=True).get("dry_run", "").lower() in ("1", "true", "yes")
+
+def run_backfill(backfill: Backfill) -> None:
+    """
+    Run a backfill from an Alembic migration, outside the migration transaction.
+    In a dry run only log its estimated duration.
+    """
+    from alembic import op
+
+    if is_dry_run():
+        estimate = backfill.estimate(op.get_bind())
+        logger.info(
+            "Dry run: backfill %s would update %d rows in %d batches, about %.0fs (%.3fs per batch)",
+            backfill.name, estimate.rows, estimate.batches, estimate.seconds, estimate.seconds_per_batch
+        )
+        return
+
+    with op.get_context().autocommit_block():
+        backfill.run(op.get_bind())
+
+def create_index_concurrently(index_name: str, table_name: str, columns, unique: bool = False) -> None:
+    """
+    Build an index without blocking writes on Postgres.
+    An invalid index left by an interrupted concurrent build is dropped and rebuilt.
+    Other databases build it normally.
+    """
+    from alembic import op
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.create_index(index_name, table_name, columns, unique=unique)
+        return
+    if is_dry_run():
+        logger.info("Dry run: skipping concurrent build of index %s on %s", index_name, table_name)
+        return
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        valid = bind.execute(
+            text(
+                "SELECT i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ),
+            {"name": index_name}
+        ).scalar()
+        if valid:
+            return
+        if valid is not None:
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
+        op.create_index(index_name, table_name, columns, unique=unique, postgresql_concurrently=True)
+
+def drop_index_concurrently(index_name: str, table_name: str) -> None:
+    """
+    Drop an index without blocking writes on Postgres.
+    """
+    from alembic import op
+
+    if op.get_bind().dialect.name != "postgresql":
+        op.drop_index(index_name, table_name=table_name)
+        return
+    if is_dry_run():
+        logger.info("Dry run: skipping concurrent drop of index %s", index_name)
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,490 @@
+"""
+Deterministic synthetic data for benchmarks.
+
+Generates users with a realistic spread of email domains, plus notes of
+realistic length carrying tags and wiki links, and bulk loads them into
+SQLite (executemany in one transaction) or Postgres (COPY). Every user's
+data derives from (seed, user id) alone, so the same seed always produces
+the same database whatever the chunk size or worker count.
+
+All users share the password `SEED_PASSWORD`, hashed once with a fixed salt
+instead of running bcrypt per user.
+
+Seeded databases can be saved as snapshots (SQLite backup files or
+Postgres template databases) and restored in seconds.
+
+Usage: python -m app.db.seed [--users 100000] [--notes-per-user 20] [--seed 1] [--snapshot]
+"""
+import argparse
+import csv
+import io
+import itertools
+import math
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.engine import make_url
+from app.core.config import settings
+from app.db.database import run_migrations
+from app.notes.links import normalize_link_key, parse_links
+from app.security.password import pwd_context
+
+SEED_PASSWORD = "Seed123!@#"
+_SEED_SALT = "NotekoSyntheticUsersSe"  # 22 bcrypt64 characters
+
+START_DATE = datetime(2023, 1, 1)
+
+# Provider domains in rough order of popularity, followed by a long tail
+# of company domains; picked with Zipf-distributed weights
+PROVIDER_DOMAINS = [
+    "gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com",
+    "aol.com", "proton.me", "gmx.de", "live.com", "yandex.ru", "qq.com",
+    "mail.ru", "web.de", "comcast.net", "me.com", "fastmail.com",
+]
+DOMAINS = PROVIDER_DOMAINS + [f"company{rank}.com" for rank in range(20_000)]
+FIRST_NAMES = [
+    "james", "mary", "john", "patricia", "robert", "jennifer", "michael", "linda",
+    "maria", "wei", "yuki", "ahmed", "fatima", "olga", "lucas", "sofia", "mateo",
+    "emma", "noah", "ava", "liam", "mia", "arjun", "priya", "kenji", "anna",
+]
+LAST_NAMES = [
+    "smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis",
+    "rodriguez", "martinez", "wang", "li", "zhang", "kim", "nguyen", "mueller",
+    "schmidt", "rossi", "silva", "santos", "ivanov", "sato", "tanaka", "patel",
+]
+EMAIL_PATTERNS = [
+    "{first}.{last}{number}", "{first}{last}{number}", "{f}{last}{number}",
+    "{first}_{last}{number}", "{first}{number}", "{last}.{first}{number}",
+]
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ra", "shi", "to", "va", "del", "mar", "son", "ti", "qu", "ber", "an", "el"]
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    # SQLAlchemy's SQLite storage format, which Postgres also parses
+    return None if value is None else value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def _zipf_cum_weights(size: int, exponent: float = 1.0) -> List[float]:
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(size)))
+
+def _build_vocabulary(size: int) -> List[str]:
+    rng = random.Random(0)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(_SYLLABLES, k=rng.choice((1, 2, 2, 3, 3, 4)))))
+    return sorted(words, key=lambda word: (len(word), word))
+
+VOCABULARY = _build_vocabulary(20_000)
+VOCABULARY_WEIGHTS = np.array(_zipf_cum_weights(len(VOCABULARY)))
+DOMAIN_WEIGHTS = _zipf_cum_weights(len(DOMAINS), exponent=1.2)
+TAG_WORDS = VOCABULARY[:400]
+TAG_WEIGHTS = _zipf_cum_weights(len(TAG_WORDS))
+
+@dataclass(frozen=True)
+class SeedConfig:
+    users: int = 10_000
+    notes_per_user: float = 20.0  # Mean; per-user counts are lognormal
+    seed: int = 1
+    chunk_size: int = 2_000  # Users generated and loaded per batch
+
+    @property
+    def name(self) -> str:
+        """Snapshot name identifying the generated data."""
+        return f"seed{self.seed}-u{self.users}-n{self.notes_per_user:g}"
+
+@dataclass
+class Chunk:
+    """
+    Rows for a range of users. Note and tag ids are local to the chunk
+    and offset when loading.
+    """
+    users: List[tuple]
+    notes: List[tuple]
+    tags: List[tuple]
+    note_tags: List[tuple]
+    note_links: List[tuple]
+
+def seed_password_hash() -> str:
+    """
+    Hash `SEED_PASSWORD` once, with the app's bcrypt settings and a fixed salt.
+    """
+    return pwd_context.handler().using(salt=_SEED_SALT).hash(SEED_PASSWORD)
+
+def _words(rng: np.random.Generator, count: int) -> List[str]:
+    # Vectorized Zipf sampling; the bulk of generation time otherwise
+    indices = np.searchsorted(VOCABULARY_WEIGHTS, rng.random(count) * VOCABULARY_WEIGHTS[-1], side="right")
+    return [VOCABULARY[index] for index in indices.tolist()]
+
+def _email(rng: random.Random, user_id: int) -> str:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    local = rng.choice(EMAIL_PATTERNS).format(first=first, last=last, f=first[0], number=user_id)
+    domain = rng.choices(DOMAINS, cum_weights=DOMAIN_WEIGHTS)[0]
+    return f"{local}@{domain}"
+
+def _body(rng: random.Random, word_rng: np.random.Generator, titles: Sequence[str]) -> str:
+    # Median around 90 words, with a long tail of long notes
+    words = _words(word_rng, max(3, int(rng.lognormvariate(4.5, 0.8))))
+    if titles and rng.random() < 0.3:
+        for _ in range(rng.randint(1, 3)):
+            words.insert(rng.randrange(len(words) + 1), f"[[{rng.choice(titles)}]]")
+
+    paragraphs = []
+    while words:
+        size = rng.randint(20, 80)
+        paragraphs.append(" ".join(words[:size]).capitalize() + ".")
+        words = words[size:]
+    return "\n\n".join(paragraphs)
+
+def generate_user(config: SeedConfig, user_id: int) -> Tuple[tuple, List[dict]]:
+    """
+    Generate one user row and their notes, from (seed, user id) alone.
+    """
+    rng = random.Random(f"{config.seed}:{user_id}")
+    word_rng = np.random.default_rng([config.seed, user_id])
+    created_at = START_DATE + timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+    user = (user_id, _email(rng, user_id), True, _timestamp(created_at), None)
+
+    # Lognormal note counts with the configured mean
+    sigma = 1.0
+    mu = math.log(max(config.notes_per_user, 0.01)) - sigma ** 2 / 2
+    note_count = min(int(rng.lognormvariate(mu, sigma)), int(config.notes_per_user * 50) + 1)
+    user_tags = sorted(set(rng.choices(TAG_WORDS, cum_weights=TAG_WEIGHTS, k=rng.randint(3, 15))))
+
+    notes = []
+    titles: List[str] = []
+    note_time = created_at
+    for _ in range(note_count):
+        title = " ".join(_words(word_rng, rng.randint(1, 6))).capitalize()
+        body = _body(rng, word_rng, titles)
+        note_time += timedelta(seconds=rng.randint(60, 7 * 24 * 3600))
+        updated_at = note_time + timedelta(hours=rng.randint(0, 48)) if rng.random() < 0.4 else None
+        tags = sorted(set(rng.sample(user_tags, rng.randint(0, min(3, len(user_tags))))))
+        notes.append({
+            "title": title,
+            "body": body,
+            "tags": tags,
+            "created_at": _timestamp(note_time),
+            "updated_at": _timestamp(updated_at)
+        })
+        titles.append(title)
+    return user, notes
+
+def generate_chunk(config: SeedConfig, first_user_id: int) -> Chunk:
+    """
+    Generate the rows for users `first_user_id` up to the next chunk boundary.
+    """
+    last_user_id = min(first_user_id + config.chunk_size, config.users + 1)
+    chunk = Chunk(users=[], notes=[], tags=[], note_tags=[], note_links=[])
+
+    for user_id in range(first_user_id, last_user_id):
+        user, notes = generate_user(config, user_id)
+        chunk.users.append(user)
+        tag_ids: Dict[str, int] = {}
+        tag_counts: Dict[str, int] = {}
+
+        for note in notes:
+            note_id = len(chunk.notes)
+            chunk.notes.append((
+                note_id, user_id, note["title"], normalize_link_key(note["title"]),
+                note["body"], note["created_at"], note["updated_at"]
+            ))
+            for name in note["tags"]:
+                if name not in tag_ids:
+                    tag_ids[name] = len(chunk.tags) + len(tag_ids)
+                tag_counts[name] = tag_counts.get(name, 0) + 1
+                chunk.note_tags.append((tag_ids[name], note_id))
+            for target_key in sorted(parse_links(note["body"])):
+                chunk.note_links.append((note_id, target_key, user_id))
+
+        for name, tag_id in tag_ids.items():
+            chunk.tags.append((tag_id, user_id, name, tag_counts[name]))
+    return chunk
+
+def generate(config: SeedConfig, workers: int = 1) -> Iterator[Chunk]:
+    """
+    Generate all chunks in user order, in parallel worker processes if asked.
+    """
+    starts = range(1, config.users + 1, config.chunk_size)
+    if workers <= 1:
+        yield from map(partial(generate_chunk, config), starts)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(partial(generate_chunk, config), starts)
+
+# Loading
+
+TABLES = {
+    "users": ("id", "email", "hashed_password", "is_active", "created_at", "updated_at"),
+    "notes": ("id", "owner_id", "title", "link_key", "body", "created_at", "updated_at"),
+    "tags": ("id", "owner_id", "name", "note_count"),
+    "note_tags": ("tag_id", "note_id"),
+    "note_links": ("source_id", "target_key", "owner_id"),
+}
+
+# Continue the shard id sequences after the loaded ids, like the migration
+# creating them does for existing rows
+ADVANCE_ID_SEQUENCES = [
+    f"UPDATE id_sequences SET next_id = (SELECT COALESCE(MAX(id), 0) + 1 FROM {table}) "
+    f"WHERE name = '{table}' AND next_id <= (SELECT COALESCE(MAX(id), 0) FROM {table})"
+    for table in ("notes", "tags")
+]
+
+def _chunk_rows(chunk: Chunk, password_hash: str, note_offset: int, tag_offset: int) -> Dict[str, List[tuple]]:
+    return {
+        "users": [(user_id, email, password_hash, active, created, updated)
+                  for user_id, email, active, created, updated in chunk.users],
+        "notes": [(note_id + note_offset, *rest) for note_id, *rest in chunk.notes],
+        "tags": [(tag_id + tag_offset, *rest) for tag_id, *rest in chunk.tags],
+        "note_tags": [(tag_id + tag_offset, note_id + note_offset) for tag_id, note_id in chunk.note_tags],
+        "note_links": [(note_id + note_offset, *rest) for note_id, *rest in chunk.note_links],
+    }
+
+class SQLiteLoader:
+    """
+    Loads rows with executemany inside one transaction, journaling off.
+    """
+    def __init__(self, url: str):
+        self.conn = sqlite3.connect(make_url(url).database, isolation_level=None)
+
+    def count_users(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM users").fetchone()[0]
+
+    def begin(self) -> None:
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("PRAGMA foreign_keys=OFF")
+        # Secondary indexes are cheaper to build once at the end
+        self.indexes = self.conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        ).fetchall()
+        for name, _ in self.indexes:
+            self.conn.execute(f'DROP INDEX "{name}"')
+        self.conn.execute("BEGIN")
+
+    def load(self, table: str, rows: List[tuple]) -> None:
+        columns = TABLES[table]
+        self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows
+        )
+
+    def finish(self) -> None:
+        for sql in ADVANCE_ID_SEQUENCES:
+            self.conn.execute(sql)
+        self.conn.execute("COMMIT")
+        for _, sql in self.indexes:
+            self.conn.execute(sql)
+        self.conn.execute("ANALYZE")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.close()
+
+class PostgresLoader:
+    """
+    Streams rows into Postgres with COPY.
+    """
+    def __init__(self, url: str):
+        import psycopg2
+
+        self.conn = psycopg2.connect(_postgres_dsn(url))
+
+    def count_users(self) -> int:
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM users")
+            return cursor.fetchone()[0]
+
+    def begin(self) -> None:
+        with self.conn.cursor() as cursor:
+            cursor.execute("SET synchronous_commit = off")
+            # Secondary indexes are cheaper to build once at the end
+            cursor.execute(
+                "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+                "WHERE i.schemaname = current_schema() AND i.tablename = ANY(%s) "
+                "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)",
+                (list(TABLES),)
+            )
+            self.indexes = cursor.fetchall()
+            for name, _ in self.indexes:
+                cursor.execute(f'DROP INDEX "{name}"')
+
+    def load(self, table: str, rows: List[tuple]) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["\\N" if value is None else value for value in row])
+        buffer.seek(0)
+        with self.conn.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(TABLES[table])}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+
+    def finish(self) -> None:
+        with self.conn.cursor() as cursor:
+            for _, sql in self.indexes:
+                cursor.execute(sql)
+            for table in ("users", "notes", "tags"):
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT max(id) FROM {table}), 1))"
+                )
+            for sql in ADVANCE_ID_SEQUENCES:
+                cursor.execute(sql)
+        self.conn.commit()
+        self.conn.autocommit = True
+        with self.conn.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.conn.close()
+
+def _postgres_dsn(url: str, database: Optional[str] = None) -> str:
+    url = make_url(url).set(drivername="postgresql")
+    if database is not None:
+        url = url.set(database=database)
+    return url.render_as_string(hide_password=False)
+
+def _loader(url: str):
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return SQLiteLoader(url)
+    if backend == "postgresql":
+        return PostgresLoader(url)
+    raise ValueError(f"Seeding is not supported for {backend}")
+
+def seed(config: SeedConfig, url: Optional[str] = None, workers: int = 1) -> Dict[str, int]:
+    """
+    Migrate an empty database and fill it with generated data.
+    Returns the number of rows loaded per table.
+    """
+    url = url or settings.DATABASE_URL
+    run_migrations(url)
+
+    loader = _loader(url)
+    if loader.count_users():
+        raise ValueError("Database already has users; seed into an empty database")
+
+    password_hash = seed_password_hash()
+    counts = dict.fromkeys(TABLES, 0)
+    loader.begin()
+    for chunk in generate(config, workers):
+        rows = _chunk_rows(chunk, password_hash, counts["notes"] + 1, counts["tags"] + 1)
+        for table in TABLES:
+            loader.load(table, rows[table])
+            counts[table] += len(rows[table])
+    loader.finish()
+    return counts
+
+# Snapshots
+
+def _snapshot_path(name: str) -> Path:
+    return Path(settings.SEED_SNAPSHOT_DIR) / f"{name}.db"
+
+def _snapshot_database(url: str, name: str) -> str:
+    return f"{make_url(url).database}__{name}".replace("-", "_").replace(".", "_")
+
+def _postgres_admin(url: str):
+    import psycopg2
+
+    conn = psycopg2.connect(_postgres_dsn(url, database="postgres"))
+    conn.autocommit = True
+    return conn
+
+def _clone_postgres(url: str, source: str, target: str) -> None:
+    """
+    Create `target` as a copy of `source`; CREATE DATABASE ... TEMPLATE
+    needs every other connection to the source closed.
+    """
+    conn = _postgres_admin(url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                "WHERE datname = %s AND pid <> pg_backend_pid()",
+                (source,)
+            )
+            cursor.execute(f'DROP DATABASE IF EXISTS "{target}" WITH (FORCE)')
+            cursor.execute(f'CREATE DATABASE "{target}" TEMPLATE "{source}"')
+    finally:
+        conn.close()
+
+def snapshot_exists(name: str, url: Optional[str] = None) -> bool:
+    url = url or settings.DATABASE_URL
+    if make_url(url).get_backend_name() == "sqlite":
+        return _snapshot_path(name).exists()
+
+    conn = _postgres_admin(url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (_snapshot_database(url, name),))
+            return cursor.fetchone() is not None
+    finally:
+        conn.close()
+
+def save_snapshot(name: str, url: Optional[str] = None) -> None:
+    """
+    Save the database as a named snapshot.
+    """
+    url = url or settings.DATABASE_URL
+    if make_url(url).get_backend_name() != "sqlite":
+        _clone_postgres(url, make_url(url).database, _snapshot_database(url, name))
+        return
+
+    path = _snapshot_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    with sqlite3.connect(make_url(url).database) as source, sqlite3.connect(path) as target:
+        source.backup(target)
+
+def restore_snapshot(name: str, url: Optional[str] = None) -> None:
+    """
+    Replace the database's contents with a named snapshot.
+    """
+    url = url or settings.DATABASE_URL
+    if make_url(url).get_backend_name() != "sqlite":
+        _clone_postgres(url, _snapshot_database(url, name), make_url(url).database)
+        return
+
+    database = Path(make_url(url).database)
+    database.parent.mkdir(parents=True, exist_ok=True)
+    with sqlite3.connect(_snapshot_path(name)) as source, sqlite3.connect(database) as target:
+        source.backup(target)
+
+def ensure_seeded(config: SeedConfig, url: Optional[str] = None, workers: int = 1) -> None:
+    """
+    Restore the snapshot for `config`, seeding and saving it on first use.
+    """
+    url = url or settings.DATABASE_URL
+    if snapshot_exists(config.name, url):
+        restore_snapshot(config.name, url)
+        return
+    seed(config, url, workers)
+    save_snapshot(config.name, url)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a database with deterministic synthetic data.")
+    parser.add_argument("--users", type=int, default=SeedConfig.users)
+    parser.add_argument("--notes-per-user", type=float, default=SeedConfig.notes_per_user)
+    parser.add_argument("--seed", type=int, default=SeedConfig.seed)
+    parser.add_argument("--url", help="Database URL (defaults to DATABASE_URL)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Generator processes")
+    parser.add_argument("--snapshot", action="store_true", help="Save a snapshot after seeding")
+    parser.add_argument("--restore", action="store_true", help="Restore the snapshot if one exists")
+    args = parser.parse_args()
+
+    config = SeedConfig(users=args.users, notes_per_user=args.notes_per_user, seed=args.seed)
+    start = time.perf_counter()
+    if args.restore and snapshot_exists(config.name, args.url):
+        restore_snapshot(config.name, args.url)
+        print(f"Restored snapshot {config.name} in {time.perf_counter() - start:.1f}s")
+    else:
+        counts = seed(config, args.url, args.workers)
+        print(", ".join(f"{count} {table}" for table, count in counts.items()))
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+        if args.snapshot or args.restore:
+            save_snapshot(config.name, args.url)
+            print(f"Saved snapshot {config.name}")
@@ -0,0 +1,513 @@
+"""
+Horizontal sharding of per-user data.
+
+Users, credentials and the shard directory stay in the main database
+(`DATABASE_URL`). Each user's notes, tags and links live on one of the
+databases in `SHARD_URLS`, next to a copy of the user row their foreign keys
+point at. A new user is placed on a consistent-hash ring and pinned in the
+`user_shards` directory, so adding shards later only changes where new users
+go; existing users change shard only through `ShardRouter.move_user`.
+
+Note and tag ids come from blocks reserved in the main database's
+`id_sequences` table instead of each shard's own sequence, so they are unique
+across shards and rows keep them when their user moves.
+
+With `SHARD_URLS` unset there is a single shard, the main database, and
+requests use the usual sessions.
+
+Usage: python -m app.db.sharding {stats,locate,move,pin} ...
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import delete, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.db.database import (
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    create_engines,
+    engine,
+    get_db,
+    get_read_db,
+    read_engine,
+    run_migrations
+)
+from app.models.note import Note, NoteLink
+from app.models.shard import IdSequence, UserShard
+from app.models.tag import Tag, note_tags
+from app.models.user import User
+from app.security import get_current_user
+
+logger = logging.getLogger(__name__)
+
+MAIN_SHARD = "main"
+
+# Points per shard on the hash ring; more points even out the share of users
+RING_VNODES = 64
+
+# Rows copied per insert when moving a user
+MOVE_BATCH_SIZE = 1000
+
+# How long a move waits for writes already in flight, and how often it checks
+MOVE_DRAIN_TIMEOUT = 60.0
+MOVE_DRAIN_INTERVAL = 0.1
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+class HashRing:
+    """
+    Consistent-hash ring mapping user ids to shard names.
+    Adding a shard takes over only the keys falling next to its points.
+    """
+    def __init__(self, nodes: Sequence[str], vnodes: int = RING_VNODES):
+        points = sorted((_hash(f"{node}#{index}"), node) for node in nodes for index in range(vnodes))
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: Any) -> str:
+        index = bisect.bisect(self._keys, _hash(str(key))) % len(self._keys)
+        return self._nodes[index]
+
+@dataclass
+class Shard:
+    name: str
+    url: str
+    engine: AsyncEngine
+    read_engine: AsyncEngine
+    Session: sessionmaker
+    ReadSession: sessionmaker
+
+def _user_tables(user_id: int) -> List[Tuple[Any, Any]]:
+    # A user's rows on their shard, parents before children
+    notes = Note.__table__
+    return [
+        (User.__table__, User.id == user_id),
+        (Tag.__table__, Tag.owner_id == user_id),
+        (notes, notes.c.owner_id == user_id),
+        (note_tags, note_tags.c.note_id.in_(select(notes.c.id).where(notes.c.owner_id == user_id))),
+        (NoteLink.__table__, NoteLink.owner_id == user_id),
+    ]
+
+class ShardRouter:
+    """
+    Routes each user to the shard holding their notes.
+    Directory entries are cached for `directory_ttl` seconds, so other
+    processes notice a move within that time; `move_user` waits it out.
+    """
+    def __init__(
+        self,
+        urls: Optional[Sequence[str]] = None,
+        directory: Optional[sessionmaker] = None,
+        read_directory: Optional[sessionmaker] = None,
+        directory_ttl: Optional[float] = None,
+        id_block_size: Optional[int] = None
+    ):
+        urls = settings.SHARD_URLS if urls is None else urls
+        self.enabled = bool(urls)
+        self.directory = directory or AsyncSessionLocal
+        self.read_directory = read_directory or (directory if directory else ReadSessionLocal)
+        self.directory_ttl = settings.SHARD_DIRECTORY_TTL if directory_ttl is None else directory_ttl
+        self.id_block_size = id_block_size or settings.SHARD_ID_BLOCK_SIZE
+
+        self.shards: Dict[str, Shard] = {}
+        if self.enabled:
+            for index, url in enumerate(urls):
+                writer, reader = create_engines(url)
+                self.shards[f"shard{index}"] = Shard(
+                    f"shard{index}", url, writer, reader,
+                    sessionmaker(writer, class_=AsyncSession, expire_on_commit=False),
+                    sessionmaker(reader, class_=AsyncSession, expire_on_commit=False)
+                )
+        else:
+            self.shards[MAIN_SHARD] = Shard(
+                MAIN_SHARD, settings.DATABASE_URL, engine, read_engine, AsyncSessionLocal, ReadSessionLocal
+            )
+        self.ring = HashRing(list(self.shards))
+
+        self._entries: Dict[int, Tuple[str, bool, float]] = {}  # user id -> (shard, locked, expiry)
+        self._placed: Set[int] = set()  # users known to have a directory entry
+        self._id_blocks: Dict[str, Tuple[int, int]] = {}  # table -> (next id, end of block)
+        self._id_lock = asyncio.Lock()
+
+    async def locate(self, user_id: int, fresh: bool = False) -> Tuple[str, bool]:
+        """
+        Return the user's shard name and whether they are being moved.
+        """
+        if not self.enabled:
+            return MAIN_SHARD, False
+
+        now = time.monotonic()
+        cached = self._entries.get(user_id)
+        if cached is not None and cached[2] > now and not fresh:
+            return cached[0], cached[1]
+
+        async with self.read_directory() as session:
+            result = await session.execute(
+                select(UserShard.shard, UserShard.locked).where(UserShard.user_id == user_id)
+            )
+            row = result.first()
+        shard, locked = (row.shard, bool(row.locked)) if row else (self.ring.node_for(user_id), False)
+
+        if len(self._entries) >= 100_000:
+            self._entries.clear()
+        self._entries[user_id] = (shard, locked, now + self.directory_ttl)
+        return shard, locked
+
+    async def place_user(self, user_id: int, email: str) -> str:
+        """
+        Pin a new user to a shard and create the copy of their user row there.
+        Safe to repeat for a user whose placement was interrupted.
+        """
+        if not self.enabled:
+            return MAIN_SHARD
+
+        shard = self.ring.node_for(user_id)
+        async with self.shards[shard].Session() as session:
+            exists = await session.execute(select(User.id).where(User.id == user_id))
+            if exists.first() is None:
+                try:
+                    await session.execute(
+                        insert(User).values(id=user_id, email=email, hashed_password="", is_active=True)
+                    )
+                    await session.commit()
+                except IntegrityError:
+                    # Placed concurrently by another request
+                    await session.rollback()
+        # Pin only once the shard has the user, so the entry never points at a missing row
+        await self._set_entry(user_id, shard, locked=False)
+        return shard
+
+    async def ensure_placed(self, user_id: int) -> None:
+        """
+        Finish placing a user whose registration failed after their account
+        was created but before they were pinned to a shard.
+        """
+        if not self.enabled or user_id in self._placed:
+            return
+
+        async with self.directory() as session:
+            entry = await session.execute(select(UserShard.user_id).where(UserShard.user_id == user_id))
+            if entry.first() is not None:
+                self._remember_placed(user_id)
+                return
+            email = (await session.execute(select(User.email).where(User.id == user_id))).scalar_one_or_none()
+        if email is not None:
+            logger.warning("Placing user %s left unplaced by registration", user_id)
+            await self.place_user(user_id, email)
+
+    def _remember_placed(self, user_id: int) -> None:
+        if len(self._placed) >= 100_000:
+            self._placed.clear()
+        self._placed.add(user_id)
+
+    async def next_id(self, table: str) -> Optional[int]:
+        """
+        Next id for a row of a sharded table, or None to let the database pick
+        one when sharding is off.
+        """
+        if not self.enabled:
+            return None
+
+        async with self._id_lock:
+            next_id, end = self._id_blocks.get(table, (0, 0))
+            if next_id >= end:
+                end = await self._reserve_ids(table)
+                next_id = end - self.id_block_size
+            self._id_blocks[table] = (next_id + 1, end)
+            return next_id
+
+    async def _reserve_ids(self, table: str) -> int:
+        # Returns the end of a freshly reserved block of ids
+        async with self.directory() as session:
+            result = await session.execute(
+                update(IdSequence)
+                .where(IdSequence.name == table)
+                .values(next_id=IdSequence.next_id + self.id_block_size)
+                .returning(IdSequence.next_id)
+            )
+            end = result.scalar_one_or_none()
+            if end is None:
+                end = 1 + self.id_block_size
+                await session.execute(insert(IdSequence).values(name=table, next_id=end))
+            await session.commit()
+        return end
+
+    async def advance_ids(self, table: str, max_id: int) -> None:
+        """
+        Make sure ids handed out for a table start after `max_id`, for rows
+        loaded with explicit ids.
+        """
+        async with self._id_lock:
+            async with self.directory() as session:
+                result = await session.execute(
+                    update(IdSequence)
+                    .where(IdSequence.name == table, IdSequence.next_id <= max_id)
+                    .values(next_id=max_id + 1)
+                )
+                if result.rowcount == 0:
+                    exists = await session.execute(select(IdSequence.name).where(IdSequence.name == table))
+                    if exists.first() is None:
+                        await session.execute(insert(IdSequence).values(name=table, next_id=max_id + 1))
+                await session.commit()
+            # Blocks reserved before may overlap the loaded ids
+            self._id_blocks.pop(table, None)
+
+    async def query_all(self, query: Callable[[AsyncSession], Awaitable[Any]]) -> Dict[str, Any]:
+        """
+        Run an admin query on every shard in parallel.
+        `query` gets a read session and returns that shard's result.
+        """
+        async def run(shard: Shard) -> Any:
+            async with shard.ReadSession() as session:
+                return await query(session)
+
+        results = await asyncio.gather(*(run(shard) for shard in self.shards.values()))
+        return dict(zip(self.shards, results))
+
+    async def begin_write(self, user_id: int) -> Optional[str]:
+        """
+        Register a write request by the user and return their shard, or None
+        while they are being moved. Pair with `end_write`.
+        """
+        async with self.directory() as session:
+            result = await session.execute(
+                update(UserShard)
+                .where(UserShard.user_id == user_id, UserShard.locked.is_(False))
+                .values(writers=UserShard.writers + 1)
+                .returning(UserShard.shard)
+            )
+            shard = result.scalar_one_or_none()
+            await session.commit()
+        return shard
+
+    async def end_write(self, user_id: int) -> None:
+        async with self.directory() as session:
+            await session.execute(
+                update(UserShard)
+                .where(UserShard.user_id == user_id, UserShard.writers > 0)
+                .values(writers=UserShard.writers - 1)
+            )
+            await session.commit()
+
+    async def _drain_writers(self, user_id: int) -> None:
+        # Wait for write requests that got their session before the lock
+        deadline = time.monotonic() + MOVE_DRAIN_TIMEOUT
+        while True:
+            async with self.directory() as session:
+                result = await session.execute(
+                    select(UserShard.writers).where(UserShard.user_id == user_id)
+                )
+                if not result.scalar_one_or_none():
+                    return
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"User {user_id} still has writes in flight")
+            await asyncio.sleep(MOVE_DRAIN_INTERVAL)
+
+    async def move_user(self, user_id: int, target: str) -> None:
+        """
+        Move a user's rows to another shard while the service is running.
+        New writes by the user are refused once the directory entry is
+        locked, and the copy starts only after the writes already in flight
+        have finished; reads keep going to the old shard until the entry
+        flips, and its rows are only deleted once no process can still be
+        reading them. A process that died mid-write leaves its write counted,
+        and moves of that user time out until the entry's `writers` is reset.
+        """
+        if target not in self.shards or not self.enabled:
+            raise ValueError(f"Unknown shard: {target}")
+        source, locked = await self.locate(user_id, fresh=True)
+        if locked:
+            raise RuntimeError(f"User {user_id} is already being moved")
+        if source == target:
+            return
+
+        await self._set_entry(user_id, source, locked=True)
+        try:
+            await self._drain_writers(user_id)
+            rows = await self._copy_rows(user_id, self.shards[source], self.shards[target])
+        except BaseException:
+            await self._set_entry(user_id, source, locked=False)
+            raise
+
+        await self._set_entry(user_id, target, locked=False)
+        logger.info("Moved user %s from %s to %s (%d rows)", user_id, source, target, rows)
+
+        # Stale directory entries may still send reads to the source for a while
+        await asyncio.sleep(self.directory_ttl)
+        async with self.shards[source].Session() as session:
+            for table, where in reversed(_user_tables(user_id)):
+                await session.execute(delete(table).where(where))
+            await session.commit()
+
+    async def _copy_rows(self, user_id: int, source: Shard, target: Shard) -> int:
+        copied = 0
+        async with source.Session() as reader, target.Session() as writer:
+            # Clear what an interrupted earlier move left behind
+            for table, where in reversed(_user_tables(user_id)):
+                await writer.execute(delete(table).where(where))
+            for table, where in _user_tables(user_id):
+                result = await reader.stream(select(table).where(where))
+                async for batch in result.mappings().partitions(MOVE_BATCH_SIZE):
+                    await writer.execute(insert(table), [dict(row) for row in batch])
+                    copied += len(batch)
+            await writer.commit()
+        return copied
+
+    async def _set_entry(self, user_id: int, shard: str, locked: bool) -> None:
+        async with self.directory() as session:
+            result = await session.execute(
+                update(UserShard).where(UserShard.user_id == user_id).values(shard=shard, locked=locked)
+            )
+            if result.rowcount == 0:
+                await session.execute(
+                    insert(UserShard).values(user_id=user_id, shard=shard, locked=locked)
+                )
+            await session.commit()
+        self._entries[user_id] = (shard, locked, time.monotonic() + self.directory_ttl)
+        self._remember_placed(user_id)
+
+    def migrate(self) -> None:
+        """
+        Upgrade every shard to the latest Alembic revision.
+        Blocking; call it from a worker thread inside the event loop.
+        """
+        if self.enabled:
+            for shard in self.shards.values():
+                run_migrations(shard.url)
+
+    async def dispose(self) -> None:
+        if not self.enabled:
+            return
+        for shard in self.shards.values():
+            await shard.engine.dispose()
+            if shard.read_engine is not shard.engine:
+                await shard.read_engine.dispose()
+
+# Create global instance
+shard_router = ShardRouter()
+
+async def get_shard_db(
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Session on the current user's shard, for endpoints writing their notes.
+    """
+    if not shard_router.enabled:
+        yield db
+        return
+
+    user_id = int(current_user.get("sub"))
+    await shard_router.ensure_placed(user_id)
+    # Checked in the directory itself, not the cache, so a move can wait for
+    # every write that got past it
+    shard = await shard_router.begin_write(user_id)
+    if shard is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Notes are being moved, try again shortly",
+            headers={"Retry-After": str(max(1, math.ceil(shard_router.directory_ttl)))},
+        )
+    try:
+        async with shard_router.shards[shard].Session() as session:
+            yield session
+    finally:
+        # Shielded: a cancelled request must still release its write
+        await asyncio.shield(shard_router.end_write(user_id))
+
+async def get_shard_read_db(
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Read-only session on the current user's shard.
+    """
+    if not shard_router.enabled:
+        yield db
+        return
+
+    shard, _ = await shard_router.locate(int(current_user.get("sub")))
+    async with shard_router.shards[shard].ReadSession() as session:
+        yield session
+
+async def shard_stats(router: ShardRouter) -> Dict[str, Dict[str, int]]:
+    """
+    Count users, notes and tags on every shard.
+    """
+    async def count(session: AsyncSession) -> Dict[str, int]:
+        return {
+            name: (await session.execute(select(func.count()).select_from(table))).scalar_one()
+            for name, table in (("users", User.__table__), ("notes", Note.__table__), ("tags", Tag.__table__))
+        }
+
+    return await router.query_all(count)
+
+async def pin_users(router: ShardRouter, shard: str) -> int:
+    """
+    Pin every user without a directory entry to a shard, for deployments
+    whose existing notes were all loaded onto that shard, and move the id
+    sequences past the ids already on it.
+    """
+    if shard not in router.shards:
+        raise ValueError(f"Unknown shard: {shard}")
+    async with router.shards[shard].ReadSession() as session:
+        max_ids = {
+            table: (await session.execute(select(func.max(model.id)))).scalar_one()
+            for table, model in (("notes", Note), ("tags", Tag))
+        }
+    for table, max_id in max_ids.items():
+        if max_id is not None:
+            await router.advance_ids(table, max_id)
+
+    unpinned = select(User.id, literal(shard)).where(
+        ~select(UserShard.user_id).where(UserShard.user_id == User.id).exists()
+    )
+    async with router.directory() as session:
+        result = await session.execute(
+            insert(UserShard).from_select(["user_id", "shard"], unpinned)
+        )
+        await session.commit()
+    return result.rowcount
+
+async def main(args: argparse.Namespace) -> None:
+    router = shard_router
+    try:
+        if args.command == "stats":
+            start = time.perf_counter()
+            for name, counts in (await shard_stats(router)).items():
+                print(f"{name:<10} " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+            print(f"Queried {len(router.shards)} shards in {time.perf_counter() - start:.2f}s")
+        elif args.command == "locate":
+            shard, locked = await router.locate(args.user_id, fresh=True)
+            print(f"{shard} (moving)" if locked else shard)
+        elif args.command == "move":
+            await router.move_user(args.user_id, args.to)
+            print(f"Moved user {args.user_id} to {args.to}")
+        elif args.command == "pin":
+            print(f"Pinned {await pin_users(router, args.shard)} users to {args.shard}")
+    finally:
+        await router.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect shards and move users between them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Count rows on every shard")
+    locate = commands.add_parser("locate", help="Show the shard of a user")
+    locate.add_argument("--user-id", type=int, required=True)
+    move = commands.add_parser("move", help="Move a user's notes to another shard")
+    move.add_argument("--user-id", type=int, required=True)
+    move.add_argument("--to", required=True, help="Target shard name, e.g. shard1")
+    pin = commands.add_parser("pin", help="Pin users without a directory entry to a shard")
+    pin.add_argument("--shard", required=True)
+    asyncio.run(main(parser.parse_args()))
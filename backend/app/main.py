@@ -3,10 +3,18 @@ NoteKo API - Main application entry point.
 """
 import time
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import auth
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from starlette.concurrency import run_in_threadpool
+from app.api.v1 import auth, batch, notes, profiles
+from app.core.coalescing import CoalescingMiddleware
 from app.core.config import settings
+from app.db.database import engine, read_engine, is_embedded, run_migrations
+from app.db.sharding import shard_router
+from app.notes.bodies import note_bodies
+from app.profiling import ProfilerMiddleware
 from app.security.middleware import RateLimitMiddleware
 
 # Configure logging
@@ -20,6 +28,13 @@ app = FastAPI(
     version=settings.VERSION
 )
 
+# Add coalescing of identical concurrent reads
+app.add_middleware(CoalescingMiddleware)
+
+# Add request profiling; just outside the coalescer, so a coalesced request's
+# profile shows it waiting for the identical request it joined
+app.add_middleware(ProfilerMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -34,12 +49,35 @@ app.add_middleware(RateLimitMiddleware)
 
 # Include routers
 app.include_router(auth.router, prefix="/v1")
+app.include_router(notes.router, prefix="/v1")
+app.include_router(profiles.router, prefix="/v1")
+app.include_router(batch.router, prefix="/v1")
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """
+    Answer 503 when no database connection freed up in time.
+    """
+    logger.warning("Database pool exhausted on %s %s", request.method, request.url.path)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, try again shortly"},
+        headers={"Retry-After": "1"}
+    )
 
 @app.on_event("startup")
 async def startup_event():
     """
     Handle application startup events.
     """
+    embedded = is_embedded(settings.DATABASE_URL)
+    run_migrations_on_startup = settings.RUN_MIGRATIONS_ON_STARTUP
+    if run_migrations_on_startup is None:
+        run_migrations_on_startup = embedded
+    if run_migrations_on_startup:
+        await run_in_threadpool(run_migrations)
+        await run_in_threadpool(shard_router.migrate)
+    
     # ASCII art banner
     banner = """
     ███╗   ██╗ ██████╗ ████████╗███████╗██╗  ██╗ ██████╗ 
@@ -55,7 +93,7 @@ async def startup_event():
 {'='*80}
 API Version: {settings.VERSION}
 Environment: {settings.ENVIRONMENT}
-Database: PostgreSQL
+Database: {"SQLite (embedded)" if embedded else engine.dialect.name}
 Authentication: JWT with Rate Limiting
 {'='*80}
 
@@ -72,6 +110,18 @@ API Base URL: http://localhost:8000/v1
 """
     logger.info("\n" + startup_message)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Handle application shutdown events.
+    """
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await shard_router.dispose()
+    if note_bodies.store is not None:
+        await note_bodies.store.close()
+
 @app.get("/")
 async def root():
     """
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, BigInteger, String, DateTime
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class MigrationCheckpoint(Base):
+    __tablename__ = "migration_checkpoints"
+
+    # One row per online backfill, so an interrupted run resumes where it stopped
+    name = Column(String, primary_key=True)
+    last_key = Column(String, nullable=True)  # JSON-encoded key of the last finished batch
+    rows_done = Column(BigInteger, nullable=False, default=0, server_default="0")
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, PrimaryKeyConstraint
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class Note(Base):
+    __tablename__ = "notes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String, nullable=False)
+    # Normalized title that [[wiki links]] resolve against
+    link_key = Column(String, nullable=False, default="", server_default="")
+    body = Column(Text, nullable=False, default="")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # Per-user listing, newest first
+        Index("ix_notes_owner_id_id", "owner_id", "id"),
+        Index("ix_notes_owner_id_link_key", "owner_id", "link_key"),
+    )
+
+# Outgoing [[wiki link]] from a note, stored by target key so links to
+# notes that don't exist yet resolve once the target is created
+class NoteLink(Base):
+    __tablename__ = "note_links"
+
+    source_id = Column(Integer, ForeignKey("notes.id", ondelete="CASCADE"), nullable=False)
+    target_key = Column(String, nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("source_id", "target_key"),
+        # Backlinks of a note: O(degree) lookup by the note's link key
+        Index("ix_note_links_owner_id_target_key", "owner_id", "target_key", "source_id"),
+    )
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class UserShard(Base):
+    __tablename__ = "user_shards"
+
+    # Directory entry pinning a user's notes to one shard; the hash ring only
+    # places users that don't have one yet
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(String, nullable=False)
+    # Set while the user's rows are being moved; their writes are refused meanwhile
+    locked = Column(Boolean, nullable=False, default=False, server_default="0")
+    # Write requests currently holding a session on the user's shard; a move
+    # waits for them to finish before copying
+    writers = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class IdSequence(Base):
+    __tablename__ = "id_sequences"
+
+    # Next free id of a sharded table, so ids stay unique across shards and
+    # rows keep them when a user moves
+    name = Column(String, primary_key=True)
+    next_id = Column(BigInteger, nullable=False)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, Table
+from app.db.database import Base
+
+# Many-to-many link between notes and tags.
+# The (tag_id, note_id) primary key answers "notes with tag X (and Y)";
+# the reverse index answers "tags of note N".
+note_tags = Table(
+    "note_tags",
+    Base.metadata,
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    Column("note_id", Integer, ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_note_tags_note_id_tag_id", "note_id", "tag_id"),
+)
+
+class Tag(Base):
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)
+    # Denormalized number of the owner's notes carrying this tag,
+    # maintained in the same transaction as note writes
+    note_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_tags_owner_id_name", "owner_id", "name", unique=True),
+    )
@@ -0,0 +1,57 @@
+"""
+Note body access through the configured body store.
+"""
+from typing import Dict, Optional, Sequence
+from app.core.config import settings
+from app.models.note import Note
+from app.storage import BodyStore, create_body_store
+
+class NoteBodies:
+    """
+    Reads and writes note bodies either in the notes table or, when a body
+    store is configured, in the store with the table column left empty.
+    Rows written before a store was configured still read from the column.
+    """
+    def __init__(self, store: Optional[BodyStore]):
+        self.store = store
+
+    @staticmethod
+    def key(note_id: int) -> str:
+        return f"note:{note_id}"
+
+    async def load(self, notes: Sequence[Note]) -> Dict[int, str]:
+        """
+        Get the bodies of a batch of notes (or rows with id and body).
+        """
+        if self.store is None:
+            return {note.id: note.body for note in notes}
+
+        values = await self.store.get_many([self.key(note.id) for note in notes])
+        bodies = {}
+        for note in notes:
+            value = values.get(self.key(note.id))
+            bodies[note.id] = note.body if value is None else str(value, "utf-8")
+        return bodies
+
+    async def save(self, note: Note, body: str) -> None:
+        """
+        Store a note's body. The note must already have an id.
+        Call it before committing the note, so a committed note always has
+        its body; a body left behind by a failed commit sits under the note's
+        own key, where the next save overwrites it.
+        """
+        if self.store is None:
+            note.body = body
+        else:
+            await self.store.put(self.key(note.id), body.encode())
+            note.body = ""
+
+    async def remove(self, note_id: int) -> None:
+        """
+        Delete a note's body from the store.
+        """
+        if self.store is not None:
+            await self.store.delete(self.key(note_id))
+
+# Create global instance
+note_bodies = NoteBodies(create_body_store(settings.BODY_STORE))
@@ -0,0 +1,243 @@
+"""
+Link index for [[wiki links]] between notes.
+Edges are parsed on write and diffed against the stored ones,
+so backlink and graph reads never scan note bodies.
+"""
+import argparse
+import asyncio
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.sharding import Shard, shard_router
+from app.models.note import Note, NoteLink
+from app.notes.bodies import note_bodies
+
+MAX_LINK_KEY_LENGTH = 255
+MAX_GRAPH_DEPTH = 3
+MAX_GRAPH_NODES = 200
+
+# [[Title]], [[Title|alias]] and [[Title#heading]] all link to "Title"
+_wiki_link = re.compile(r"\[\[([^\[\]|#\n]+)(?:[|#][^\[\]\n]*)?\]\]")
+_whitespace = re.compile(r"\s+")
+
+def normalize_link_key(title: str) -> str:
+    """
+    Normalize a note title or link target so that links match titles
+    regardless of case and spacing.
+    """
+    return _whitespace.sub(" ", title).strip().casefold()[:MAX_LINK_KEY_LENGTH]
+
+def parse_links(body: str) -> Set[str]:
+    """
+    Extract the normalized link keys referenced by a note body.
+    """
+    if "[[" not in body:
+        return set()
+    return {key for key in map(normalize_link_key, _wiki_link.findall(body)) if key}
+
+class LinkIndex:
+    """
+    Maintains `NoteLink` edges and answers backlink and local graph queries.
+    None of the methods commit; callers commit together with the note write.
+    """
+    async def update_note(
+        self,
+        db: AsyncSession,
+        note: Note,
+        body: Optional[str] = None,
+        current: Optional[Set[str]] = None
+    ) -> None:
+        """
+        Refresh a note's link key and outgoing edges, writing only the edges that changed.
+        The note must already have an id. Pass `body` when it lives in a body store,
+        and `current` when the stored edges are already known to skip loading them.
+        """
+        note.link_key = normalize_link_key(note.title)
+        wanted = parse_links(note.body if body is None else body)
+        wanted.discard(note.link_key)  # Self links are not edges
+
+        if current is None:
+            result = await db.execute(
+                select(NoteLink.target_key).where(NoteLink.source_id == note.id)
+            )
+            current = set(result.scalars().all())
+
+        removed = current - wanted
+        if removed:
+            await db.execute(
+                delete(NoteLink).where(
+                    NoteLink.source_id == note.id,
+                    NoteLink.target_key.in_(removed)
+                )
+            )
+
+        added = wanted - current
+        if added:
+            await db.execute(
+                insert(NoteLink),
+                [
+                    {"source_id": note.id, "target_key": key, "owner_id": note.owner_id}
+                    for key in added
+                ]
+            )
+
+    async def remove_note(self, db: AsyncSession, note_id: int) -> None:
+        """
+        Drop the outgoing edges of a note before it is deleted.
+        """
+        await db.execute(delete(NoteLink).where(NoteLink.source_id == note_id))
+
+    async def backlinks(self, db: AsyncSession, note: Note) -> List[Tuple[int, str]]:
+        """
+        Get (id, title) of the notes linking to a note.
+        """
+        result = await db.execute(
+            select(Note.id, Note.title)
+            .join(NoteLink, NoteLink.source_id == Note.id)
+            .where(
+                NoteLink.owner_id == note.owner_id,
+                NoteLink.target_key == note.link_key
+            )
+            .order_by(Note.id)
+        )
+        return [(note_id, title) for note_id, title in result]
+
+    async def graph(
+        self,
+        db: AsyncSession,
+        note: Note,
+        depth: int = 1,
+        max_nodes: int = 50
+    ) -> Tuple[Dict[int, str], Set[Tuple[int, int]]]:
+        """
+        Breadth-first walk over links in both directions from a note.
+        Returns ({note_id: title}, {(source_id, target_id)}), visiting at most
+        `depth` levels and `max_nodes` notes. Each level costs two indexed queries.
+        """
+        depth = min(depth, MAX_GRAPH_DEPTH)
+        max_nodes = min(max_nodes, MAX_GRAPH_NODES)
+        owner_id = note.owner_id
+
+        nodes: Dict[int, str] = {note.id: note.title}
+        keys: Dict[int, str] = {note.id: note.link_key}
+        edges: Set[Tuple[int, int]] = set()
+        frontier = [note.id]
+
+        for _ in range(depth):
+            if not frontier or len(nodes) >= max_nodes:
+                break
+
+            # Outgoing: edges from the frontier, resolved to existing notes
+            result = await db.execute(
+                select(NoteLink.source_id, Note.id, Note.title, Note.link_key)
+                .join(
+                    Note,
+                    (Note.owner_id == NoteLink.owner_id) & (Note.link_key == NoteLink.target_key)
+                )
+                .where(NoteLink.source_id.in_(frontier))
+            )
+            # (source_id, target_id, neighbour_id, neighbour_title, neighbour_key)
+            found = [
+                (source_id, target_id, target_id, title, key)
+                for source_id, target_id, title, key in result
+            ]
+
+            # Incoming: edges pointing at the frontier's keys; titles aren't
+            # unique, so a key may stand for several frontier notes
+            frontier_keys: Dict[str, List[int]] = {}
+            for note_id in frontier:
+                frontier_keys.setdefault(keys[note_id], []).append(note_id)
+            result = await db.execute(
+                select(NoteLink.target_key, Note.id, Note.title, Note.link_key)
+                .join(Note, Note.id == NoteLink.source_id)
+                .where(
+                    NoteLink.owner_id == owner_id,
+                    NoteLink.target_key.in_(frontier_keys)
+                )
+            )
+            found += [
+                (source_id, target_id, source_id, title, key)
+                for target_key, source_id, title, key in result
+                for target_id in frontier_keys[target_key]
+            ]
+
+            frontier = []
+            for source_id, target_id, neighbour_id, title, key in sorted(found):
+                if neighbour_id not in nodes:
+                    if len(nodes) >= max_nodes:
+                        continue
+                    nodes[neighbour_id] = title
+                    keys[neighbour_id] = key
+                    frontier.append(neighbour_id)
+                edges.add((source_id, target_id))
+
+        edges = {(source, target) for source, target in edges if source in nodes and target in nodes}
+        return nodes, edges
+
+    async def reindex(
+        self,
+        owner_id: Optional[int] = None,
+        chunk_size: int = 500,
+        workers: int = 4
+    ) -> int:
+        """
+        Rebuild link keys and edges for all notes on every shard, in
+        keyset-paginated chunks processed concurrently, each in its own
+        session and transaction. Returns the number of notes processed.
+        """
+        semaphore = asyncio.Semaphore(workers)
+
+        async def process(shard: Shard, first_id: int, last_id: int) -> int:
+            async with semaphore, shard.Session() as db:
+                query = select(Note).where(Note.id >= first_id, Note.id <= last_id)
+                if owner_id is not None:
+                    query = query.where(Note.owner_id == owner_id)
+                notes = (await db.execute(query)).scalars().all()
+
+                # Load the chunk's stored edges in one query
+                current: Dict[int, Set[str]] = defaultdict(set)
+                result = await db.execute(
+                    select(NoteLink.source_id, NoteLink.target_key)
+                    .where(NoteLink.source_id.in_([note.id for note in notes]))
+                )
+                for source_id, target_key in result:
+                    current[source_id].add(target_key)
+
+                bodies = await note_bodies.load(notes)
+                for note in notes:
+                    await self.update_note(db, note, body=bodies[note.id], current=current[note.id])
+                await db.commit()
+                return len(notes)
+
+        # Collect chunk boundaries with an id-only keyset scan
+        chunks: List[Tuple[Shard, int, int]] = []
+        for shard in shard_router.shards.values():
+            async with shard.Session() as db:
+                last_id = 0
+                while True:
+                    query = select(Note.id).where(Note.id > last_id)
+                    if owner_id is not None:
+                        query = query.where(Note.owner_id == owner_id)
+                    ids = (await db.execute(query.order_by(Note.id).limit(chunk_size))).scalars().all()
+                    if not ids:
+                        break
+                    chunks.append((shard, ids[0], ids[-1]))
+                    last_id = ids[-1]
+
+        counts = await asyncio.gather(*(process(*chunk) for chunk in chunks))
+        return sum(counts)
+
+# Create global instance
+link_index = LinkIndex()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the [[wiki link]] index.")
+    parser.add_argument("--user-id", type=int, help="Only reindex notes of this user")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    processed = asyncio.run(link_index.reindex(args.user_id, args.chunk_size, args.workers))
+    print(f"Reindexed links of {processed} note(s)")
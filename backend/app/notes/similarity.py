@@ -0,0 +1,526 @@
+"""
+Offline "related notes" engine using hashed-feature TF-IDF vectors.
+
+Each user gets an index directory holding a compacted base segment as .npy
+files, loaded memory-mapped so a worker restart doesn't rebuild anything,
+plus an append-only log of changes made since the last compaction.
+Scoring is a sparse column slice times the query vector, followed by
+argpartition top-k selection. The index files assume a single worker
+process writes a given user's index.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+import weakref
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import norm as sparse_norm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.sharding import shard_router
+from app.models.note import Note
+from app.notes.bodies import note_bodies
+
+N_FEATURES = 1 << 18
+MAX_QUERY_TERMS = 64
+# Compact once pending changes exceed this share of the base segment
+COMPACT_RATIO = 0.1
+COMPACT_MIN_CHANGES = 1000
+
+STOP_WORDS = frozenset("""
+    a an and are as at be been but by can do for from had has have he her his i if in
+    into is it its me my no not of on or our she so that the their them then there these
+    they this to up us was we were what when which who will with you your
+""".split())
+
+_token = re.compile(r"[^\W_]{2,}")
+
+Features = Tuple[np.ndarray, np.ndarray]  # (feature indices, sublinear term frequencies)
+
+def featurize(text: str) -> Features:
+    """
+    Hash the tokens of a text into sorted feature indices with 1 + log(tf) weights.
+    """
+    tokens = [token for token in _token.findall(text.casefold()) if token not in STOP_WORDS]
+    if not tokens:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+    hashes = np.fromiter(
+        (zlib.crc32(token.encode()) for token in tokens),
+        dtype=np.uint32,
+        count=len(tokens)
+    )
+    features, counts = np.unique(hashes & (N_FEATURES - 1), return_counts=True)
+    return features.astype(np.int32), (1 + np.log(counts)).astype(np.float32)
+
+def _idf(df: np.ndarray, n_docs: int) -> np.ndarray:
+    return (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+class UserIndex:
+    """
+    TF-IDF index over one user's notes.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.delta: Dict[int, Features] = {}  # Rows added since the last compaction
+        self._delta_matrix: Optional[Tuple[np.ndarray, sp.csr_matrix]] = None
+        self._load_base()
+        self._replay_log()
+
+    # Loading and persistence
+
+    def _base_dir(self) -> Optional[Path]:
+        current = self.path / "CURRENT"
+        return self.path / current.read_text().strip() if current.exists() else None
+
+    def _load_base(self) -> None:
+        base = self._base_dir()
+        if base is None:
+            self.doc_ids = np.empty(0, dtype=np.int64)
+            self.tf = sp.csr_matrix((0, N_FEATURES), dtype=np.float32)
+            self.weights = sp.csc_matrix((0, N_FEATURES), dtype=np.float32)
+            self.idf = _idf(np.zeros(N_FEATURES, dtype=np.int32), 0)
+        else:
+            arrays = {
+                name: np.load(base / f"{name}.npy", mmap_mode="r")
+                for name in (
+                    "doc_ids", "idf",
+                    "tf_indptr", "tf_indices", "tf_data",
+                    "w_indptr", "w_indices", "w_data"
+                )
+            }
+            self.doc_ids = arrays["doc_ids"]
+            self.idf = arrays["idf"]
+            shape = (len(self.doc_ids), N_FEATURES)
+            self.tf = sp.csr_matrix(
+                (arrays["tf_data"], arrays["tf_indices"], arrays["tf_indptr"]),
+                shape=shape,
+                copy=False
+            )
+            self.weights = sp.csc_matrix(
+                (arrays["w_data"], arrays["w_indices"], arrays["w_indptr"]),
+                shape=shape,
+                copy=False
+            )
+
+        self.row_of = {int(doc_id): row for row, doc_id in enumerate(self.doc_ids)}
+        self.dead = np.zeros(len(self.doc_ids), dtype=bool)
+        self.df = np.bincount(self.tf.indices, minlength=N_FEATURES).astype(np.int32)
+        self.n_docs = len(self.doc_ids)
+
+    def _log_path(self) -> Path:
+        base = self._base_dir()
+        return self.path / f"{base.name if base else 'empty'}.log"
+
+    def _replay_log(self) -> None:
+        log_path = self._log_path()
+        if not log_path.exists():
+            return
+        with open(log_path) as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Torn write at the end of the log
+                if "features" in entry:
+                    self._add(entry["id"], (
+                        np.asarray(entry["features"], dtype=np.int32),
+                        np.asarray(entry["tf"], dtype=np.float32)
+                    ))
+                else:
+                    self._remove(entry["id"])
+
+    def _append_log(self, entry: dict) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self._log_path(), "a") as log:
+            log.write(json.dumps(entry) + "\n")
+
+    # Updates
+
+    def _add(self, note_id: int, features: Features) -> None:
+        self._remove(note_id)
+        if len(features[0]):
+            self.delta[note_id] = features
+            self.df[features[0]] += 1
+            self.n_docs += 1
+            self._delta_matrix = None
+
+    def _remove(self, note_id: int) -> None:
+        if note_id in self.delta:
+            self.df[self.delta.pop(note_id)[0]] -= 1
+            self.n_docs -= 1
+            self._delta_matrix = None
+        else:
+            row = self.row_of.get(note_id)
+            if row is not None and not self.dead[row]:
+                self.dead[row] = True
+                self.df[self.tf.indices[self.tf.indptr[row]:self.tf.indptr[row + 1]]] -= 1
+                self.n_docs -= 1
+
+    def update(self, note_id: int, text: str) -> None:
+        """
+        Index or re-index a note.
+        """
+        features = featurize(text)
+        with self.lock:
+            self._add(note_id, features)
+            self._append_log({
+                "id": note_id,
+                "features": features[0].tolist(),
+                "tf": features[1].tolist()
+            })
+            self._maybe_compact()
+
+    def remove(self, note_id: int) -> None:
+        """
+        Drop a note from the index.
+        """
+        with self.lock:
+            self._remove(note_id)
+            self._append_log({"id": note_id})
+            self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        pending = len(self.delta) + int(self.dead.sum())
+        if pending > max(COMPACT_MIN_CHANGES, COMPACT_RATIO * len(self.doc_ids)):
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Merge pending changes into a new base segment, re-weighting every row
+        with fresh IDF values, and switch to it atomically.
+        """
+        with self.lock:
+            live = np.flatnonzero(~self.dead)
+            delta_ids = np.fromiter(self.delta, dtype=np.int64, count=len(self.delta))
+            tf = sp.vstack([self.tf[live], self._stack(self.delta.values())], format="csr")
+            doc_ids = np.concatenate([np.asarray(self.doc_ids)[live], delta_ids])
+            tf.sort_indices()
+
+            # L2-normalized TF-IDF rows, stored column-major for scoring
+            idf = _idf(self.df, self.n_docs)
+            weights = tf.copy()
+            weights.data = (tf.data * idf[tf.indices]).astype(np.float32)
+            norms = sparse_norm(weights, axis=1)
+            norms[norms == 0] = 1
+            weights.data /= np.repeat(norms, np.diff(weights.indptr)).astype(np.float32)
+            weights = weights.tocsc()
+
+            old_base = self._base_dir()
+            old_log = self._log_path()
+            version = int(old_base.name.split("-")[1]) + 1 if old_base else 1
+            base = self.path / f"base-{version}"
+            base.mkdir(parents=True, exist_ok=True)
+            for name, array in (
+                ("doc_ids", doc_ids),
+                ("idf", idf),
+                ("tf_indptr", tf.indptr),
+                ("tf_indices", tf.indices),
+                ("tf_data", tf.data.astype(np.float32)),
+                ("w_indptr", weights.indptr),
+                ("w_indices", weights.indices),
+                ("w_data", weights.data)
+            ):
+                np.save(base / f"{name}.npy", array)
+
+            # Switch segments atomically, then drop the old one and its log
+            current = self.path / "CURRENT.tmp"
+            current.write_text(base.name)
+            os.replace(current, self.path / "CURRENT")
+            self.delta = {}
+            self._delta_matrix = None
+            self._load_base()
+            if old_base:
+                shutil.rmtree(old_base, ignore_errors=True)
+            old_log.unlink(missing_ok=True)
+
+    # Queries
+
+    def _stack(self, rows: Iterable[Features], weigh: bool = False) -> sp.csr_matrix:
+        rows = list(rows)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(features) for features, _ in rows])
+        if rows:
+            indices = np.concatenate([features for features, _ in rows])
+            data = np.concatenate([
+                self._weigh(features, tf) if weigh else tf for features, tf in rows
+            ])
+        else:
+            indices = np.empty(0, dtype=np.int32)
+            data = np.empty(0, dtype=np.float32)
+        return sp.csr_matrix((data, indices, indptr), shape=(len(rows), N_FEATURES))
+
+    def _weigh(self, features: np.ndarray, tf: np.ndarray) -> np.ndarray:
+        values = tf * self.idf[features]
+        norm = np.linalg.norm(values)
+        return values / norm if norm else values
+
+    def _features_of(self, note_id: int) -> Optional[Features]:
+        if note_id in self.delta:
+            return self.delta[note_id]
+        row = self.row_of.get(note_id)
+        if row is None or self.dead[row]:
+            return None
+        start, end = self.tf.indptr[row], self.tf.indptr[row + 1]
+        return np.asarray(self.tf.indices[start:end]), np.asarray(self.tf.data[start:end])
+
+    def search(
+        self,
+        features: Features,
+        k: int = 10,
+        exclude: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Get up to k (note_id, cosine score) pairs most similar to a feature vector.
+        """
+        with self.lock:
+            indices, values = features[0], self._weigh(*features)
+            if len(indices) > MAX_QUERY_TERMS:
+                # Keep only the most distinctive terms of long queries
+                keep = np.argpartition(values, -MAX_QUERY_TERMS)[-MAX_QUERY_TERMS:]
+                indices, values = indices[keep], values[keep]
+                values = values / np.linalg.norm(values)
+            if not len(indices):
+                return []
+
+            scores = self.weights[:, indices] @ values
+            scores[self.dead] = 0
+
+            if self.delta:
+                if self._delta_matrix is None:
+                    self._delta_matrix = (
+                        np.fromiter(self.delta, dtype=np.int64, count=len(self.delta)),
+                        self._stack(self.delta.values(), weigh=True).tocsc()
+                    )
+                delta_ids, delta_weights = self._delta_matrix
+                doc_ids = np.concatenate([self.doc_ids, delta_ids])
+                scores = np.concatenate([scores, delta_weights[:, indices] @ values])
+            else:
+                doc_ids = self.doc_ids
+
+            if exclude is not None:
+                scores[doc_ids == exclude] = 0
+
+            k = min(k, len(scores))
+            if k == 0:
+                return []
+            top = np.argpartition(scores, -k)[-k:]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(int(doc_ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def related(self, note_id: int, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Get the notes most similar to an indexed note.
+        """
+        with self.lock:
+            features = self._features_of(note_id)
+        if features is None:
+            return []
+        return self.search(features, k, exclude=note_id)
+
+    def similar(self, text: str, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Get the notes most similar to a free-text query.
+        """
+        return self.search(featurize(text), k)
+
+    @classmethod
+    def build(cls, path: Path, notes: Iterable[Tuple[int, str]]) -> "UserIndex":
+        """
+        Build an index from scratch from (note_id, text) pairs.
+        """
+        # Build next to the live directory and swap it in whole, so readers
+        # never open a half-written index
+        staging = path.with_name(f".{path.name}.build-{uuid.uuid4().hex}")
+        staging.mkdir(parents=True)
+        try:
+            index = cls(staging)
+            for note_id, text in notes:
+                index._add(note_id, featurize(text))
+            index.compact()
+            if path.exists():
+                retired = path.with_name(f".{path.name}.old-{uuid.uuid4().hex}")
+                os.replace(path, retired)
+                os.replace(staging, path)
+                shutil.rmtree(retired, ignore_errors=True)
+            else:
+                os.replace(staging, path)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return cls(path)
+
+class SimilarityIndex:
+    """
+    Per-process cache of user indexes, loaded from disk or built on first use.
+    """
+    def __init__(self, root: str, max_users: int = 64):
+        self.root = Path(root)
+        self.max_users = max_users
+        self._indexes: "OrderedDict[int, UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Dropped by the garbage collector once no build is waiting on them
+        self._build_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # Note changes made while a user's index is being built, by note id;
+        # None marks a removal
+        self._pending: Dict[int, Dict[int, Optional[str]]] = {}
+
+    def _path(self, owner_id: int) -> Path:
+        return self.root / str(owner_id)
+
+    def _cached(self, owner_id: int) -> Optional[UserIndex]:
+        with self._lock:
+            index = self._indexes.get(owner_id)
+            if index is not None:
+                self._indexes.move_to_end(owner_id)
+            return index
+
+    def _store(self, owner_id: int, index: UserIndex, replace: bool = True) -> UserIndex:
+        with self._lock:
+            if not replace and owner_id in self._indexes:
+                # Opened concurrently by another thread; keep a single writer
+                return self._indexes[owner_id]
+            self._store_locked(owner_id, index)
+        return index
+
+    def _store_locked(self, owner_id: int, index: UserIndex) -> None:
+        self._indexes[owner_id] = index
+        self._indexes.move_to_end(owner_id)
+        while len(self._indexes) > self.max_users:
+            self._indexes.popitem(last=False)
+
+    def _finish_build(self, owner_id: int, index: UserIndex) -> UserIndex:
+        """
+        Apply the changes made since the build read its notes, then publish
+        the index; both under the lock, so no later change can slip between.
+        """
+        while True:
+            with self._lock:
+                changes = self._pending.get(owner_id)
+                if not changes:
+                    self._pending.pop(owner_id, None)
+                    self._store_locked(owner_id, index)
+                    return index
+                self._pending[owner_id] = {}
+            for note_id, text in changes.items():
+                if text is None:
+                    index.remove(note_id)
+                else:
+                    index.update(note_id, text)
+
+    def _open(self, owner_id: int) -> Optional[UserIndex]:
+        """
+        Get a user's index if it is cached or on disk.
+        """
+        index = self._cached(owner_id)
+        if index is None and self._path(owner_id).exists():
+            index = self._store(owner_id, UserIndex(self._path(owner_id)), replace=False)
+        return index
+
+    async def get(self, db: AsyncSession, owner_id: int) -> UserIndex:
+        """
+        Get a user's index, building it from the database if it doesn't exist yet.
+        """
+        index = await run_in_threadpool(self._open, owner_id)
+        if index is not None:
+            return index
+
+        # One build per user at a time; later callers wait and reuse it
+        lock = self._build_locks.get(owner_id)
+        if lock is None:
+            lock = self._build_locks[owner_id] = asyncio.Lock()
+        async with lock:
+            index = await run_in_threadpool(self._open, owner_id)
+            if index is not None:
+                return index
+
+            # Notes committed from here on may be missing from what we read
+            with self._lock:
+                self._pending[owner_id] = {}
+            try:
+                result = await db.execute(
+                    select(Note.id, Note.title, Note.body).where(Note.owner_id == owner_id)
+                )
+                rows = result.all()
+                bodies = await note_bodies.load(rows)
+                notes = [(row.id, f"{row.title}\n{bodies[row.id]}") for row in rows]
+                index = await run_in_threadpool(UserIndex.build, self._path(owner_id), notes)
+                return await run_in_threadpool(self._finish_build, owner_id, index)
+            finally:
+                with self._lock:
+                    self._pending.pop(owner_id, None)
+
+    def update_note(self, owner_id: int, note_id: int, text: str) -> None:
+        """
+        Re-index a note if the user's index exists; otherwise it is
+        built with the note included on first query.
+        """
+        if self._defer(owner_id, note_id, text):
+            return
+        index = self._open(owner_id)
+        if index is not None:
+            index.update(note_id, text)
+
+    def remove_note(self, owner_id: int, note_id: int) -> None:
+        """
+        Drop a note from the user's index if it exists.
+        """
+        if self._defer(owner_id, note_id, None):
+            return
+        index = self._open(owner_id)
+        if index is not None:
+            index.remove(note_id)
+
+    def _defer(self, owner_id: int, note_id: int, text: Optional[str]) -> bool:
+        # Queue the change for the build in progress, if there is one
+        with self._lock:
+            pending = self._pending.get(owner_id)
+            if pending is None:
+                return False
+            pending[note_id] = text
+            return True
+
+    def drop(self, owner_id: int) -> None:
+        """
+        Delete a user's index so it is rebuilt on next use.
+        """
+        with self._lock:
+            self._indexes.pop(owner_id, None)
+        shutil.rmtree(self._path(owner_id), ignore_errors=True)
+
+# Create global instance
+similarity_index = SimilarityIndex(settings.SIMILARITY_INDEX_DIR)
+
+async def _rebuild(owner_ids: List[int]) -> None:
+    for shard in shard_router.shards.values():
+        async with shard.Session() as db:
+            if owner_ids:
+                owners = [
+                    owner_id for owner_id in owner_ids
+                    if (await shard_router.locate(owner_id))[0] == shard.name
+                ]
+            else:
+                result = await db.execute(select(Note.owner_id).distinct())
+                owners = result.scalars().all()
+            for owner_id in owners:
+                similarity_index.drop(owner_id)
+                index = await similarity_index.get(db, owner_id)
+                print(f"user {owner_id}: indexed {index.n_docs} note(s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild related-notes indexes.")
+    parser.add_argument("--user-id", type=int, action="append", default=[],
+                        help="Only rebuild this user's index (repeatable)")
+    args = parser.parse_args()
+    asyncio.run(_rebuild(args.user_id))
@@ -0,0 +1,227 @@
+"""
+Tag index keeping per-user tag counts in step with note writes.
+"""
+import argparse
+import asyncio
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.sharding import shard_router
+from app.models.tag import Tag, note_tags
+
+MAX_TAG_LENGTH = 64
+
+_whitespace = re.compile(r"\s+")
+
+def normalize_tag(name: str) -> str:
+    """
+    Normalize a tag name: trimmed, lowercase, single spaces.
+    """
+    return _whitespace.sub(" ", name).strip().lower()[:MAX_TAG_LENGTH]
+
+class TagIndex:
+    """
+    Maintains the note/tag links and the denormalized `Tag.note_count`.
+    None of the methods commit; callers commit together with the note write.
+    """
+    async def get_note_tags(
+        self,
+        db: AsyncSession,
+        note_ids: Sequence[int]
+    ) -> Dict[int, List[str]]:
+        """
+        Get tag names for a batch of notes in one query.
+        """
+        tags: Dict[int, List[str]] = {note_id: [] for note_id in note_ids}
+        if not note_ids:
+            return tags
+
+        result = await db.execute(
+            select(note_tags.c.note_id, Tag.name)
+            .join(Tag, Tag.id == note_tags.c.tag_id)
+            .where(note_tags.c.note_id.in_(note_ids))
+            .order_by(Tag.name)
+        )
+        for note_id, name in result:
+            tags[note_id].append(name)
+        return tags
+
+    async def set_note_tags(
+        self,
+        db: AsyncSession,
+        owner_id: int,
+        note_id: int,
+        names: Iterable[str]
+    ) -> List[str]:
+        """
+        Replace the tags of a note, writing only the links that changed.
+        Returns the note's normalized tag names.
+        """
+        wanted = {tag for tag in map(normalize_tag, names) if tag}
+
+        result = await db.execute(
+            select(Tag.id, Tag.name)
+            .join(note_tags, note_tags.c.tag_id == Tag.id)
+            .where(note_tags.c.note_id == note_id)
+        )
+        current = {name: tag_id for tag_id, name in result}
+
+        removed = [tag_id for name, tag_id in current.items() if name not in wanted]
+        if removed:
+            await db.execute(
+                delete(note_tags).where(
+                    note_tags.c.note_id == note_id,
+                    note_tags.c.tag_id.in_(removed)
+                )
+            )
+            await self._adjust_counts(db, removed, -1)
+
+        added = wanted - current.keys()
+        if added:
+            tag_ids = await self._get_or_create(db, owner_id, added)
+            await db.execute(
+                insert(note_tags),
+                [{"tag_id": tag_id, "note_id": note_id} for tag_id in tag_ids]
+            )
+            await self._adjust_counts(db, tag_ids, 1)
+
+        return sorted(wanted)
+
+    async def remove_note(self, db: AsyncSession, note_id: int) -> None:
+        """
+        Drop all tags of a note before it is deleted.
+        """
+        result = await db.execute(
+            select(note_tags.c.tag_id).where(note_tags.c.note_id == note_id)
+        )
+        tag_ids = result.scalars().all()
+        if tag_ids:
+            await db.execute(delete(note_tags).where(note_tags.c.note_id == note_id))
+            await self._adjust_counts(db, tag_ids, -1)
+
+    async def facets(self, db: AsyncSession, owner_id: int) -> List[Tuple[str, int]]:
+        """
+        Get (name, count) for every tag in use by a user.
+        Reads the denormalized counts, so cost is O(number of tags).
+        """
+        result = await db.execute(
+            select(Tag.name, Tag.note_count)
+            .where(Tag.owner_id == owner_id, Tag.note_count > 0)
+            .order_by(Tag.note_count.desc(), Tag.name)
+        )
+        return [(name, count) for name, count in result]
+
+    async def filter_notes(self, db: AsyncSession, owner_id: int, names: Iterable[str]):
+        """
+        Build a subquery of note ids carrying all of the given tags,
+        or None if one of the tags does not exist.
+        """
+        wanted = {tag for tag in map(normalize_tag, names) if tag}
+        result = await db.execute(
+            select(Tag.id).where(Tag.owner_id == owner_id, Tag.name.in_(wanted))
+        )
+        tag_ids = result.scalars().all()
+        if len(tag_ids) != len(wanted):
+            return None
+
+        query = select(note_tags.c.note_id).where(note_tags.c.tag_id.in_(tag_ids))
+        if len(tag_ids) > 1:
+            query = query.group_by(note_tags.c.note_id).having(
+                func.count() == len(tag_ids)
+            )
+        return query
+
+    async def check_counts(
+        self,
+        db: AsyncSession,
+        owner_id: Optional[int] = None,
+        repair: bool = False
+    ) -> List[Tuple[int, str, int, int]]:
+        """
+        Compare stored counts against the link table.
+        Returns (tag_id, name, stored, actual) for every mismatch and,
+        with `repair`, rewrites the stored counts.
+        """
+        actual = (
+            select(note_tags.c.tag_id, func.count().label("actual"))
+            .group_by(note_tags.c.tag_id)
+            .subquery()
+        )
+        query = (
+            select(Tag.id, Tag.name, Tag.note_count, func.coalesce(actual.c.actual, 0))
+            .outerjoin(actual, actual.c.tag_id == Tag.id)
+            .where(Tag.note_count != func.coalesce(actual.c.actual, 0))
+        )
+        if owner_id is not None:
+            query = query.where(Tag.owner_id == owner_id)
+
+        mismatches = [tuple(row) for row in await db.execute(query)]
+        if repair:
+            for tag_id, _, _, count in mismatches:
+                await db.execute(
+                    update(Tag).where(Tag.id == tag_id).values(note_count=count)
+                )
+        return mismatches
+
+    async def _get_or_create(
+        self,
+        db: AsyncSession,
+        owner_id: int,
+        names: Iterable[str]
+    ) -> List[int]:
+        names = set(names)
+        result = await db.execute(
+            select(Tag.id, Tag.name).where(Tag.owner_id == owner_id, Tag.name.in_(names))
+        )
+        tag_ids = {name: tag_id for tag_id, name in result}
+
+        for name in names - tag_ids.keys():
+            try:
+                # Savepoint so a concurrent insert of the same tag doesn't abort the write
+                async with db.begin_nested():
+                    values = {"owner_id": owner_id, "name": name, "note_count": 0}
+                    tag_id = await shard_router.next_id("tags")
+                    if tag_id is not None:
+                        values["id"] = tag_id
+                    result = await db.execute(insert(Tag).values(**values))
+                tag_ids[name] = result.inserted_primary_key[0]
+            except IntegrityError:
+                result = await db.execute(
+                    select(Tag.id).where(Tag.owner_id == owner_id, Tag.name == name)
+                )
+                tag_ids[name] = result.scalar_one()
+
+        return list(tag_ids.values())
+
+    async def _adjust_counts(self, db: AsyncSession, tag_ids: Sequence[int], delta: int) -> None:
+        await db.execute(
+            update(Tag)
+            .where(Tag.id.in_(tag_ids))
+            .values(note_count=Tag.note_count + delta)
+        )
+
+# Create global instance
+tag_index = TagIndex()
+
+async def _main(owner_id: Optional[int], repair: bool) -> int:
+    mismatches = []
+    for shard in shard_router.shards.values():
+        async with shard.Session() as db:
+            found = await tag_index.check_counts(db, owner_id, repair=repair)
+            for tag_id, name, stored, actual in found:
+                print(f"tag {tag_id} ({name!r}) on {shard.name}: stored {stored}, actual {actual}")
+            if repair:
+                await db.commit()
+        mismatches.extend(found)
+
+    print(f"{len(mismatches)} mismatched tag count(s){' repaired' if repair else ''}")
+    return 1 if mismatches and not repair else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check or rebuild denormalized tag counts.")
+    parser.add_argument("--user-id", type=int, help="Only check tags of this user")
+    parser.add_argument("--repair", action="store_true", help="Rewrite mismatched counts")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_main(args.user_id, args.repair)))
@@ -0,0 +1,7 @@
+"""
+On-demand statistical profiling of individual requests.
+"""
+from .sampler import Profile, StackSampler, bind_thread, stack_sampler
+from .store import ProfileStore, profile_store, to_collapsed, to_speedscope
+from .tokens import PROFILE_HEADER, create_profile_token, verify_profile_token
+from .middleware import ProfilerMiddleware
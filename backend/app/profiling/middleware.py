@@ -0,0 +1,70 @@
+"""
+ASGI middleware profiling selected requests.
+"""
+import random
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from .sampler import Profile, StackSampler, stack_sampler
+from .store import ProfileStore, profile_store
+from .tokens import PROFILE_HEADER, verify_profile_token
+
+# Downloading profiles is never itself profiled
+PROFILES_PATH = "/v1/admin/profiles"
+
+_header_name = PROFILE_HEADER.lower().encode()
+
+class ProfilerMiddleware:
+    """
+    Profiles requests carrying a valid signed `X-Profile` header, plus a random
+    `sample_rate` fraction of all requests. Other requests only pay for a scan
+    of their header names.
+    Profiled responses carry an `X-Profile-Id` header naming the stored profile.
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: Optional[float] = None,
+        sampler: Optional[StackSampler] = None,
+        store: Optional[ProfileStore] = None
+    ):
+        self.app = app
+        self.sample_rate = settings.PROFILER_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.sampler = sampler or stack_sampler
+        self.store = store or profile_store
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if scope["path"].startswith(PROFILES_PATH):
+            return False
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        for name, value in scope["headers"]:
+            if name == _header_name:
+                return verify_profile_token(value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(
+            scope["method"],
+            scope["path"],
+            self.sampler.interval,
+            root=ProfilerMiddleware.__call__.__code__
+        )
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Profile-Id", profile.id)
+            await send(message)
+
+        self.sampler.start(profile)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            self.sampler.stop(profile)
+            self.store.add(profile)
@@ -0,0 +1,177 @@
+"""
+Statistical stack sampler for profiling individual async requests.
+
+A background thread wakes every `interval` seconds and records where each
+profiled request is: its coroutine stack while its task runs on the event
+loop, its await chain while it is suspended, or the stacks of the worker
+threads it is waiting on. The thread only runs while a profile is active.
+"""
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from types import CodeType, FrameType
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+from app.core.config import settings
+
+T = TypeVar("T")
+
+Frame = Tuple[str, str, int]  # (qualified name, file, first line)
+Stack = Tuple[Frame, ...]  # Outermost frame first
+
+# Leaf frames marking time spent suspended rather than running Python code
+AWAIT_FRAME: Frame = ("[await]", "", 0)
+THREAD_FRAME: Frame = ("[thread]", "", 0)
+
+MAX_DEPTH = 256
+
+_current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+
+class Profile:
+    """
+    Stack samples collected for one request.
+    """
+    def __init__(self, method: str, path: str, interval: float, root: Optional[CodeType] = None):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.root = root  # Code object where collected stacks start
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.status_code: Optional[int] = None
+        self.samples: Counter = Counter()  # Stack -> number of samples
+
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._threads: Set[int] = set()  # Worker threads running on behalf of the request
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.samples.values())
+
+def _frame_key(code: CodeType) -> Frame:
+    return (code.co_qualname, code.co_filename, code.co_firstlineno)
+
+def _walk_frames(frame: Optional[FrameType]) -> List[CodeType]:
+    codes = []
+    while frame is not None and len(codes) < MAX_DEPTH:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    return codes
+
+def _walk_awaits(task: asyncio.Task) -> List[CodeType]:
+    """
+    Follow a suspended task's chain of awaited coroutines.
+    """
+    codes = []
+    awaitable = task.get_coro()
+    while awaitable is not None and len(codes) < MAX_DEPTH:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            break
+        codes.append(frame.f_code)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "ag_await", None)
+    return codes
+
+def _from_root(codes: List[CodeType], root: Optional[CodeType]) -> Stack:
+    if root is not None:
+        for position, code in enumerate(codes):
+            if code is root:
+                codes = codes[position:]
+                break
+    return tuple(_frame_key(code) for code in codes)
+
+class StackSampler:
+    """
+    Samples the stacks of all active profiles from one background thread.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: Dict[str, Profile] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile: Profile) -> None:
+        """
+        Start sampling a profile for the calling task.
+        """
+        profile._task = asyncio.current_task()
+        profile._loop = asyncio.get_running_loop()
+        profile._loop_thread = threading.get_ident()
+        _current_profile.set(profile)
+
+        with self._lock:
+            self._profiles[profile.id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.pop(profile.id, None)
+        profile.duration = time.time() - profile.started_at
+        _current_profile.set(None)
+
+    @property
+    def active(self) -> int:
+        return len(self._profiles)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                profiles = list(self._profiles.values())
+                if not profiles:
+                    self._thread = None
+                    return
+
+            frames = sys._current_frames()
+            for profile in profiles:
+                for stack in self._sample(profile, frames):
+                    profile.samples[stack] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _sample(self, profile: Profile, frames: Dict[int, FrameType]) -> Iterator[Stack]:
+        task = profile._task
+        if task is None or task.done():
+            return
+
+        if asyncio.current_task(profile._loop) is task:
+            yield _from_root(_walk_frames(frames.get(profile._loop_thread)), profile.root)
+            return
+
+        awaiting = _from_root(_walk_awaits(task), profile.root)
+        threads = [frames[ident] for ident in list(profile._threads) if ident in frames]
+        if not threads:
+            yield awaiting + (AWAIT_FRAME,)
+            return
+
+        for frame in threads:
+            yield awaiting + (THREAD_FRAME,) + _from_root(_walk_frames(frame), _run_bound.__code__)
+
+def _run_bound(profile: Profile, func: Callable[..., T], *args) -> T:
+    ident = threading.get_ident()
+    profile._threads.add(ident)
+    try:
+        return func(*args)
+    finally:
+        profile._threads.discard(ident)
+
+def bind_thread(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Wrap a function about to be sent to a worker thread so the thread is
+    sampled as part of the calling request's profile, if there is one.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return func
+    return lambda *args: _run_bound(profile, func, *args)
+
+# Create global instance
+stack_sampler = StackSampler(settings.PROFILER_INTERVAL)
@@ -0,0 +1,94 @@
+"""
+Ring buffer of finished profiles and their export formats.
+"""
+import os
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from app.core.config import settings
+from .sampler import Frame, Profile
+
+def _frame_name(frame: Frame) -> str:
+    name, filename, line = frame
+    if not filename:
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+def to_collapsed(profile: Profile) -> str:
+    """
+    Render a profile as collapsed stacks, one `frame;frame;frame count` line
+    per distinct stack, as read by flamegraph.pl, speedscope and inferno.
+    """
+    lines = [
+        f"{';'.join(_frame_name(frame) for frame in stack)} {count}"
+        for stack, count in profile.samples.most_common()
+    ]
+    return "\n".join(lines) + "\n"
+
+def to_speedscope(profile: Profile) -> Dict[str, Any]:
+    """
+    Render a profile as a speedscope sampled profile, weighted in seconds.
+    """
+    frames: List[Dict[str, Any]] = []
+    frame_ids: Dict[Frame, int] = {}
+    samples = []
+    weights = []
+
+    for stack, count in profile.samples.most_common():
+        sample = []
+        for frame in stack:
+            if frame not in frame_ids:
+                frame_ids[frame] = len(frames)
+                name, filename, line = frame
+                entry: Dict[str, Any] = {"name": name}
+                if filename:
+                    entry.update(file=filename, line=line)
+                frames.append(entry)
+            sample.append(frame_ids[frame])
+        samples.append(sample)
+        weights.append(count * profile.interval)
+
+    name = f"{profile.method} {profile.path}"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "noteko",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights
+        }]
+    }
+
+class ProfileStore:
+    """
+    Keeps the most recent profiles; the oldest is dropped when full.
+    """
+    def __init__(self, capacity: int):
+        self.profiles: Deque[Profile] = deque(maxlen=capacity)
+
+    def add(self, profile: Profile) -> None:
+        self.profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def recent(self) -> List[Profile]:
+        """
+        Get the stored profiles, newest first.
+        """
+        return list(reversed(self.profiles))
+
+    def clear(self) -> None:
+        self.profiles.clear()
+
+# Create global instance
+profile_store = ProfileStore(settings.PROFILER_BUFFER_SIZE)
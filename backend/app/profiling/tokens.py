@@ -0,0 +1,44 @@
+"""
+Signed header values that switch on profiling for a request.
+
+A value is `<expiry>.<signature>`, where the signature is an HMAC of the
+expiry timestamp keyed with the application's secret key, so only holders
+of the secret can mint one and a leaked value stops working on its own.
+"""
+import argparse
+import hashlib
+import hmac
+import time
+from typing import Optional
+from app.core.config import settings
+
+PROFILE_HEADER = "X-Profile"
+
+def _signature(expires: int) -> str:
+    return hmac.new(
+        settings.SECRET_KEY.encode(),
+        f"profile:{expires}".encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+def create_profile_token(ttl: Optional[int] = None) -> str:
+    """
+    Create a profiling header value valid for `ttl` seconds.
+    """
+    expires = int(time.time()) + (settings.PROFILER_TOKEN_TTL if ttl is None else ttl)
+    return f"{expires}.{_signature(expires)}"
+
+def verify_profile_token(token: str) -> bool:
+    """
+    Check a profiling header value's signature and expiry.
+    """
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(int(expires)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a signed header value for profiling requests.")
+    parser.add_argument("--ttl", type=int, help="Seconds the value stays valid")
+    args = parser.parse_args()
+    print(f"{PROFILE_HEADER}: {create_profile_token(args.ttl)}")
@@ -3,3 +3,16 @@ Pydantic schemas for request/response models.
 """
 from .token import Token, TokenPayload
 from .user import UserBase, UserCreate, UserLogin, UserResponse
+from .note import (
+    NoteBase,
+    NoteCreate,
+    NoteUpdate,
+    NoteResponse,
+    TagFacet,
+    NoteRef,
+    RelatedNote,
+    NoteGraphEdge,
+    NoteGraph
+)
+from .profile import ProfileSummary
+from .batch import BatchSubRequest, BatchRequest, BatchSubResponse, BatchResponse
@@ -0,0 +1,45 @@
+"""
+Batch request Pydantic schemas.
+"""
+import posixpath
+from typing import Any, Dict, List, Literal, Optional
+from urllib.parse import unquote
+from pydantic import BaseModel, Field, field_validator
+from app.core.config import settings
+
+BATCH_PATH = "/v1/batch"
+
+def is_batch_path(path: str) -> bool:
+    """Check whether a request path, query included, routes to the batch endpoint."""
+    # Compare the decoded path the sub-request is dispatched with
+    decoded = unquote(path.partition("?")[0])
+    return posixpath.normpath("/" + decoded.lstrip("/")) == BATCH_PATH
+
+class BatchSubRequest(BaseModel):
+    """Schema for one request inside a batch."""
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    path: str = Field(max_length=2048)
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None  # Sent as JSON
+
+    @field_validator("path")
+    @classmethod
+    def check_path(cls, path: str) -> str:
+        """Only allow API paths, and no nested batches."""
+        if not path.startswith("/v1/") or is_batch_path(path):
+            raise ValueError("Path must be an API path other than /v1/batch")
+        return path
+
+class BatchRequest(BaseModel):
+    """Schema for a batch of requests."""
+    requests: List[BatchSubRequest] = Field(min_length=1, max_length=settings.BATCH_MAX_REQUESTS)
+
+class BatchSubResponse(BaseModel):
+    """Schema for the response to one batched request."""
+    status: int
+    headers: Dict[str, str]
+    body: Optional[Any]
+
+class BatchResponse(BaseModel):
+    """Schema for batch response, in request order."""
+    responses: List[BatchSubResponse]
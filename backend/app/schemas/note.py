@@ -0,0 +1,54 @@
+"""
+Note-related Pydantic schemas.
+"""
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from datetime import datetime
+
+class NoteBase(BaseModel):
+    """Base note schema."""
+    title: str = Field(min_length=1, max_length=255)
+    body: str = ""
+    
+    model_config = ConfigDict(from_attributes=True)
+
+class NoteCreate(NoteBase):
+    """Schema for note creation."""
+    tags: List[str] = []
+
+class NoteUpdate(BaseModel):
+    """Schema for partial note updates."""
+    title: Optional[str] = Field(default=None, min_length=1, max_length=255)
+    body: Optional[str] = None
+    tags: Optional[List[str]] = None
+
+class NoteResponse(NoteBase):
+    """Schema for note response."""
+    id: int
+    tags: List[str] = []
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+class TagFacet(BaseModel):
+    """Schema for a tag and the number of notes carrying it."""
+    name: str
+    count: int
+
+class NoteRef(BaseModel):
+    """Schema for a reference to another note."""
+    id: int
+    title: str
+
+class RelatedNote(NoteRef):
+    """Schema for a similar note with its cosine similarity score."""
+    score: float
+
+class NoteGraphEdge(BaseModel):
+    """Schema for a link between two notes."""
+    source: int
+    target: int
+
+class NoteGraph(BaseModel):
+    """Schema for the local link graph around a note."""
+    nodes: List[NoteRef]
+    edges: List[NoteGraphEdge]
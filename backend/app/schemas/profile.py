@@ -0,0 +1,16 @@
+"""
+Request profile Pydantic schemas.
+"""
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class ProfileSummary(BaseModel):
+    """Schema for a stored request profile."""
+    id: str
+    method: str
+    path: str
+    status_code: Optional[int]
+    started_at: datetime
+    duration_ms: float
+    samples: int
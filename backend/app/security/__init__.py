@@ -2,8 +2,10 @@
 Security module implementing industry-standard authentication and protection.
 """
 from .password import (
+    PasswordPolicy,
     verify_password,
     get_password_hash,
+    password_policy,
     validate_password
 )
 from .token import (
@@ -13,5 +15,12 @@ from .token import (
 )
 from .middleware import (
     RateLimitMiddleware,
-    get_current_user
+    get_current_user,
+    verify_request_token
+)
+from .admission import (
+    CostBudget,
+    ConcurrencyLimiter,
+    password_limiter,
+    rate_limit_budget
 )
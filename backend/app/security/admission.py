@@ -0,0 +1,168 @@
+"""
+Admission control for CPU-heavy endpoints.
+Implements cost-weighted rate budgets and a bounded concurrency limiter.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple, TypeVar
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.profiling.sampler import bind_thread
+
+T = TypeVar("T")
+
+# Cost of a request in budget units, keyed by (method, path).
+# Routes that run a bcrypt hash or verify are far more expensive than the rest.
+DEFAULT_ROUTE_COST = 1
+ROUTE_COSTS: Dict[Tuple[str, str], int] = {
+    ("POST", "/v1/auth/login"): 5,
+    ("POST", "/v1/auth/register"): 5,
+}
+
+# Drop idle buckets once the store grows past this many keys
+MAX_BUCKETS = 10_000
+
+
+class CostBudget:
+    """
+    Cost-weighted token buckets keyed by client identity (IP or user).
+    Each bucket holds up to `capacity` units and refills over `period` seconds.
+    """
+    def __init__(self, capacity: int, period: int):
+        self.capacity = float(capacity)
+        self.rate = capacity / period  # Units refilled per second
+        self.buckets: Dict[str, list] = {}  # Store key -> [tokens, last_refill]
+
+    def _refill(self, key: str, now: float) -> list:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [self.capacity, now]
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def charge(self, keys: Iterable[str], cost: int, now: Optional[float] = None) -> float:
+        """
+        Charge `cost` units against every key.
+        Returns 0 when admitted, otherwise the seconds to wait before retrying.
+        Nothing is deducted unless all keys can afford the cost.
+        """
+        now = time.monotonic() if now is None else now
+        if len(self.buckets) > MAX_BUCKETS:
+            self._sweep(now)
+
+        buckets = [self._refill(key, now) for key in keys]
+        cost = min(float(cost), self.capacity)
+        retry_after = max(
+            ((cost - tokens) / self.rate for tokens, _ in buckets if tokens < cost),
+            default=0.0
+        )
+        if retry_after > 0:
+            return retry_after
+
+        for bucket in buckets:
+            bucket[0] -= cost
+        return 0.0
+
+    def _sweep(self, now: float) -> None:
+        """Forget buckets that would be full again by now."""
+        self.buckets = {
+            key: bucket for key, bucket in self.buckets.items()
+            if bucket[0] + (now - bucket[1]) * self.rate < self.capacity
+        }
+
+    def reset(self) -> None:
+        """Clear all buckets."""
+        self.buckets.clear()
+
+
+class ConcurrencyLimiter:
+    """
+    Caps how many expensive operations run at once.
+    Callers beyond the limit wait in a bounded FIFO queue with a deadline;
+    when the queue is full or the deadline passes they get a fast 503.
+    """
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(max(1, math.ceil(self.timeout)))},
+        )
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._busy()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The slot is handed over by release(), so active is not incremented here
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            raise self._busy()
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        Run a blocking function in the thread pool once a slot is free.
+        """
+        async with self:
+            return await run_in_threadpool(bind_thread(func), *args)
+
+
+def get_route_cost(method: str, path: str) -> int:
+    """
+    Get the budget cost of a request.
+    """
+    return ROUTE_COSTS.get((method, path), DEFAULT_ROUTE_COST)
+
+
+# Global instances shared by the middleware and endpoints
+rate_limit_budget = CostBudget(settings.RATE_LIMIT_CALLS, settings.RATE_LIMIT_PERIOD)
+password_limiter = ConcurrencyLimiter(
+    limit=settings.PASSWORD_HASH_CONCURRENCY,
+    max_queue=settings.PASSWORD_HASH_QUEUE_SIZE,
+    timeout=settings.PASSWORD_HASH_TIMEOUT
+)
@@ -6,47 +6,78 @@ from fastapi import HTTPException, Security, Depends
 from fastapi.security import OAuth2PasswordBearer
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
-import time
+from starlette.responses import JSONResponse, Response
+import hmac
+import math
 from typing import Optional, Dict
+from app.core.config import settings
+from .admission import CostBudget, get_route_cost, rate_limit_budget
 from .token import verify_token
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+def verify_request_token(request: Request, token: str) -> Optional[Dict]:
+    """
+    Verify a request's bearer token, at most once per request.
+    The payload is kept on the request state, where the rate limiter,
+    `get_current_user` and batched sub-requests share it.
+    """
+    verified = getattr(request.state, "verified_token", None)
+    if verified is not None and hmac.compare_digest(verified[0], token):
+        return verified[1]
+    
+    payload = verify_token(token)
+    request.state.verified_token = (token, payload)
+    return payload
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
     Rate limiting middleware to prevent brute force attacks.
+    Charges each request its route cost against both a per-IP and,
+    for authenticated requests, a per-user budget.
     Uses a simple in-memory store (should use Redis in production).
     """
-    def __init__(self, app, calls: int = 60, period: int = 60):
+    def __init__(
+        self,
+        app,
+        calls: Optional[int] = None,
+        period: Optional[int] = None,
+        budget: Optional[CostBudget] = None
+    ):
         super().__init__(app)
-        self.calls = calls  # Number of calls allowed
-        self.period = period  # Time period in seconds
-        self.store: Dict[str, list] = {}  # Store IP -> [timestamp, timestamp, ...]
+        if budget is None and (calls or period):
+            budget = CostBudget(
+                calls or settings.RATE_LIMIT_CALLS,
+                period or settings.RATE_LIMIT_PERIOD
+            )
+        self.budget = budget or rate_limit_budget
 
     async def dispatch(self, request: Request, call_next) -> Response:
         # Get client IP or use default for testing
         ip = "test" if request.client is None else request.client.host
-        now = time.time()
+        keys = [f"ip:{ip}"]
         
-        # Initialize or clean old requests
-        if ip not in self.store:
-            self.store[ip] = []
-        self.store[ip] = [ts for ts in self.store[ip] if now - ts < self.period]
+        # Charge the user's budget too when a valid token is present
+        authorization = request.headers.get("authorization", "")
+        if authorization[:7].lower() == "bearer ":
+            payload = verify_request_token(request, authorization[7:])
+            if payload and payload.get("sub"):
+                keys.append(f"user:{payload['sub']}")
         
         # Check rate limit
-        if len(self.store[ip]) >= self.calls:
-            raise HTTPException(
+        cost = get_route_cost(request.method, request.url.path)
+        retry_after = self.budget.charge(keys, cost)
+        if retry_after > 0:
+            response = JSONResponse(
                 status_code=429,
-                detail="Too many requests"
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(math.ceil(retry_after))}
             )
-        
-        # Add request timestamp
-        self.store[ip].append(now)
+        else:
+            response = await call_next(request)
         
         # Add security headers
-        response = await call_next(request)
         response.headers["X-XSS-Protection"] = "1; mode=block"
         response.headers["X-Content-Type-Options"] = "nosniff"
         response.headers["X-Frame-Options"] = "DENY"
@@ -54,7 +85,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         
         return response
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> Optional[Dict]:
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)) -> Optional[Dict]:
     """
     Dependency to get current authenticated user from JWT token.
     """
@@ -64,7 +95,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> Optional[Dict
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    payload = verify_token(token)
+    payload = verify_request_token(request, token)
     if payload is None:
         raise credentials_exception
         
@@ -1,8 +1,32 @@
 """
 Password security utilities.
 """
-from typing import Tuple
+from functools import reduce
+from operator import or_
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
 from passlib.context import CryptContext
+from app.core.config import settings
+
+SPECIAL_CHARACTERS = "!@#$%^&*()_+-=[]{}|;:,.<>?"
+
+CHARACTER_CLASSES = ("upper", "lower", "digit", "special")
+
+# Bit flags the class table maps each UTF-8 byte to; bytes of non-ASCII
+# characters are only flagged for a per-character fallback
+_UPPER, _LOWER, _DIGIT, _SPECIAL, _NON_ASCII = 1, 2, 4, 8, 16
+# Further bits of a violation key, above the missing class flags
+_TOO_SHORT, _TOO_LONG, _BANNED = 32, 64, 128
+_SEPARATOR = "\x00"
+
+_CLASS_FLAGS = {"upper": _UPPER, "lower": _LOWER, "digit": _DIGIT, "special": _SPECIAL}
+_CLASS_MESSAGES = {
+    "upper": "Password must contain at least one uppercase letter",
+    "lower": "Password must contain at least one lowercase letter",
+    "digit": "Password must contain at least one number",
+    "special": "Password must contain at least one special character",
+}
+BANNED_MESSAGE = "Password is too common"
 
 # Use bcrypt for password hashing
 pwd_context = CryptContext(
@@ -23,24 +47,147 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+class PasswordPolicy:
+    """
+    Password strength rules compiled into a byte-to-class table.
+    A password's UTF-8 bytes are translated to class bit flags in one
+    `bytes.translate` pass and OR-ed together; characters outside ASCII are
+    only classified one by one when the password still misses a class.
+    The batch methods do this for a whole list at once with numpy.
+    Violations are reported all together, in rule order.
+    """
+    def __init__(
+        self,
+        min_length: int = 8,
+        max_length: Optional[int] = None,
+        required: Iterable[str] = CHARACTER_CLASSES,
+        special_characters: str = SPECIAL_CHARACTERS,
+        banned: Iterable[str] = ()
+    ):
+        required = set(required)
+        unknown = required - set(CHARACTER_CLASSES)
+        if unknown:
+            raise ValueError(f"Unknown character classes: {', '.join(sorted(unknown))}")
+        self.min_length = min_length
+        self.max_length = max_length
+        self.required = [name for name in CHARACTER_CLASSES if name in required]
+        self.special_characters = special_characters
+        self.banned = frozenset(word.lower() for word in banned)
+
+        table = bytearray(256)
+        for code in range(128):
+            table[code] = self._flags(chr(code))
+        table[128:] = bytes([_NON_ASCII]) * 128
+        self._table = bytes(table)
+        self._required_mask = reduce(or_, (_CLASS_FLAGS[name] for name in self.required), 0)
+        # Violations, and the error message listing them, by violation key
+        self._messages = [self._describe(key) for key in range(_BANNED << 1)]
+        self._errors = ["; ".join(messages) for messages in self._messages]
+
+    def _flags(self, char: str) -> int:
+        # Every class a character counts for; a special character may be a letter too
+        return (
+            (_SPECIAL if char in self.special_characters else 0)
+            | (_UPPER if char.isupper() else 0)
+            | (_LOWER if char.islower() else 0)
+            | (_DIGIT if char.isdigit() else 0)
+        )
+
+    def _classify(self, password: str) -> int:
+        # Fallback for the characters the byte table can't tell apart
+        return reduce(or_, (self._flags(char) for char in password if not char.isascii()), 0)
+
+    def _describe(self, key: int) -> Tuple[str, ...]:
+        # Messages for a violation key, in rule order
+        return tuple(
+            ([f"Password must be at least {self.min_length} characters long"] if key & _TOO_SHORT else [])
+            + ([f"Password must be at most {self.max_length} characters long"] if key & _TOO_LONG else [])
+            + [_CLASS_MESSAGES[name] for name in self.required if key & _CLASS_FLAGS[name]]
+            + ([BANNED_MESSAGE] if key & _BANNED else [])
+        )
+
+    def _key(self, password: str) -> int:
+        mask = reduce(or_, set(password.encode("utf-8", "surrogatepass").translate(self._table)), 0)
+        if mask & _NON_ASCII:
+            mask |= self._classify(password)
+        length = len(password)
+        key = self._required_mask & ~mask
+        if length < self.min_length:
+            key |= _TOO_SHORT
+        if self.max_length is not None and length > self.max_length:
+            key |= _TOO_LONG
+        if self.banned and password.lower() in self.banned:
+            key |= _BANNED
+        return key
+
+    def _keys(self, passwords: Sequence[str]) -> List[int]:
+        # Terminate every password, so none is empty for reduceat
+        encoded = (_SEPARATOR.join(passwords) + _SEPARATOR).encode("utf-8", "surrogatepass")
+        ends = np.flatnonzero(np.frombuffer(encoded, dtype=np.uint8) == 0)
+        if len(ends) != len(passwords):
+            # A password contains the separator itself
+            return [self._key(password) for password in passwords]
+
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        masks = np.bitwise_or.reduceat(np.frombuffer(encoded.translate(self._table), dtype=np.uint8), starts)
+        lengths = np.fromiter(map(len, passwords), dtype=np.int64, count=len(passwords))
+        keys = (self._required_mask & ~masks).astype(np.int64)
+        # Classes missing from the ASCII bytes may still be among the others
+        recheck = (masks & _NON_ASCII).astype(bool) & (keys != 0)
+        keys |= (lengths < self.min_length) * _TOO_SHORT
+        if self.max_length is not None:
+            keys |= (lengths > self.max_length) * _TOO_LONG
+
+        keys = keys.tolist()
+        for index in np.flatnonzero(recheck).tolist():
+            keys[index] = self._key(passwords[index])
+        if self.banned:
+            for index, password in enumerate(passwords):
+                if password.lower() in self.banned:
+                    keys[index] |= _BANNED
+        return keys
+
+    def check(self, password: str) -> List[str]:
+        """
+        Return every rule the password breaks; empty if it is acceptable.
+        """
+        return list(self._messages[self._key(password)])
+
+    def check_many(self, passwords: Sequence[str]) -> List[List[str]]:
+        """
+        Check a list of passwords, classifying them all in one pass.
+        """
+        if not passwords:
+            return []
+        messages = self._messages
+        return [list(messages[key]) for key in self._keys(passwords)]
+
+    def validate(self, password: str) -> Tuple[bool, str]:
+        """
+        Validate one password, returning (is_valid, error_message).
+        """
+        key = self._key(password)
+        return key == 0, self._errors[key]
+
+    def validate_many(self, passwords: Sequence[str]) -> List[Tuple[bool, str]]:
+        """
+        Validate a list of passwords, as `validate` does one.
+        """
+        if not passwords:
+            return []
+        errors = self._errors
+        return [(key == 0, errors[key]) for key in self._keys(passwords)]
+
+# Create global instance
+password_policy = PasswordPolicy(
+    min_length=settings.PASSWORD_MIN_LENGTH,
+    max_length=settings.PASSWORD_MAX_LENGTH,
+    required=settings.PASSWORD_REQUIRED_CLASSES
+)
+
 def validate_password(password: str) -> Tuple[bool, str]:
     """
-    Validate password strength.
-    Returns (is_valid, error_message).
-    """
-    if len(password) < 8:
-        return False, "Password must be at least 8 characters long"
-    
-    if not any(c.isupper() for c in password):
-        return False, "Password must contain at least one uppercase letter"
-    
-    if not any(c.islower() for c in password):
-        return False, "Password must contain at least one lowercase letter"
-    
-    if not any(c.isdigit() for c in password):
-        return False, "Password must contain at least one number"
-    
-    if not any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
-        return False, "Password must contain at least one special character"
-    
-    return True, ""
+    Validate password strength against the configured policy.
+    Returns (is_valid, error_message); the message lists every violation.
+    """
+    return password_policy.validate(password)
@@ -0,0 +1,25 @@
+"""
+Pluggable storage backends for note bodies.
+"""
+from typing import Optional
+from app.core.config import settings
+from .base import BodyStore
+from .log import LogStructuredBodyStore
+from .memory import MemoryBodyStore
+
+def create_body_store(backend: Optional[str]) -> Optional[BodyStore]:
+    """
+    Create the configured body store.
+    None keeps note bodies in the notes table.
+    """
+    if not backend:
+        return None
+    if backend == "log":
+        return LogStructuredBodyStore(
+            settings.BODY_STORE_PATH,
+            segment_size=settings.BODY_STORE_SEGMENT_SIZE,
+            fsync=settings.BODY_STORE_FSYNC
+        )
+    if backend == "memory":
+        return MemoryBodyStore()
+    raise ValueError(f"Unknown body store backend: {backend}")
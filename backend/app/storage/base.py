@@ -0,0 +1,44 @@
+"""
+Body storage backend interface.
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional
+
+class BodyStore(ABC):
+    """
+    Key-value store for large note bodies, kept out of the relational rows.
+    Values are bytes; reads may return zero-copy views.
+    """
+    @abstractmethod
+    async def get(self, key: str) -> Optional[memoryview]:
+        """
+        Get the value stored under a key, or None if there is none.
+        """
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, memoryview]:
+        """
+        Get the values of several keys, skipping missing ones.
+        """
+        values = {}
+        for key in keys:
+            value = await self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    @abstractmethod
+    async def put(self, key: str, value: bytes) -> None:
+        """
+        Store a value, replacing any previous one.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """
+        Remove a key if it exists.
+        """
+
+    async def close(self) -> None:
+        """
+        Release any resources held by the store.
+        """
@@ -0,0 +1,379 @@
+"""
+Log-structured body store.
+
+Values are appended to segment files and located through an in-memory hash
+index of key -> (segment, offset, length), rebuilt at startup from small
+per-segment hint files. Reads return views into memory-mapped segments
+without copying. Overwritten and deleted values become garbage that
+background compaction reclaims by merging the closed segments' live
+records into a single new segment.
+
+Compaction never rewrites a file in place: the merged segment gets a fresh
+id that sorts after its inputs, is published together with its hint, and
+only then are the inputs unlinked, oldest first. A crash at any point
+leaves segments that replay to the same state.
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from .base import BodyStore
+
+# crc32, key length, value length, flags; the crc covers everything after itself
+RECORD_HEADER = struct.Struct("<IIIB")
+# key length, value offset, value length, flags
+HINT_HEADER = struct.Struct("<IQIB")
+# Id and size of the segment the hint describes, crc32 of the entries that follow
+HINT_FILE_HEADER = struct.Struct("<IQI")
+TOMBSTONE = 1
+
+# Don't bother compacting less garbage than this
+MIN_COMPACT_BYTES = 1024 * 1024
+
+class Segment:
+    """
+    One append-only segment file and its memory map.
+    """
+    def __init__(self, path: Path, segment_id: int):
+        self.path = path
+        self.id = segment_id
+        self.size = path.stat().st_size if path.exists() else 0
+        self.dead_bytes = 0  # Bytes of overwritten or deleted records
+        self._map: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """
+        Get a zero-copy view of part of the segment, remapping if the file grew.
+        """
+        if length == 0:
+            return memoryview(b"")
+
+        end = offset + length
+        mapped = self._map
+        if mapped is None or len(mapped) < end:
+            with self._lock:
+                mapped = self._map
+                if mapped is None or len(mapped) < end:
+                    with open(self.path, "rb") as segment_file:
+                        mapped = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+                    # The old map stays alive as long as views into it exist
+                    self._map = mapped
+        return memoryview(mapped)[offset:end]
+
+IndexEntry = Tuple[Segment, int, int]  # (segment, value offset, value length)
+
+def _record(key: bytes, value: bytes, flags: int = 0) -> bytes:
+    header = RECORD_HEADER.pack(0, len(key), len(value), flags)
+    crc = zlib.crc32(value, zlib.crc32(key, zlib.crc32(header[4:])))
+    return RECORD_HEADER.pack(crc, len(key), len(value), flags) + key + value
+
+def _record_size(key: bytes, length: int) -> int:
+    return RECORD_HEADER.size + len(key) + length
+
+class LogStructuredBodyStore(BodyStore):
+    """
+    Append-only segment files with an in-memory hash index.
+    A single process owns a store directory.
+    """
+    def __init__(
+        self,
+        path: str,
+        segment_size: int = 64 * 1024 * 1024,
+        fsync: bool = True,
+        compact_ratio: float = 0.5
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.compact_ratio = compact_ratio
+
+        self._lock = threading.Lock()  # Guards appends, rolls and index swaps
+        self._index: Dict[bytes, IndexEntry] = {}
+        self._segments: Dict[int, Segment] = {}
+        self._active_entries: List[Tuple[bytes, int, int, int]] = []  # Hint data for the active segment
+        self._compaction: Optional[threading.Thread] = None
+        self._open()
+
+    # Startup
+
+    def _segment_path(self, segment_id: int, suffix: str = ".log") -> Path:
+        return self.path / f"segment-{segment_id:08d}{suffix}"
+
+    def _open(self) -> None:
+        for leftover in self.path.glob("*.compact"):
+            leftover.unlink()  # Interrupted compaction
+
+        segment_ids = sorted(int(path.stem.split("-")[1]) for path in self.path.glob("segment-*.log"))
+        entries = []
+        hint = None
+        for segment_id in segment_ids:
+            segment = Segment(self._segment_path(segment_id), segment_id)
+            self._segments[segment_id] = segment
+            hint_path = self._segment_path(segment_id, ".hint")
+            hint = self._read_hint(hint_path, segment)
+            entries = list(self._scan(segment) if hint is None else hint)
+            if hint is None and segment_id != segment_ids[-1]:
+                self._write_hint(hint_path, segment_id, segment.size, entries)
+            for key, offset, length, flags in entries:
+                self._apply(segment, key, offset, length, flags)
+
+        last_id = segment_ids[-1] if segment_ids else 0
+        if last_id and hint is None:
+            # Keep appending to the unfinished segment
+            self._active = self._segments[last_id]
+            self._active_entries = entries
+        else:
+            self._active = self._new_segment(last_id + 1)
+        self._fd = os.open(self._active.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _new_segment(self, segment_id: int) -> Segment:
+        segment = Segment(self._segment_path(segment_id), segment_id)
+        segment.path.touch()
+        self._segments[segment_id] = segment
+        return segment
+
+    def _scan(self, segment: Segment) -> Iterator[Tuple[bytes, int, int, int]]:
+        """
+        Read (key, value offset, value length, flags) from a segment's records,
+        truncating a torn or corrupt tail.
+        """
+        with open(segment.path, "rb") as segment_file:
+            data = segment_file.read()
+
+        position = 0
+        while position + RECORD_HEADER.size <= len(data):
+            crc, key_length, value_length, flags = RECORD_HEADER.unpack_from(data, position)
+            key_start = position + RECORD_HEADER.size
+            value_start = key_start + key_length
+            end = value_start + value_length
+            if end > len(data) or zlib.crc32(data[position + 4:end]) != crc:
+                break
+            yield data[key_start:value_start], value_start, value_length, flags
+            position = end
+
+        if position < len(data):
+            os.truncate(segment.path, position)
+            segment.size = position
+
+    def _read_hint(self, hint: Path, segment: Segment) -> Optional[List[Tuple[bytes, int, int, int]]]:
+        """
+        Read a segment's hint entries, or None when the hint is missing, torn,
+        or was written for a different version of the segment.
+        """
+        if not hint.exists():
+            return None
+        data = hint.read_bytes()
+        if len(data) < HINT_FILE_HEADER.size:
+            return None
+        segment_id, size, crc = HINT_FILE_HEADER.unpack_from(data)
+        if (
+            segment_id != segment.id
+            or size != segment.size
+            or zlib.crc32(data[HINT_FILE_HEADER.size:]) != crc
+        ):
+            return None
+
+        entries = []
+        position = HINT_FILE_HEADER.size
+        while position < len(data):
+            key_length, offset, length, flags = HINT_HEADER.unpack_from(data, position)
+            position += HINT_HEADER.size
+            entries.append((data[position:position + key_length], offset, length, flags))
+            position += key_length
+        return entries
+
+    def _write_hint(
+        self, path: Path, segment_id: int, size: int, entries: Iterable[Tuple[bytes, int, int, int]]
+    ) -> None:
+        body = b"".join(
+            HINT_HEADER.pack(len(key), offset, length, flags) + key
+            for key, offset, length, flags in entries
+        )
+        with open(path, "wb") as hint:
+            hint.write(HINT_FILE_HEADER.pack(segment_id, size, zlib.crc32(body)) + body)
+            hint.flush()
+            os.fsync(hint.fileno())
+
+    def _sync_directory(self) -> None:
+        # Make renames and unlinks in the store directory durable
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _apply(self, segment: Segment, key: bytes, offset: int, length: int, flags: int) -> None:
+        old = self._index.pop(key, None)
+        if old is not None:
+            old[0].dead_bytes += _record_size(key, old[2])
+        if flags & TOMBSTONE:
+            segment.dead_bytes += _record_size(key, length)
+        else:
+            self._index[key] = (segment, offset, length)
+
+    # Reads
+
+    def view(self, key: str) -> Optional[memoryview]:
+        """
+        Get a zero-copy view of a value.
+        """
+        entry = self._index.get(key.encode())
+        if entry is None:
+            return None
+        segment, offset, length = entry
+        return segment.view(offset, length)
+
+    async def get(self, key: str) -> Optional[memoryview]:
+        return self.view(key)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, memoryview]:
+        values = {}
+        for key in keys:
+            value = self.view(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    # Writes
+
+    def _write(self, key: str, value: bytes, flags: int) -> None:
+        key_bytes = key.encode()
+        record = _record(key_bytes, value, flags)
+        with self._lock:
+            segment = self._active
+            os.write(self._fd, record)
+            if self.fsync:
+                os.fsync(self._fd)
+            offset = segment.size + RECORD_HEADER.size + len(key_bytes)
+            segment.size += len(record)
+            self._apply(segment, key_bytes, offset, len(value), flags)
+            self._active_entries.append((key_bytes, offset, len(value), flags))
+
+            if segment.size >= self.segment_size:
+                self._roll()
+            self._maybe_compact()
+
+    def _roll(self, skip: int = 0) -> None:
+        """
+        Close the active segment with a hint file and start a new one,
+        leaving `skip` ids free in between.
+        """
+        os.close(self._fd)
+        self._write_hint(
+            self._segment_path(self._active.id, ".hint"), self._active.id, self._active.size,
+            self._active_entries
+        )
+        self._active_entries = []
+        self._active = self._new_segment(self._active.id + 1 + skip)
+        self._fd = os.open(self._active.path, os.O_WRONLY | os.O_APPEND, 0o644)
+
+    async def put(self, key: str, value: bytes) -> None:
+        await run_in_threadpool(self._write, key, value, 0)
+
+    async def delete(self, key: str) -> None:
+        if key.encode() in self._index:
+            await run_in_threadpool(self._write, key, b"", TOMBSTONE)
+
+    async def close(self) -> None:
+        if self._compaction is not None:
+            await run_in_threadpool(self._compaction.join)
+        with self._lock:
+            os.close(self._fd)
+
+    # Compaction
+
+    def garbage_ratio(self) -> float:
+        """
+        Share of the closed segments' bytes held by dead records.
+        """
+        closed = [segment for segment in self._segments.values() if segment is not self._active]
+        size = sum(segment.size for segment in closed)
+        return sum(segment.dead_bytes for segment in closed) / size if size else 0.0
+
+    def _maybe_compact(self) -> None:
+        """
+        Start a background compaction when enough garbage has built up.
+        Called with the lock held.
+        """
+        closed = [segment for segment in self._segments.values() if segment is not self._active]
+        garbage = sum(segment.dead_bytes for segment in closed)
+        if (
+            garbage >= MIN_COMPACT_BYTES
+            and self.garbage_ratio() >= self.compact_ratio
+            and (self._compaction is None or not self._compaction.is_alive())
+        ):
+            self._compaction = threading.Thread(target=self.compact, daemon=True)
+            self._compaction.start()
+
+    def compact(self) -> None:
+        """
+        Merge the live records of all closed segments into one segment.
+        The active segment is closed first and its successor started one id
+        further on, so the merged segment's id sorts after every input and
+        before any newer write, keeping replay order at startup unchanged.
+        Writes continue to the new active segment meanwhile.
+        """
+        with self._lock:
+            if self._active.size == 0 and len(self._segments) == 1:
+                return
+            self._roll(skip=1)
+            merged_id = self._active.id - 1
+            inputs = {
+                segment.id: segment
+                for segment in self._segments.values()
+                if segment is not self._active
+            }
+            input_segments = set(inputs.values())
+            live = [(key, entry) for key, entry in self._index.items() if entry[0] in input_segments]
+
+        # Copy live values without holding the lock
+        merged_path = self._segment_path(merged_id, ".compact")
+        hint_path = self._segment_path(merged_id, ".hint.compact")
+        moved: List[Tuple[bytes, IndexEntry, int, int]] = []
+        position = 0
+        with open(merged_path, "wb") as merged_file:
+            for key, entry in live:
+                segment, offset, length = entry
+                record = _record(key, segment.view(offset, length))
+                merged_file.write(record)
+                moved.append((key, entry, position + RECORD_HEADER.size + len(key), length))
+                position += len(record)
+            merged_file.flush()
+            os.fsync(merged_file.fileno())
+        self._write_hint(
+            hint_path, merged_id, position, ((key, offset, length, 0) for key, _, offset, length in moved)
+        )
+
+        # Publish the merged segment before touching any input
+        os.replace(merged_path, self._segment_path(merged_id))
+        os.replace(hint_path, self._segment_path(merged_id, ".hint"))
+        self._sync_directory()
+
+        with self._lock:
+            # Map the inputs first so readers holding old index entries can
+            # still reach them after their files are unlinked
+            for segment in inputs.values():
+                if segment.size:
+                    segment.view(0, segment.size)
+            merged = Segment(self._segment_path(merged_id), merged_id)
+            for key, entry, offset, length in moved:
+                if self._index.get(key) is entry:
+                    self._index[key] = (merged, offset, length)
+                else:
+                    # Overwritten or deleted while compacting
+                    merged.dead_bytes += _record_size(key, length)
+            self._segments[merged_id] = merged
+
+            # Oldest first: a crash part way leaves only inputs newer than
+            # the ones removed, so no removed tombstone can uncover a value
+            for segment_id in sorted(inputs):
+                del self._segments[segment_id]
+                self._segment_path(segment_id).unlink(missing_ok=True)
+                self._segment_path(segment_id, ".hint").unlink(missing_ok=True)
+        self._sync_directory()
@@ -0,0 +1,22 @@
+"""
+In-process body store, standing in for a document database in tests.
+"""
+from typing import Dict, Optional
+from .base import BodyStore
+
+class MemoryBodyStore(BodyStore):
+    """
+    Keeps values in a dict; nothing is persisted.
+    """
+    def __init__(self):
+        self.values: Dict[str, bytes] = {}
+
+    async def get(self, key: str) -> Optional[memoryview]:
+        value = self.values.get(key)
+        return None if value is None else memoryview(value)
+
+    async def put(self, key: str, value: bytes) -> None:
+        self.values[key] = bytes(value)
+
+    async def delete(self, key: str) -> None:
+        self.values.pop(key, None)
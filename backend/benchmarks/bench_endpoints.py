@@ -0,0 +1,85 @@
+"""
+Benchmark read endpoints against a seeded database.
+
+The first run seeds the database and saves a snapshot; later runs with the
+same parameters restore it in seconds.
+
+Usage: python -m benchmarks.bench_endpoints [--users 10000] [--notes-per-user 20] [--requests 500]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+# The app binds its engines at import, so point it at the benchmark database first
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///data/bench/noteko.db")
+os.environ.setdefault("RATE_LIMIT_CALLS", str(10 ** 9))
+
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.database import engine, read_engine
+from app.db.seed import SEED_PASSWORD, SeedConfig, ensure_seeded
+from app.main import app
+
+ENDPOINTS = [
+    "/v1/auth/me",
+    "/v1/notes",
+    "/v1/notes?limit=200",
+    "/v1/notes/tags",
+]
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+async def seeded_email(user_id: int) -> str:
+    async with read_engine.connect() as conn:
+        result = await conn.execute(text("SELECT email FROM users WHERE id = :id"), {"id": user_id})
+        return result.scalar_one()
+
+async def login(client: AsyncClient, user_id: int) -> dict:
+    email = await seeded_email(user_id)
+    response = await client.post("/v1/auth/login", json={"email": email, "password": SEED_PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def run(config: SeedConfig, requests: int, sessions: int) -> None:
+    engine.echo = read_engine.echo = False
+    rng = random.Random(config.seed)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        headers = [await login(client, rng.randint(1, config.users)) for _ in range(sessions)]
+
+        for path in ENDPOINTS:
+            timings = []
+            for index in range(requests):
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers[index % sessions])
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+            print(
+                f"{path:<24} p50 {percentile(timings, 0.5):6.2f}ms "
+                f"p99 {percentile(timings, 0.99):6.2f}ms"
+            )
+
+def main(config: SeedConfig, requests: int, sessions: int, workers: int) -> None:
+    start = time.perf_counter()
+    ensure_seeded(config, settings.DATABASE_URL, workers)
+    print(f"database ready ({config.name}): {time.perf_counter() - start:.1f}s")
+    asyncio.run(run(config, requests, sessions))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--notes-per-user", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=10, help="Distinct users logged in")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    main(
+        SeedConfig(users=args.users, notes_per_user=args.notes_per_user, seed=args.seed),
+        args.requests,
+        args.sessions,
+        args.workers
+    )
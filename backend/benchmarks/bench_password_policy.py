@@ -0,0 +1,70 @@
+"""
+Benchmark password validation: the old per-rule scans against the compiled policy.
+
+Usage: python -m benchmarks.bench_password_policy [--passwords 200000]
+"""
+import argparse
+import random
+import string
+import time
+from typing import List, Tuple
+from app.security.password import PasswordPolicy
+
+def legacy_validate_password(password: str) -> Tuple[bool, str]:
+    """The validator before the compiled policy, one generator pass per rule."""
+    if len(password) < 8:
+        return False, "Password must be at least 8 characters long"
+    if not any(c.isupper() for c in password):
+        return False, "Password must contain at least one uppercase letter"
+    if not any(c.islower() for c in password):
+        return False, "Password must contain at least one lowercase letter"
+    if not any(c.isdigit() for c in password):
+        return False, "Password must contain at least one number"
+    if not any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
+        return False, "Password must contain at least one special character"
+    return True, ""
+
+def candidates(count: int, seed: int = 0) -> List[str]:
+    """Password candidates of realistic length, about half of them valid."""
+    rng = random.Random(seed)
+    alphabets = [string.ascii_lowercase * 4, string.ascii_uppercase, string.digits, "!@#$%&*?", "äöüßéñ"]
+    passwords = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            # One of each class, padded to a valid length
+            chars = [rng.choice(alphabet) for alphabet in alphabets[:4]]
+            chars += rng.choices("".join(alphabets[:4]), k=rng.randint(4, 16))
+        else:
+            pool = "".join(rng.sample(alphabets[:4], k=rng.choice([2, 3, 4])))
+            chars = rng.choices(pool, k=rng.randint(6, 20))
+        if rng.random() < 0.05:
+            chars.append(rng.choice(alphabets[4]))
+        rng.shuffle(chars)
+        passwords.append("".join(chars))
+    return passwords
+
+def measure(label: str, run, baseline: float = 0.0) -> float:
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    speedup = f"{baseline / elapsed:5.1f}x" if baseline else ""
+    print(f"{label:<32} {elapsed * 1000:9.1f}ms {speedup}")
+    return elapsed
+
+def main(count: int) -> None:
+    passwords = candidates(count)
+    policy = PasswordPolicy()
+    assert [valid for valid, _ in map(legacy_validate_password, passwords)] == \
+        [valid for valid, _ in policy.validate_many(passwords)]
+
+    print(f"{count} candidates, {sum(not v for v, _ in policy.validate_many(passwords))} invalid")
+    baseline = measure("legacy validate_password", lambda: [legacy_validate_password(p) for p in passwords])
+    measure("PasswordPolicy.validate", lambda: [policy.validate(p) for p in passwords], baseline)
+    measure("PasswordPolicy.validate_many", lambda: policy.validate_many(passwords), baseline)
+    measure("PasswordPolicy.check_many", lambda: policy.check_many(passwords), baseline)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--passwords", type=int, default=200_000)
+    args = parser.parse_args()
+    main(args.passwords)
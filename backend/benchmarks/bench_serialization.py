@@ -0,0 +1,79 @@
+"""
+Benchmark CPU time and payload size of note list responses per encoding.
+
+Usage: python -m benchmarks.bench_serialization [--notes 100 1000 10000]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.core import serialization
+from app.core.serialization import MSGPACK, NegotiatedResponse
+from app.schemas import NoteResponse
+
+def synthetic_rows(count: int, seed: int = 0) -> List[dict]:
+    """Generate note rows shaped like the list endpoint's query results."""
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(5_000)]
+    created = datetime(2024, 1, 1)
+    rows = []
+    for note_id in range(count, 0, -1):
+        created += timedelta(seconds=rng.randint(1, 3600))
+        rows.append({
+            "id": note_id,
+            "title": " ".join(rng.choices(words, k=rng.randint(2, 8))),
+            "body": " ".join(rng.choices(words, k=int(rng.lognormvariate(4.5, 0.6)))),
+            "tags": sorted(set(rng.choices(words[:50], k=rng.randint(0, 4)))),
+            "created_at": created,
+            "updated_at": created + timedelta(minutes=rng.randint(0, 600)),
+        })
+    return rows
+
+field = create_response_field(name="response", type_=List[NoteResponse])
+
+def default_path(rows: List[dict]) -> bytes:
+    """Model objects re-validated and encoded by FastAPI, as before."""
+    notes = [NoteResponse(**row) for row in rows]
+    content = asyncio.run(serialize_response(field=field, response_content=notes))
+    return JSONResponse(content).body
+
+def orjson_path(rows: List[dict]) -> bytes:
+    return NegotiatedResponse(rows).body
+
+def msgpack_path(rows: List[dict]) -> bytes:
+    token = serialization._response_format.set(MSGPACK)
+    try:
+        return NegotiatedResponse(rows).body
+    finally:
+        serialization._response_format.reset(token)
+
+def measure(encode, rows: List[dict], repeat: int):
+    encode(rows)  # Warm up
+    start = time.process_time()
+    for _ in range(repeat):
+        body = encode(rows)
+    return (time.process_time() - start) / repeat, len(body)
+
+def main(counts: List[int]) -> None:
+    print(f"{'notes':>7} {'encoding':<22} {'cpu/response':>13} {'payload':>12}")
+    for count in counts:
+        rows = synthetic_rows(count)
+        repeat = max(3, 20_000 // count)
+        for name, encode in (
+            ("pydantic + json", default_path),
+            ("rows + orjson", orjson_path),
+            ("rows + msgpack", msgpack_path),
+        ):
+            cpu, size = measure(encode, rows, repeat)
+            print(f"{count:>7} {name:<22} {cpu * 1000:>11.2f}ms {size / 1024:>10.1f}KB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--notes", type=int, nargs="+", default=[100, 1_000, 10_000])
+    args = parser.parse_args()
+    main(args.notes)
@@ -0,0 +1,58 @@
+"""
+Benchmark related-notes queries on a large synthetic index.
+
+Usage: python -m benchmarks.bench_similarity [--notes 100000]
+"""
+import argparse
+import itertools
+import random
+import tempfile
+import time
+from pathlib import Path
+from app.notes.similarity import UserIndex
+
+def synthetic_notes(count: int, seed: int = 0):
+    """Generate notes drawing words from a Zipf-like vocabulary."""
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(50_000)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    for note_id in range(1, count + 1):
+        length = int(rng.lognormvariate(4.5, 0.6))
+        yield note_id, " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=max(length, 5)))
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+def main(count: int, queries: int) -> None:
+    with tempfile.TemporaryDirectory() as root:
+        path = Path(root) / "1"
+        start = time.perf_counter()
+        UserIndex.build(path, synthetic_notes(count))
+        print(f"build {count} notes: {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index = UserIndex(path)
+        print(f"load (mmap): {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        rng = random.Random(1)
+        for name, run in (
+            ("related", lambda: index.related(rng.randint(1, count), k=10)),
+            ("similar", lambda: index.similar("word3 word17 word250 word4000", k=10)),
+        ):
+            timings = []
+            for _ in range(queries):
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            print(
+                f"{name}: p50 {percentile(timings, 0.5):.2f}ms "
+                f"p99 {percentile(timings, 0.99):.2f}ms"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--notes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    main(args.notes, args.queries)
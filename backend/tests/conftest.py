@@ -3,14 +3,20 @@ Test configuration and fixtures.
 """
 import pytest
 import asyncio
+import uuid
 from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
+from httpx import AsyncClient, ASGITransport
 
 from app.main import app
-from app.db.database import Base, get_db
+from app.db.database import Base, get_db, get_read_db
 from app.models.user import User
+from app.models.note import Note, NoteLink
+from app.models.tag import Tag
+from app.models.shard import UserShard, IdSequence
+from app.security.admission import rate_limit_budget
 
 # Use in-memory SQLite for testing
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -57,5 +63,33 @@ async def override_get_db(test_session):
             await test_session.close()
     
     app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_read_db] = _override_get_db
     yield
     app.dependency_overrides.clear()
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Start every test with full rate limit budgets."""
+    rate_limit_budget.reset()
+    yield
+
+@pytest.fixture
+async def async_client(override_get_db):
+    """Async client fixture."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test"
+    ) as client:
+        yield client
+
+@pytest.fixture
+async def auth_headers(async_client):
+    """Register and log in a fresh user, returning bearer headers."""
+    credentials = {
+        "email": f"user-{uuid.uuid4().hex[:12]}@example.com",
+        "password": "Test123!@#"
+    }
+    await async_client.post("/v1/auth/register", json=credentials)
+    response = await async_client.post("/v1/auth/login", json=credentials)
+    
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
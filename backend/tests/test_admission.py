@@ -0,0 +1,83 @@
+"""
+Tests for admission control.
+"""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.security.admission import CostBudget, ConcurrencyLimiter, rate_limit_budget
+
+def test_budget_charges_route_cost():
+    """Test that expensive requests drain the budget faster."""
+    budget = CostBudget(capacity=10, period=10)
+    assert budget.charge(["ip:a"], 5, now=0) == 0
+    assert budget.charge(["ip:a"], 5, now=0) == 0
+    retry_after = budget.charge(["ip:a"], 5, now=0)
+    assert retry_after == pytest.approx(5)
+    
+    # Refills at capacity / period units per second
+    assert budget.charge(["ip:a"], 5, now=5) == 0
+
+def test_budget_checks_every_key():
+    """Test that a request is rejected if any of its keys is exhausted."""
+    budget = CostBudget(capacity=10, period=10)
+    assert budget.charge(["ip:a", "user:1"], 10, now=0) == 0
+    
+    # Same user from a different IP is still limited
+    assert budget.charge(["ip:b", "user:1"], 1, now=0) > 0
+    # And the rejected request did not charge the new IP
+    assert budget.charge(["ip:b"], 10, now=0) == 0
+
+async def test_limiter_caps_concurrency():
+    """Test that the limiter runs at most `limit` operations at once."""
+    limiter = ConcurrencyLimiter(limit=2, max_queue=10, timeout=1)
+    running = 0
+    peak = 0
+    
+    async def work():
+        nonlocal running, peak
+        async with limiter:
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+    
+    await asyncio.gather(*(work() for _ in range(8)))
+    assert peak == 2
+    assert limiter.active == 0
+
+async def test_limiter_rejects_when_queue_full():
+    """Test fast 503 with Retry-After when the wait queue is full."""
+    limiter = ConcurrencyLimiter(limit=1, max_queue=1, timeout=1)
+    await limiter.acquire()
+    queued = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.acquire()
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "1"
+    
+    limiter.release()
+    await queued
+    limiter.release()
+    assert limiter.active == 0
+
+async def test_limiter_deadline():
+    """Test that queued callers give up after the deadline."""
+    limiter = ConcurrencyLimiter(limit=1, max_queue=5, timeout=0.01)
+    await limiter.acquire()
+    
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.acquire()
+    assert exc_info.value.status_code == 503
+    
+    limiter.release()
+    assert limiter.active == 0
+
+async def test_rate_limit_returns_retry_after(async_client):
+    """Test that exhausted budgets return 429 with Retry-After."""
+    rate_limit_budget.charge(["ip:127.0.0.1"], rate_limit_budget.capacity)
+    
+    response = await async_client.get("/")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
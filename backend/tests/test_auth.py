@@ -3,6 +3,8 @@ Tests for authentication endpoints.
 """
 import pytest
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.db.database import get_read_db
 from app.main import app
 
 pytestmark = pytest.mark.asyncio
@@ -53,6 +55,24 @@ async def test_register_duplicate_email(async_client):
     assert response.status_code == 400
     assert "Email already registered" in response.json()["detail"]
 
+async def test_pool_timeout_is_503(async_client):
+    """Test that running out of database connections answers 503, not 500."""
+    async def exhausted():
+        raise PoolTimeoutError("QueuePool limit reached")
+        yield
+
+    override = app.dependency_overrides[get_read_db]
+    app.dependency_overrides[get_read_db] = exhausted
+    try:
+        response = await async_client.post(
+            "/v1/auth/register",
+            json={"email": "busy@example.com", "password": "Test123!@#"}
+        )
+    finally:
+        app.dependency_overrides[get_read_db] = override
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
 async def test_login_success(async_client):
     """Test successful login."""
     # Register user first
@@ -0,0 +1,89 @@
+"""
+Tests for the batch endpoint.
+"""
+import pytest
+from app.api.v1.batch import dispatch
+from app.core.config import settings
+from app.main import app
+from app.schemas import BatchSubRequest
+from app.security.admission import rate_limit_budget
+
+@pytest.fixture(autouse=True)
+def sequential_batches(monkeypatch):
+    """Run sub-requests one at a time; the test database shares one session."""
+    monkeypatch.setattr(settings, "BATCH_CONCURRENCY", 1)
+
+async def test_batch(async_client, auth_headers):
+    """Test running several sub-requests in one call."""
+    response = await async_client.post("/v1/batch", headers=auth_headers, json={
+        "requests": [
+            {"path": "/v1/auth/me"},
+            {"method": "POST", "path": "/v1/notes", "body": {"title": "Batched", "tags": ["mobile"]}},
+            {"path": "/v1/notes?tag=mobile"},
+            {"path": "/v1/notes/999999"}
+        ]
+    })
+    assert response.status_code == 200
+    me, created, listed, missing = response.json()["responses"]
+
+    assert me["status"] == 200 and "@example.com" in me["body"]["email"]
+    assert created["status"] == 201
+    assert listed["status"] == 200
+    assert [note["id"] for note in listed["body"]] == [created["body"]["id"]]
+    assert missing["status"] == 404
+    assert missing["body"] == {"detail": "Note not found"}
+
+async def test_batch_verifies_token_once(async_client, auth_headers, monkeypatch):
+    """Test that sub-requests reuse the batch's verified token."""
+    from app.security import middleware
+
+    calls = []
+    verify_token = middleware.verify_token
+    monkeypatch.setattr(middleware, "verify_token", lambda token: calls.append(token) or verify_token(token))
+
+    response = await async_client.post("/v1/batch", headers=auth_headers, json={
+        "requests": [{"path": "/v1/auth/me"}, {"path": "/v1/notes"}, {"path": "/v1/notes/tags"}]
+    })
+    assert [sub["status"] for sub in response.json()["responses"]] == [200, 200, 200]
+    assert len(calls) == 1
+
+async def test_batch_rejects_bad_token(async_client):
+    """Test that a batch with an invalid bearer token is rejected up front."""
+    response = await async_client.post(
+        "/v1/batch",
+        headers={"Authorization": "Bearer invalid"},
+        json={"requests": [{"path": "/v1/auth/me"}]}
+    )
+    assert response.status_code == 401
+
+async def test_batch_rejects_nesting(async_client, auth_headers):
+    """Test that batches can't contain batches."""
+    response = await async_client.post("/v1/batch", headers=auth_headers, json={
+        "requests": [{"method": "POST", "path": "/v1/batch", "body": {"requests": []}}]
+    })
+    assert response.status_code == 422
+
+    for path in ("/v1/%62atch", "/v1/notes/../batch", "/v1//batch/?x=1"):
+        response = await async_client.post("/v1/batch", headers=auth_headers, json={
+            "requests": [{"method": "POST", "path": path, "body": {"requests": []}}]
+        })
+        assert response.status_code == 422, path
+
+    # Sub-requests that bypassed validation are refused when dispatched
+    sub = BatchSubRequest.model_construct(method="POST", path="/v1/%62atch", headers={}, body={"requests": []})
+    result = await dispatch(app, {"type": "http", "asgi": {}, "headers": []}, sub, {})
+    assert result.status == 400
+
+async def test_sub_requests_are_rate_limited(async_client, auth_headers):
+    """Test that every sub-request is charged against the rate limits."""
+    rate_limit_budget.reset()
+    # Leave room for the batch itself and three sub-requests
+    rate_limit_budget.charge(["ip:127.0.0.1"], settings.RATE_LIMIT_CALLS - 4)
+
+    response = await async_client.post("/v1/batch", headers=auth_headers, json={
+        "requests": [{"path": "/v1/notes/tags"}] * 5
+    })
+    assert response.status_code == 200
+    statuses = [sub["status"] for sub in response.json()["responses"]]
+    assert statuses.count(200) == 3
+    assert statuses.count(429) == 2
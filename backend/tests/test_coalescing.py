@@ -0,0 +1,134 @@
+"""
+Tests for coalescing identical concurrent reads.
+"""
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from app.core.coalescing import CoalescingMiddleware
+from app.security import create_access_token, verify_token
+
+class Backend:
+    """Endpoint counting its runs, held open until released."""
+    def __init__(self, status_code=200, fail=False):
+        self.runs = 0
+        self.status_code = status_code
+        self.fail = fail
+        self.release = asyncio.Event()
+
+    async def read(self, request):
+        self.runs += 1
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        sub = verify_token(request.headers["authorization"][7:])["sub"]
+        return JSONResponse(
+            {"sub": sub, "run": self.runs, "query": str(request.query_params)},
+            status_code=self.status_code
+        )
+
+    async def write(self, request):
+        return JSONResponse({"ok": True})
+
+@pytest.fixture
+def backend():
+    return Backend()
+
+def client_for(backend, ttl=0.0):
+    app = Starlette(routes=[
+        Route("/items", backend.read),
+        Route("/items", backend.write, methods=["POST"]),
+    ])
+    transport = ASGITransport(app=CoalescingMiddleware(app, ttl=ttl, enabled=True), raise_app_exceptions=False)
+    return AsyncClient(transport=transport, base_url="http://test")
+
+def headers(sub):
+    return {"Authorization": f"Bearer {create_access_token({'sub': sub})}"}
+
+async def burst(client, backend, requests):
+    """Send requests concurrently and release the backend once all are waiting."""
+    tasks = [asyncio.create_task(client.get(path, headers=hdrs)) for path, hdrs in requests]
+    await asyncio.sleep(0.05)
+    backend.release.set()
+    return await asyncio.gather(*tasks)
+
+async def test_identical_reads_share_one_run(backend):
+    """Test that concurrent identical GETs run once and get the same response."""
+    async with client_for(backend) as client:
+        responses = await burst(client, backend, [("/items", headers("1"))] * 5 + [("/items?page=2", headers("1"))])
+
+    assert backend.runs == 2
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.text for response in responses[:5]}) == 1
+    assert responses[5].json()["query"] == "page=2"
+
+async def test_users_are_isolated(backend):
+    """Test that different users never share a response."""
+    async with client_for(backend) as client:
+        responses = await burst(client, backend, [("/items", headers("1")), ("/items", headers("2"))] * 3)
+
+    assert backend.runs == 2
+    assert [response.json()["sub"] for response in responses] == ["1", "2"] * 3
+
+    # Anonymous requests are never coalesced
+    async with client_for(backend) as client:
+        backend.release.clear()
+        runs = backend.runs
+        await burst(client, backend, [("/items", {})] * 3)
+    assert backend.runs == runs + 3
+
+async def test_profile_token_is_part_of_the_key(backend):
+    """Test that a read without the X-Profile token never gets a profiled read's response."""
+    async with client_for(backend, ttl=60) as client:
+        profiled = {**headers("1"), "X-Profile": "signed-token"}
+        responses = await burst(client, backend, [("/items", profiled), ("/items", headers("1"))])
+        assert backend.runs == 2
+        assert (await client.get("/items", headers=headers("1"))).json()["run"] == responses[1].json()["run"]
+
+@pytest.mark.parametrize("backend", [Backend(status_code=503), Backend(fail=True)])
+async def test_errors_are_shared_not_cached(backend):
+    """Test that a failing leader's error reaches its followers but isn't reused."""
+    async with client_for(backend, ttl=60) as client:
+        responses = await burst(client, backend, [("/items", headers("1"))] * 4)
+        assert backend.runs == 1
+        assert {response.status_code for response in responses} == {503 if backend.status_code == 503 else 500}
+
+        await client.get("/items", headers=headers("1"))
+        assert backend.runs == 2
+
+async def test_results_reused_until_user_writes(backend):
+    """Test the result TTL and invalidation by the user's own writes."""
+    backend.release.set()
+    async with client_for(backend, ttl=60) as client:
+        first = await client.get("/items", headers=headers("1"))
+        assert (await client.get("/items", headers=headers("1"))).json() == first.json()
+        assert backend.runs == 1
+
+        await client.post("/items", headers=headers("2"))
+        assert (await client.get("/items", headers=headers("1"))).json() == first.json()
+
+        await client.post("/items", headers=headers("1"))
+        assert (await client.get("/items", headers=headers("1"))).json()["run"] == 2
+
+async def test_cancelled_leader_hands_over(backend):
+    """Test that a follower takes over when the leader's client goes away."""
+    async with client_for(backend) as client:
+        leader = asyncio.create_task(client.get("/items", headers=headers("1")))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(client.get("/items", headers=headers("1")))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        await asyncio.sleep(0.05)
+        backend.release.set()
+        response = await follower
+
+    assert response.status_code == 200
+    assert backend.runs == 2
+
+async def test_reconnect_storm_on_api(async_client, auth_headers):
+    """Test that a burst of identical API reads all succeed."""
+    responses = await asyncio.gather(*(async_client.get("/v1/auth/me", headers=auth_headers) for _ in range(5)))
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.text for response in responses}) == 1
@@ -0,0 +1,53 @@
+"""
+Tests for the embedded SQLite database mode.
+"""
+import asyncio
+import sqlite3
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.db.database import create_engines, is_embedded, run_migrations
+
+def test_is_embedded():
+    """Test detection of file-backed SQLite URLs."""
+    assert is_embedded("sqlite+aiosqlite:///data/noteko.db")
+    assert not is_embedded("sqlite+aiosqlite:///:memory:")
+    assert not is_embedded("postgresql+asyncpg://postgres:postgres@db:5432/noteko")
+
+def test_migrations_run_on_sqlite(tmp_path):
+    """Test that the full migration history applies to a fresh SQLite file."""
+    path = tmp_path / "noteko.db"
+    run_migrations(f"sqlite+aiosqlite:///{path}")
+    
+    with sqlite3.connect(path) as conn:
+        tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"users", "notes", "tags", "note_tags", "note_links", "alembic_version"} <= tables
+
+async def test_embedded_engines(tmp_path):
+    """Test connection tuning, the single writer and read-only readers."""
+    writer, reader = create_engines(f"sqlite+aiosqlite:///{tmp_path / 'noteko.db'}")
+    try:
+        async with writer.begin() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1  # NORMAL
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+            await conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+            await conn.execute(text("INSERT INTO items VALUES (1)"))
+        
+        async with reader.connect() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM items"))).scalar() == 1
+            with pytest.raises(OperationalError):
+                await conn.execute(text("INSERT INTO items VALUES (2)"))
+        
+        # Writers queue for the single connection instead of failing with "database is locked"
+        async def write(item_id):
+            async with writer.begin() as conn:
+                await conn.execute(text("INSERT INTO items VALUES (:id)"), {"id": item_id})
+                await asyncio.sleep(0.01)
+        
+        await asyncio.gather(*(write(item_id) for item_id in range(10, 20)))
+        async with reader.connect() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM items"))).scalar() == 11
+    finally:
+        await writer.dispose()
+        await reader.dispose()
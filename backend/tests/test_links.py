@@ -0,0 +1,108 @@
+"""
+Tests for [[wiki link]] backlinks and the local graph.
+"""
+from sqlalchemy import event, select
+from app.models.note import NoteLink
+from app.notes.links import parse_links
+
+async def create_note(client, headers, title, body=""):
+    response = await client.post(
+        "/v1/notes",
+        json={"title": title, "body": body},
+        headers=headers
+    )
+    assert response.status_code == 201
+    return response.json()
+
+def test_parse_links():
+    """Test link extraction with aliases, headings and spacing."""
+    body = "See [[Project  Plan]], [[project plan|the plan]] and [[Ideas#Later]]. Not [[ ]] or [single]."
+    assert parse_links(body) == {"project plan", "ideas"}
+    assert parse_links("no links here") == set()
+
+async def test_backlinks(async_client, auth_headers):
+    """Test that backlinks resolve by title, including notes created later."""
+    source = await create_note(async_client, auth_headers, "Journal", "Worked on [[Roadmap]]")
+    target = await create_note(async_client, auth_headers, "roadmap")
+    
+    response = await async_client.get(f"/v1/notes/{target['id']}/backlinks", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == [{"id": source["id"], "title": "Journal"}]
+    
+    # Removing the link removes the backlink
+    await async_client.patch(
+        f"/v1/notes/{source['id']}",
+        json={"body": "Nothing linked"},
+        headers=auth_headers
+    )
+    response = await async_client.get(f"/v1/notes/{target['id']}/backlinks", headers=auth_headers)
+    assert response.json() == []
+
+async def test_update_writes_only_changed_edges(async_client, auth_headers, test_session, test_engine):
+    """Test that edges are diffed rather than rewritten."""
+    note = await create_note(async_client, auth_headers, "Hub", "[[A]] [[B]]")
+
+    writes = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(("INSERT INTO note_links", "DELETE FROM note_links")):
+            rows = parameters if executemany else [parameters]
+            writes.append((statement.split()[0], {value for row in rows for value in row}))
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        await async_client.patch(
+            f"/v1/notes/{note['id']}",
+            json={"body": "[[B]] [[C]]"},
+            headers=auth_headers
+        )
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+    # The unchanged edge to B is neither deleted nor re-inserted
+    assert [(kind, values & {"a", "b", "c"}) for kind, values in writes] == [
+        ("DELETE", {"a"}),
+        ("INSERT", {"c"})
+    ]
+    result = await test_session.execute(
+        select(NoteLink.target_key).where(NoteLink.source_id == note["id"])
+    )
+    assert sorted(result.scalars().all()) == ["b", "c"]
+
+async def test_local_graph(async_client, auth_headers):
+    """Test bounded BFS over links in both directions."""
+    a = await create_note(async_client, auth_headers, "A", "[[B]]")
+    b = await create_note(async_client, auth_headers, "B", "[[C]]")
+    c = await create_note(async_client, auth_headers, "C")
+    d = await create_note(async_client, auth_headers, "D", "[[A]]")
+    
+    response = await async_client.get(f"/v1/notes/{a['id']}/graph", headers=auth_headers)
+    graph = response.json()
+    assert {node["id"] for node in graph["nodes"]} == {a["id"], b["id"], d["id"]}
+    assert {(edge["source"], edge["target"]) for edge in graph["edges"]} == {
+        (a["id"], b["id"]),
+        (d["id"], a["id"])
+    }
+    
+    response = await async_client.get(f"/v1/notes/{a['id']}/graph?depth=2", headers=auth_headers)
+    graph = response.json()
+    assert {node["id"] for node in graph["nodes"]} == {a["id"], b["id"], c["id"], d["id"]}
+    
+    response = await async_client.get(f"/v1/notes/{a['id']}/graph?depth=2&limit=2", headers=auth_headers)
+    assert len(response.json()["nodes"]) == 2
+
+async def test_graph_with_duplicate_titles(async_client, auth_headers):
+    """Test that links to a title shared by several notes connect to each of them."""
+    hub = await create_note(async_client, auth_headers, "Hub", "[[Twin]]")
+    first = await create_note(async_client, auth_headers, "Twin")
+    second = await create_note(async_client, auth_headers, "twin")
+    other = await create_note(async_client, auth_headers, "Other", "[[Twin]]")
+
+    response = await async_client.get(f"/v1/notes/{hub['id']}/graph?depth=2", headers=auth_headers)
+    graph = response.json()
+    assert {node["id"] for node in graph["nodes"]} == {hub["id"], first["id"], second["id"], other["id"]}
+    assert {(edge["source"], edge["target"]) for edge in graph["edges"]} == {
+        (hub["id"], first["id"]),
+        (hub["id"], second["id"]),
+        (other["id"], first["id"]),
+        (other["id"], second["id"])
+    }
@@ -0,0 +1,74 @@
+"""
+Tests for note endpoints and the tag index.
+"""
+from app.notes.tags import tag_index
+
+async def create_note(client, headers, title, tags, body=""):
+    response = await client.post(
+        "/v1/notes",
+        json={"title": title, "body": body, "tags": tags},
+        headers=headers
+    )
+    assert response.status_code == 201
+    return response.json()
+
+async def test_create_note_normalizes_tags(async_client, auth_headers):
+    """Test that tags are trimmed, lowercased and deduplicated."""
+    note = await create_note(async_client, auth_headers, "Groceries", [" Home ", "home", "TODO"])
+    assert note["tags"] == ["home", "todo"]
+    
+    response = await async_client.get(f"/v1/notes/{note['id']}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["tags"] == ["home", "todo"]
+
+async def test_filter_notes_by_tags(async_client, auth_headers):
+    """Test filtering by one tag and by the intersection of several."""
+    a = await create_note(async_client, auth_headers, "A", ["work", "urgent"])
+    b = await create_note(async_client, auth_headers, "B", ["work"])
+    await create_note(async_client, auth_headers, "C", ["urgent"])
+    
+    response = await async_client.get("/v1/notes?tag=work", headers=auth_headers)
+    assert [note["id"] for note in response.json()] == [b["id"], a["id"]]
+    
+    response = await async_client.get("/v1/notes?tag=work&tag=urgent", headers=auth_headers)
+    assert [note["id"] for note in response.json()] == [a["id"]]
+    
+    response = await async_client.get("/v1/notes?tag=missing", headers=auth_headers)
+    assert response.json() == []
+
+async def test_tag_facets_follow_writes(async_client, auth_headers, test_session):
+    """Test that tag counts are maintained across create, update and delete."""
+    a = await create_note(async_client, auth_headers, "A", ["work", "ideas"])
+    b = await create_note(async_client, auth_headers, "B", ["work"])
+    
+    response = await async_client.get("/v1/notes/tags", headers=auth_headers)
+    assert response.json() == [
+        {"name": "work", "count": 2},
+        {"name": "ideas", "count": 1}
+    ]
+    
+    await async_client.patch(
+        f"/v1/notes/{a['id']}",
+        json={"tags": ["ideas", "later"]},
+        headers=auth_headers
+    )
+    await async_client.delete(f"/v1/notes/{b['id']}", headers=auth_headers)
+    
+    response = await async_client.get("/v1/notes/tags", headers=auth_headers)
+    assert response.json() == [
+        {"name": "ideas", "count": 1},
+        {"name": "later", "count": 1}
+    ]
+    assert await tag_index.check_counts(test_session) == []
+
+async def test_notes_are_private(async_client, auth_headers):
+    """Test that other users cannot read a note."""
+    note = await create_note(async_client, auth_headers, "Secret", [])
+    
+    credentials = {"email": "other-notes@example.com", "password": "Test123!@#"}
+    await async_client.post("/v1/auth/register", json=credentials)
+    login = await async_client.post("/v1/auth/login", json=credentials)
+    other_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    
+    response = await async_client.get(f"/v1/notes/{note['id']}", headers=other_headers)
+    assert response.status_code == 404
@@ -0,0 +1,119 @@
+"""
+Tests for online data migrations.
+"""
+import sqlite3
+from argparse import Namespace
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, select
+from alembic import command
+from alembic.config import Config
+from app.db.database import ALEMBIC_DIR
+from app.db.online_migrations import Backfill, Throttle, checkpoints
+
+metadata = MetaData()
+items = Table(
+    "items",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("value", Integer, nullable=False),
+    Column("doubled", Integer, nullable=True),
+)
+
+@pytest.fixture
+def conn():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    checkpoints.create(engine)
+    with engine.connect() as conn:
+        conn.execute(items.insert(), [{"id": i, "value": i} for i in range(1, 2501)])
+        conn.commit()
+        yield conn
+    engine.dispose()
+
+def no_wait():
+    return Throttle(max_replication_lag=1.0, max_query_latency=10.0, pause=0.0)
+
+def test_backfill_in_batches(conn):
+    """Test that a backfill updates every row in batches and records completion."""
+    backfill = Backfill(
+        "double_items",
+        items,
+        values={"doubled": items.c.value * 2},
+        where=items.c.doubled.is_(None),
+        batch_size=1000,
+        throttle=no_wait()
+    )
+
+    assert backfill.run(conn) == 2500
+    assert conn.execute(select(items).where(items.c.doubled != items.c.value * 2)).first() is None
+
+    checkpoint = backfill.load_checkpoint(conn)
+    assert checkpoint["last_key"] == 2500
+    assert checkpoint["completed_at"] is not None
+    # Completed backfills are not run again
+    assert backfill.run(conn) == 2500
+
+def test_backfill_resumes_from_checkpoint(conn):
+    """Test that an interrupted backfill continues after the last finished batch."""
+    batches = []
+
+    def double(conn, first_key, last_key):
+        if len(batches) == 2:
+            raise RuntimeError("interrupted")
+        batches.append((first_key, last_key))
+        conn.execute(
+            items.update()
+            .where(items.c.id.between(first_key, last_key))
+            .values(doubled=items.c.value * 2)
+        )
+
+    backfill = Backfill("double_items", items, batch=double, batch_size=1000, throttle=no_wait())
+    with pytest.raises(RuntimeError):
+        backfill.run(conn)
+    conn.rollback()
+    assert backfill.load_checkpoint(conn)["last_key"] == 2000
+
+    batches.clear()
+    assert backfill.run(conn) == 2500
+    assert batches == [(2001, 2500)]
+
+def test_estimate_rolls_back(conn):
+    """Test that a dry-run estimate reports the remaining work without changing rows."""
+    backfill = Backfill(
+        "double_items",
+        items,
+        values={"doubled": items.c.value * 2},
+        batch_size=1000,
+        throttle=Throttle(pause=0.5, max_query_latency=10.0)
+    )
+
+    estimate = backfill.estimate(conn)
+    assert estimate.rows == 2500
+    assert estimate.batches == 3
+    assert estimate.seconds >= 1.5
+    conn.commit()
+    assert conn.execute(select(items).where(items.c.doubled.is_not(None))).first() is None
+    assert backfill.load_checkpoint(conn) is None
+
+def test_throttle_backs_off_under_load(conn, monkeypatch):
+    """Test that the throttle waits until the probe latency recovers."""
+    latencies = iter([1.0, 1.0, 0.01])
+    sleeps = []
+    throttle = Throttle(max_query_latency=0.1, pause=0.0, max_backoff=0.15)
+    monkeypatch.setattr(throttle, "query_latency", lambda conn: next(latencies))
+    monkeypatch.setattr("app.db.online_migrations.time.sleep", sleeps.append)
+
+    assert throttle.wait(conn) == pytest.approx(0.25)
+    assert sleeps == [0.1, 0.15]
+
+def test_dry_run_upgrade_rolls_back(tmp_path):
+    """Test that `-x dry_run=true` leaves the database untouched."""
+    path = tmp_path / "noteko.db"
+    config = Config(cmd_opts=Namespace(x=["dry_run=true"]))
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    config.attributes["database_url"] = f"sqlite+aiosqlite:///{path}"
+    command.upgrade(config, "head")
+
+    with sqlite3.connect(path) as conn:
+        tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "users" not in tables
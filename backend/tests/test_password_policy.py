@@ -0,0 +1,85 @@
+"""
+Tests for the compiled password policy.
+"""
+import random
+import pytest
+from app.security import PasswordPolicy, validate_password
+
+def legacy_validate_password(password):
+    """The validator the policy replaced, reporting only the first failure."""
+    if len(password) < 8:
+        return False, "Password must be at least 8 characters long"
+    if not any(c.isupper() for c in password):
+        return False, "Password must contain at least one uppercase letter"
+    if not any(c.islower() for c in password):
+        return False, "Password must contain at least one lowercase letter"
+    if not any(c.isdigit() for c in password):
+        return False, "Password must contain at least one number"
+    if not any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
+        return False, "Password must contain at least one special character"
+    return True, ""
+
+def test_matches_previous_validator():
+    """Test that the default policy accepts and rejects what the old validator did."""
+    rng = random.Random(3)
+    alphabet = "abcXYZ019!?# ~äÖß²€\x00"
+    passwords = ["", "Test123!@#", "ÄÖÜäöü1!", "Ünïcödé²!"] + [
+        "".join(rng.choices(alphabet, k=rng.randint(0, 14))) for _ in range(2000)
+    ]
+    policy = PasswordPolicy()
+    batch = policy.check_many(passwords)
+
+    for password, violations in zip(passwords, batch):
+        valid, message = legacy_validate_password(password)
+        assert violations == policy.check(password)
+        assert (not violations) == valid
+        if not valid:
+            assert violations[0] == message
+
+def test_reports_every_violation():
+    """Test that all broken rules are listed together."""
+    assert validate_password("abc") == (
+        False,
+        "Password must be at least 8 characters long; "
+        "Password must contain at least one uppercase letter; "
+        "Password must contain at least one number; "
+        "Password must contain at least one special character"
+    )
+    assert validate_password("Test123!@#") == (True, "")
+
+def test_configurable_rules():
+    """Test custom lengths, classes, special characters and banned words."""
+    policy = PasswordPolicy(
+        min_length=4,
+        max_length=10,
+        required=["lower", "special"],
+        special_characters="~€",
+        banned=["Pass~word"]
+    )
+    assert policy.check("abc~") == []
+    assert policy.check("abc€") == []
+    assert policy.check("abc!") == ["Password must contain at least one special character"]
+    assert policy.check("abcdefghij~x") == ["Password must be at most 10 characters long"]
+    assert policy.check("PASS~WORD") == [
+        "Password must contain at least one lowercase letter",
+        "Password is too common"
+    ]
+    assert policy.validate_many(["pass~word", "ok~ok"]) == [(False, "Password is too common"), (True, "")]
+
+    with pytest.raises(ValueError):
+        PasswordPolicy(required=["emoji"])
+
+def test_batch_handles_edge_cases():
+    """Test empty batches and passwords the batch separator could confuse."""
+    policy = PasswordPolicy()
+    assert policy.check_many([]) == []
+    passwords = ["", "Test\x00123!@#", "Test123!@#"]
+    assert policy.check_many(passwords) == [policy.check(password) for password in passwords]
+    assert policy.validate_many(passwords)[1:] == [(True, ""), (True, "")]
+
+def test_special_characters_keep_their_class():
+    """Test that a special character which is also a letter counts for both."""
+    policy = PasswordPolicy(min_length=2, special_characters="Aé")
+    assert policy.check("aA") == ["Password must contain at least one number"]
+    assert policy.check("Dé1") == []
+    assert policy.check_many(["aA", "Dé1"]) == [policy.check("aA"), policy.check("Dé1")]
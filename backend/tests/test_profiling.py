@@ -0,0 +1,104 @@
+"""
+Tests for on-demand request profiling.
+"""
+import asyncio
+import time
+import pytest
+from app.profiling import (
+    Profile,
+    StackSampler,
+    create_profile_token,
+    profile_store,
+    to_collapsed,
+    to_speedscope,
+    verify_profile_token
+)
+
+@pytest.fixture(autouse=True)
+def clear_profiles():
+    """Start every test with an empty profile buffer."""
+    profile_store.clear()
+    yield
+
+def test_profile_token():
+    """Test that only fresh, correctly signed tokens are accepted."""
+    token = create_profile_token()
+    assert verify_profile_token(token)
+
+    expires, _, signature = token.partition(".")
+    assert not verify_profile_token(f"{expires}.{'0' * len(signature)}")
+    assert not verify_profile_token(f"{int(expires) + 1}.{signature}")
+    assert not verify_profile_token(create_profile_token(ttl=-1))
+    assert not verify_profile_token("garbage")
+
+async def test_unprofiled_requests(async_client):
+    """Test that requests without a valid header are not profiled."""
+    response = await async_client.get("/")
+    assert "X-Profile-Id" not in response.headers
+
+    response = await async_client.get("/", headers={"X-Profile": create_profile_token(ttl=-1)})
+    assert "X-Profile-Id" not in response.headers
+    assert profile_store.recent() == []
+
+async def test_profile_login(async_client):
+    """Test profiling a login, including its bcrypt work in the thread pool."""
+    credentials = {"email": "profiled@example.com", "password": "Test123!@#"}
+    await async_client.post("/v1/auth/register", json=credentials)
+
+    response = await async_client.post(
+        "/v1/auth/login",
+        json=credentials,
+        headers={"X-Profile": create_profile_token()}
+    )
+    assert response.status_code == 200
+    profile = profile_store.get(response.headers["X-Profile-Id"])
+    assert profile is not None
+    assert profile.status_code == 200
+    assert profile.sample_count > 0
+
+    collapsed = to_collapsed(profile)
+    assert collapsed.startswith("ProfilerMiddleware.__call__")
+    assert "authenticate_user" in collapsed
+    assert "[thread]" in collapsed and "verify_password" in collapsed
+
+async def test_download_profiles(async_client):
+    """Test listing and downloading profiles through the admin endpoints."""
+    headers = {"X-Profile": create_profile_token()}
+    assert (await async_client.get("/v1/admin/profiles")).status_code == 403
+
+    profile_id = (await async_client.get("/", headers=headers)).headers["X-Profile-Id"]
+    response = await async_client.get("/v1/admin/profiles", headers=headers)
+    assert response.status_code == 200
+    assert [profile["id"] for profile in response.json()] == [profile_id]
+
+    response = await async_client.get(f"/v1/admin/profiles/{profile_id}/speedscope", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["profiles"][0]["type"] == "sampled"
+
+    response = await async_client.get(f"/v1/admin/profiles/{profile_id}/collapsed", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    response = await async_client.get("/v1/admin/profiles/missing/collapsed", headers=headers)
+    assert response.status_code == 404
+
+async def test_sampler_sees_awaits_and_stops():
+    """Test await-chain samples and that the sampler thread exits when idle."""
+    sampler = StackSampler(interval=0.001)
+    profile = Profile("GET", "/sleep", sampler.interval)
+
+    async def nap():
+        await asyncio.sleep(0.05)
+
+    sampler.start(profile)
+    await nap()
+    sampler.stop(profile)
+
+    stacks = list(profile.samples)
+    assert any(stack[-1][0] == "[await]" and any(frame[0].endswith("nap") for frame in stack) for stack in stacks)
+
+    speedscope = to_speedscope(profile)
+    assert len(speedscope["profiles"][0]["samples"]) == len(stacks)
+
+    time.sleep(0.01)
+    assert sampler._thread is None
@@ -0,0 +1,117 @@
+"""
+Tests for the synthetic data seeder.
+"""
+import hashlib
+import sqlite3
+import pytest
+from sqlalchemy import func, select
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.sharding import ShardRouter, pin_users
+from app.db.seed import (
+    SEED_PASSWORD,
+    SeedConfig,
+    ensure_seeded,
+    restore_snapshot,
+    save_snapshot,
+    seed
+)
+from app.models.note import Note
+from app.security import verify_password
+
+def digest(path) -> str:
+    """Hash the seeded rows of every table."""
+    content = hashlib.sha256()
+    with sqlite3.connect(path) as conn:
+        for table, key in (("users", "id"), ("notes", "id"), ("tags", "id"),
+                           ("note_tags", "tag_id, note_id"), ("note_links", "source_id, target_key")):
+            for row in conn.execute(f"SELECT * FROM {table} ORDER BY {key}"):
+                content.update(repr(row).encode())
+    return content.hexdigest()
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SEED_SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    return tmp_path / "snapshots"
+
+def test_seed_is_deterministic(tmp_path):
+    """Test that a seed produces the same rows whatever the chunking."""
+    first, second = tmp_path / "first.db", tmp_path / "second.db"
+    counts = seed(SeedConfig(users=60, notes_per_user=5, seed=7, chunk_size=60), f"sqlite+aiosqlite:///{first}")
+    seed(SeedConfig(users=60, notes_per_user=5, seed=7, chunk_size=13), f"sqlite+aiosqlite:///{second}")
+
+    assert counts["users"] == 60 and counts["notes"] > 0
+    assert digest(first) == digest(second)
+
+    other = tmp_path / "other.db"
+    seed(SeedConfig(users=60, notes_per_user=5, seed=8), f"sqlite+aiosqlite:///{other}")
+    assert digest(first) != digest(other)
+
+def test_seeded_data_is_consistent(tmp_path):
+    """Test tag counts, link keys and the shared password of seeded data."""
+    path = tmp_path / "noteko.db"
+    seed(SeedConfig(users=30, notes_per_user=8), f"sqlite+aiosqlite:///{path}")
+
+    with sqlite3.connect(path) as conn:
+        mismatched = conn.execute(
+            "SELECT count(*) FROM tags WHERE note_count != "
+            "(SELECT count(*) FROM note_tags WHERE note_tags.tag_id = tags.id)"
+        ).fetchone()[0]
+        assert mismatched == 0
+        foreign = conn.execute(
+            "SELECT count(*) FROM note_tags JOIN tags ON tags.id = note_tags.tag_id "
+            "JOIN notes ON notes.id = note_tags.note_id WHERE tags.owner_id != notes.owner_id"
+        ).fetchone()[0]
+        assert foreign == 0
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("SELECT count(*) FROM sqlite_master WHERE name = 'ix_tags_owner_id_name'").fetchone()[0] == 1
+        hashed_password, = conn.execute("SELECT hashed_password FROM users LIMIT 1").fetchone()
+
+    assert verify_password(SEED_PASSWORD, hashed_password)
+
+def test_snapshots(tmp_path, snapshot_dir):
+    """Test saving, restoring and reusing snapshots."""
+    path = tmp_path / "noteko.db"
+    url = f"sqlite+aiosqlite:///{path}"
+    config = SeedConfig(users=20, notes_per_user=3)
+
+    ensure_seeded(config, url)
+    assert (snapshot_dir / f"{config.name}.db").exists()
+    seeded = digest(path)
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("DELETE FROM note_links")
+    restore_snapshot(config.name, url)
+    assert digest(path) == seeded
+
+    # A fresh database restores from the snapshot instead of seeding again
+    fresh = tmp_path / "fresh.db"
+    ensure_seeded(config, f"sqlite+aiosqlite:///{fresh}")
+    assert digest(fresh) == seeded
+
+    save_snapshot("manual", url)
+    assert (snapshot_dir / "manual.db").exists()
+
+async def test_sharding_a_seeded_database(tmp_path):
+    """Test that notes created after sharding a seeded database get fresh ids."""
+    path = tmp_path / "noteko.db"
+    url = f"sqlite+aiosqlite:///{path}"
+    await run_in_threadpool(seed, SeedConfig(users=10, notes_per_user=5), url)
+    with sqlite3.connect(path) as conn:
+        max_id = conn.execute("SELECT max(id) FROM notes").fetchone()[0]
+        assert conn.execute("SELECT next_id FROM id_sequences WHERE name = 'notes'").fetchone()[0] == max_id + 1
+        # As for data loaded by other means
+        conn.execute("UPDATE id_sequences SET next_id = 1")
+
+    router = ShardRouter([url], directory_ttl=0)
+    router.directory = router.read_directory = router.shards["shard0"].Session
+    try:
+        assert await pin_users(router, "shard0") == 10
+        note_id = await router.next_id("notes")
+        async with router.shards["shard0"].Session() as session:
+            owner_id = (await session.execute(select(func.min(Note.owner_id)))).scalar_one()
+            session.add(Note(id=note_id, owner_id=owner_id, title="After sharding", body=""))
+            await session.commit()
+        assert note_id == max_id + 1
+    finally:
+        await router.dispose()
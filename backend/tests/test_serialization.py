@@ -0,0 +1,81 @@
+"""
+Tests for response content negotiation.
+"""
+from datetime import date, datetime, timedelta, timezone
+import msgpack
+import orjson
+from pydantic import TypeAdapter
+from app.core.serialization import JSON, MSGPACK, NegotiatedResponse, _response_format, negotiate
+
+def test_negotiate():
+    """Test choosing a response format from the Accept header."""
+    assert negotiate(None) == JSON
+    assert negotiate("*/*") == JSON
+    assert negotiate("application/msgpack") == MSGPACK
+    assert negotiate("application/x-msgpack, application/json;q=0.5") == MSGPACK
+    assert negotiate("application/msgpack;q=0.5, application/json") == JSON
+    assert negotiate("application/msgpack;q=0") == JSON
+
+def test_datetimes_match_pydantic():
+    """Test that both formats write dates and datetimes the way pydantic does."""
+    values = [
+        datetime(2024, 1, 2, 3, 4, 5),
+        datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc),
+        datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=2))),
+        date(2024, 1, 2)
+    ]
+    expected = [TypeAdapter(type(value)).dump_python(value, mode="json") for value in values]
+    assert expected[1].endswith("Z")
+    assert orjson.loads(NegotiatedResponse(values).body) == expected
+
+    token = _response_format.set(MSGPACK)
+    try:
+        packed = NegotiatedResponse(values).body
+    finally:
+        _response_format.reset(token)
+    assert msgpack.unpackb(packed) == expected
+
+async def test_msgpack_round_trip(async_client, auth_headers):
+    """Test sending and receiving msgpack bodies."""
+    headers = {
+        **auth_headers,
+        "Content-Type": "application/msgpack",
+        "Accept": "application/msgpack"
+    }
+    response = await async_client.post(
+        "/v1/notes",
+        headers=headers,
+        content=msgpack.packb({"title": "Packed", "body": "Binary", "tags": ["wire"]})
+    )
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "application/msgpack"
+    created = msgpack.unpackb(response.content)
+    assert created["title"] == "Packed"
+    assert created["tags"] == ["wire"]
+
+    response = await async_client.get("/v1/notes?tag=wire", headers=headers)
+    assert response.headers["vary"] == "Accept"
+    listed = msgpack.unpackb(response.content)
+    assert listed == [created]
+
+async def test_json_matches_msgpack(async_client, auth_headers):
+    """Test that the fast list path returns the same data in both formats."""
+    await async_client.post("/v1/notes", headers=auth_headers, json={"title": "Both", "tags": ["same"]})
+
+    as_json = await async_client.get("/v1/notes?tag=same", headers=auth_headers)
+    as_msgpack = await async_client.get(
+        "/v1/notes?tag=same",
+        headers={**auth_headers, "Accept": "application/msgpack"}
+    )
+    assert as_json.headers["content-type"] == "application/json"
+    assert as_json.json() == msgpack.unpackb(as_msgpack.content)
+    assert set(as_json.json()[0]) == {"id", "title", "body", "tags", "created_at", "updated_at"}
+
+async def test_invalid_msgpack_body(async_client, auth_headers):
+    """Test that an undecodable msgpack body is rejected."""
+    response = await async_client.post(
+        "/v1/notes",
+        headers={**auth_headers, "Content-Type": "application/msgpack"},
+        content=b"\xc1"
+    )
+    assert response.status_code == 400
@@ -0,0 +1,183 @@
+"""
+Tests for sharding per-user data across several databases.
+"""
+import asyncio
+import sqlite3
+import uuid
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.api.v1 import auth, notes
+from app.db import sharding
+from app.db.sharding import HashRing, ShardRouter, shard_stats
+from app.models.note import Note
+from app.notes import links, tags
+from app.security.admission import rate_limit_budget
+
+@pytest.fixture
+async def router(tmp_path, test_engine, monkeypatch):
+    """Route notes to three SQLite files, with the test database as directory."""
+    router = ShardRouter(
+        [f"sqlite+aiosqlite:///{tmp_path / f'shard{index}.db'}" for index in range(3)],
+        directory=sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False),
+        directory_ttl=0
+    )
+    await run_in_threadpool(router.migrate)
+    for module in (sharding, auth, notes, tags, links):
+        monkeypatch.setattr(module, "shard_router", router)
+    yield router
+    await router.dispose()
+
+def count_rows(router, shard, table, owner_id):
+    path = router.shards[shard].url.split("///", 1)[1]
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT count(*) FROM {table} WHERE owner_id = ?", (owner_id,)).fetchone()[0]
+
+async def register(client):
+    rate_limit_budget.reset()  # Logins are expensive; several users would exhaust the budget
+    credentials = {"email": f"user-{uuid.uuid4().hex[:12]}@example.com", "password": "Test123!@#"}
+    user = (await client.post("/v1/auth/register", json=credentials)).json()
+    response = await client.post("/v1/auth/login", json=credentials)
+    return user["id"], {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def create_note(client, headers, title, tags=(), body=""):
+    response = await client.post(
+        "/v1/notes", json={"title": title, "body": body, "tags": list(tags)}, headers=headers
+    )
+    assert response.status_code == 201
+    return response.json()
+
+def test_hash_ring_moves_few_keys():
+    """Test that the ring spreads users evenly and a new shard only takes keys."""
+    ring = HashRing(["shard0", "shard1", "shard2"])
+    before = {key: ring.node_for(key) for key in range(6000)}
+    shares = [list(before.values()).count(node) / len(before) for node in ("shard0", "shard1", "shard2")]
+    assert min(shares) > 0.2
+
+    grown = HashRing(["shard0", "shard1", "shard2", "shard3"])
+    moved = [key for key in before if grown.node_for(key) != before[key]]
+    assert all(grown.node_for(key) == "shard3" for key in moved)
+    assert len(moved) < len(before) / 2
+
+async def test_notes_live_on_their_users_shard(router, async_client):
+    """Test that each user's notes are written to and read from their shard."""
+    users = [await register(async_client) for _ in range(6)]
+    ids = set()
+    for user_id, headers in users:
+        note = await create_note(async_client, headers, f"Note of {user_id}", ["shared"])
+        ids.add(note["id"])
+
+        shard, locked = await router.locate(user_id)
+        assert not locked
+        assert count_rows(router, shard, "notes", user_id) == 1
+        response = await async_client.get("/v1/notes", headers=headers)
+        assert [item["title"] for item in response.json()] == [f"Note of {user_id}"]
+
+    # Ids are unique across shards
+    assert len(ids) == len(users)
+    assert len({(await router.locate(user_id))[0] for user_id, _ in users}) > 1
+
+async def test_move_user_keeps_notes(router, async_client):
+    """Test that a moved user sees the same notes, ids, tags and links."""
+    user_id, headers = await register(async_client)
+    target = await create_note(async_client, headers, "Target", ["work"])
+    source = await create_note(async_client, headers, "Source", ["work", "ideas"], body="See [[Target]]")
+    before = (await async_client.get("/v1/notes", headers=headers)).json()
+
+    old_shard, _ = await router.locate(user_id)
+    new_shard = next(name for name in router.shards if name != old_shard)
+    await router.move_user(user_id, new_shard)
+
+    assert await router.locate(user_id) == (new_shard, False)
+    assert count_rows(router, old_shard, "notes", user_id) == 0
+    assert count_rows(router, new_shard, "notes", user_id) == 2
+    assert (await async_client.get("/v1/notes", headers=headers)).json() == before
+    response = await async_client.get("/v1/notes/tags", headers=headers)
+    assert response.json() == [{"name": "work", "count": 2}, {"name": "ideas", "count": 1}]
+    response = await async_client.get(f"/v1/notes/{target['id']}/backlinks", headers=headers)
+    assert [note["id"] for note in response.json()] == [source["id"]]
+
+    # Writes keep working on the new shard
+    await create_note(async_client, headers, "After the move", ["work"])
+    assert count_rows(router, new_shard, "notes", user_id) == 3
+
+async def test_writes_refused_while_moving(router, async_client):
+    """Test that a user being moved can read but not write."""
+    user_id, headers = await register(async_client)
+    await create_note(async_client, headers, "Before")
+    shard, _ = await router.locate(user_id)
+    await router._set_entry(user_id, shard, locked=True)
+
+    response = await async_client.post("/v1/notes", json={"title": "During"}, headers=headers)
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    response = await async_client.get("/v1/notes", headers=headers)
+    assert [note["title"] for note in response.json()] == ["Before"]
+
+    await router._set_entry(user_id, shard, locked=False)
+    await create_note(async_client, headers, "After")
+
+async def test_move_waits_for_writes_in_flight(router, async_client, monkeypatch):
+    """Test that a write which got its session before the lock is moved, not lost."""
+    monkeypatch.setattr(sharding, "MOVE_DRAIN_INTERVAL", 0.01)
+    user_id, headers = await register(async_client)
+    await create_note(async_client, headers, "Before")
+    old_shard, _ = await router.locate(user_id)
+    new_shard = next(name for name in router.shards if name != old_shard)
+
+    # A write request holding its session on the old shard
+    writes = sharding.get_shard_db({"sub": str(user_id)}, None)
+    session = await writes.__anext__()
+    move = asyncio.create_task(router.move_user(user_id, new_shard))
+    await asyncio.sleep(0.1)
+    assert not move.done()
+    assert (await async_client.post("/v1/notes", json={"title": "Refused"}, headers=headers)).status_code == 503
+
+    note_id = await router.next_id("notes")
+    session.add(Note(id=note_id, owner_id=user_id, title="In flight", body=""))
+    await session.commit()
+    await writes.aclose()
+    await move
+
+    assert count_rows(router, new_shard, "notes", user_id) == 2
+    response = await async_client.get("/v1/notes", headers=headers)
+    assert {note["title"] for note in response.json()} == {"Before", "In flight"}
+
+async def test_stats_query_every_shard(router, async_client):
+    """Test that admin queries fan out to every shard."""
+    for _ in range(4):
+        _, headers = await register(async_client)
+        await create_note(async_client, headers, "Note")
+
+    stats = await shard_stats(router)
+    assert set(stats) == {"shard0", "shard1", "shard2"}
+    assert sum(counts["notes"] for counts in stats.values()) == 4
+    assert sum(counts["users"] for counts in stats.values()) == 4
+
+async def test_link_reindex_covers_every_shard(router, async_client):
+    """Test that the link reindex visits the notes on every shard."""
+    for _ in range(4):
+        _, headers = await register(async_client)
+        await create_note(async_client, headers, "Target")
+        await create_note(async_client, headers, "Source", body="See [[Target]]")
+
+    assert await links.link_index.reindex(chunk_size=1) == 8
+
+async def test_failed_placement_is_finished_on_first_write(router, async_client, monkeypatch):
+    """Test that a user whose placement failed at registration can still write notes."""
+    async def unavailable(user_id, email):
+        raise ConnectionError("shard unavailable")
+
+    place_user = router.place_user
+    monkeypatch.setattr(router, "place_user", unavailable)
+    user_id, headers = await register(async_client)
+    assert user_id not in router._placed
+    monkeypatch.setattr(router, "place_user", place_user)
+
+    await create_note(async_client, headers, "First")
+    shard, _ = await router.locate(user_id, fresh=True)
+    assert count_rows(router, shard, "notes", user_id) == 1
+
+    # Placing again is harmless
+    assert await router.place_user(user_id, "again@example.com") == shard
@@ -0,0 +1,174 @@
+"""
+Tests for the related-notes similarity engine.
+"""
+import asyncio
+import threading
+import time
+import pytest
+from starlette.concurrency import run_in_threadpool
+from app.notes import similarity
+from app.notes.similarity import UserIndex, featurize, similarity_index
+
+NOTES = [
+    (1, "Sourdough bread recipe with starter, flour and long fermentation"),
+    (2, "Bread baking: shaping sourdough loaves and scoring the crust"),
+    (3, "Quarterly budget review for the marketing team"),
+    (4, "Marketing budget planning and team quarterly goals"),
+]
+
+@pytest.fixture
+def index_root(tmp_path, monkeypatch):
+    """Keep indexes in a temporary directory."""
+    monkeypatch.setattr(similarity_index, "root", tmp_path)
+    similarity_index._indexes.clear()
+    yield tmp_path
+    similarity_index._indexes.clear()
+
+def test_featurize_is_deterministic():
+    """Test that hashed features don't depend on the process hash seed."""
+    indices, tf = featurize("Notes about notes and the note taking app")
+    assert list(indices) == sorted(indices)
+    assert len(indices) == 5  # Stop words dropped, "notes" counted twice
+    assert tf.max() == pytest.approx(1.6931, rel=1e-3)
+
+def test_related_and_similar(tmp_path):
+    """Test that related notes rank by topic."""
+    index = UserIndex.build(tmp_path / "1", NOTES)
+    
+    related = index.related(1, k=3)
+    assert related[0][0] == 2
+    assert all(note_id != 1 for note_id, _ in related)
+    
+    assert index.similar("team budget", k=2)[0][0] in {3, 4}
+    assert index.similar("zzz unknown words") == []
+
+def test_incremental_updates_survive_restart(tmp_path):
+    """Test that logged changes are replayed on load without a rebuild."""
+    path = tmp_path / "1"
+    index = UserIndex.build(path, NOTES)
+    index.update(5, "Rye sourdough bread with a stiff starter")
+    index.update(3, "Holiday photos from the beach")
+    index.remove(4)
+    
+    reloaded = UserIndex(path)
+    assert reloaded.n_docs == 4
+    assert 5 in {note_id for note_id, _ in reloaded.related(1, k=3)}
+    assert reloaded.similar("marketing budget") == []
+    
+    # Compaction folds the log into a new memory-mapped base segment
+    reloaded.compact()
+    assert not (path / "base-1").exists()
+    assert sorted(int(doc_id) for doc_id in UserIndex(path).doc_ids) == [1, 2, 3, 5]
+
+def test_automatic_compaction(tmp_path, monkeypatch):
+    """Test that enough pending changes trigger a compaction."""
+    monkeypatch.setattr(similarity, "COMPACT_MIN_CHANGES", 2)
+    index = UserIndex.build(tmp_path / "1", NOTES)
+    for note_id in range(10, 13):
+        index.update(note_id, f"note number {note_id} about bread")
+    
+    assert index.delta == {}
+    assert len(index.doc_ids) == 7
+
+async def test_related_endpoint(async_client, auth_headers, index_root):
+    """Test related and free-text similarity endpoints."""
+    ids = []
+    for _, text in NOTES:
+        title, body = text.split(" ", 1)
+        response = await async_client.post(
+            "/v1/notes",
+            json={"title": title, "body": body},
+            headers=auth_headers
+        )
+        ids.append(response.json()["id"])
+    
+    response = await async_client.get(f"/v1/notes/{ids[0]}/related?limit=1", headers=auth_headers)
+    assert response.status_code == 200
+    assert [note["id"] for note in response.json()] == [ids[1]]
+    
+    # Writes after the index exists update it incrementally
+    response = await async_client.post(
+        "/v1/notes",
+        json={"title": "Budget", "body": "marketing team quarterly budget numbers"},
+        headers=auth_headers
+    )
+    new_id = response.json()["id"]
+    response = await async_client.get("/v1/notes/similar?q=marketing+budget&limit=3", headers=auth_headers)
+    assert new_id in [note["id"] for note in response.json()]
+
+async def test_concurrent_first_builds(index_root, monkeypatch):
+    """Test that concurrent first requests for a user build its index once."""
+    builds = []
+    build = UserIndex.build.__func__
+
+    def counting_build(cls, path, notes):
+        builds.append(path)
+        return build(cls, path, notes)
+
+    monkeypatch.setattr(UserIndex, "build", classmethod(counting_build))
+
+    class FakeResult:
+        def all(self):
+            return []
+
+    class FakeSession:
+        async def execute(self, query):
+            await asyncio.sleep(0.01)
+            return FakeResult()
+
+    indexes = await asyncio.gather(*(similarity_index.get(FakeSession(), 7) for _ in range(5)))
+    assert len(builds) == 1
+    assert all(index is indexes[0] for index in indexes)
+    assert [path.name for path in index_root.iterdir()] == ["7"]
+
+async def test_notes_written_during_first_build(index_root):
+    """Test that notes committed while a user's index is built end up in it."""
+    class FakeResult:
+        def all(self):
+            return []
+
+    class FakeSession:
+        async def execute(self, query):
+            # Committed after the build's snapshot was taken
+            await run_in_threadpool(similarity_index.update_note, 7, 99, "Late\nsourdough starter")
+            return FakeResult()
+
+    index = await similarity_index.get(FakeSession(), 7)
+    assert [note_id for note_id, _ in index.similar("sourdough")] == [99]
+    assert similarity_index._pending == {}
+
+def test_rebuild_replaces_existing_index(tmp_path):
+    """Test that building over an existing index swaps it in whole."""
+    path = tmp_path / "1"
+    UserIndex.build(path, NOTES)
+    index = UserIndex.build(path, NOTES[:2])
+    assert sorted(int(doc_id) for doc_id in index.doc_ids) == [1, 2]
+    assert [child.name for child in tmp_path.iterdir()] == ["1"]
+
+async def test_search_waits_off_the_event_loop(async_client, auth_headers, index_root):
+    """Test that a search blocked by a compaction doesn't stall other requests."""
+    await async_client.post("/v1/notes", json={"title": "Bread", "body": "sourdough"}, headers=auth_headers)
+    await async_client.get("/v1/notes/similar?q=bread", headers=auth_headers)
+    index = next(iter(similarity_index._indexes.values()))
+
+    locked, release = threading.Event(), threading.Event()
+
+    def compaction():
+        with index.lock:
+            locked.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=compaction)
+    thread.start()
+    locked.wait()
+    search = asyncio.create_task(async_client.get("/v1/notes/similar?q=bread", headers=auth_headers))
+    try:
+        # The loop keeps running while the search waits for the lock
+        start = time.monotonic()
+        await asyncio.sleep(0.1)
+        assert time.monotonic() - start < 1
+        assert not search.done()
+    finally:
+        release.set()
+        thread.join()
+    assert (await search).status_code == 200
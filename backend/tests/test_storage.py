@@ -0,0 +1,195 @@
+"""
+Tests for note body storage backends.
+"""
+import pytest
+from pathlib import Path
+from sqlalchemy import select
+from app.models.note import Note
+from app.notes.bodies import note_bodies
+from app.storage import LogStructuredBodyStore, MemoryBodyStore
+
+async def test_log_store_roundtrip(tmp_path):
+    """Test put, overwrite, delete and zero-copy reads."""
+    store = LogStructuredBodyStore(str(tmp_path))
+    await store.put("a", b"first")
+    await store.put("b", "ünïcode".encode())
+    await store.put("a", b"second")
+    await store.put("empty", b"")
+    
+    value = await store.get("a")
+    assert isinstance(value, memoryview)
+    assert bytes(value) == b"second"
+    assert str(await store.get("b"), "utf-8") == "ünïcode"
+    assert bytes(await store.get("empty")) == b""
+    
+    await store.delete("b")
+    assert await store.get("b") is None
+    assert await store.get("missing") is None
+    await store.close()
+
+async def test_log_store_reopen(tmp_path):
+    """Test that the index is rebuilt from hint files and the active segment."""
+    store = LogStructuredBodyStore(str(tmp_path), segment_size=64)
+    for i in range(20):
+        await store.put(f"key-{i % 5}", f"value-{i}".encode())
+    await store.delete("key-0")
+    await store.close()
+    assert list(tmp_path.glob("*.hint"))
+    
+    store = LogStructuredBodyStore(str(tmp_path), segment_size=64)
+    assert await store.get("key-0") is None
+    assert {key: bytes(value) for key, value in (await store.get_many(
+        [f"key-{i}" for i in range(1, 5)]
+    )).items()} == {f"key-{i}": f"value-{15 + i}".encode() for i in range(1, 5)}
+    await store.close()
+
+async def test_log_store_truncates_torn_tail(tmp_path):
+    """Test recovery from a partially written last record."""
+    store = LogStructuredBodyStore(str(tmp_path))
+    await store.put("a", b"kept")
+    await store.put("b", b"torn")
+    await store.close()
+    
+    segment = next(tmp_path.glob("segment-*.log"))
+    segment.write_bytes(segment.read_bytes()[:-2])
+    
+    store = LogStructuredBodyStore(str(tmp_path))
+    assert bytes(await store.get("a")) == b"kept"
+    assert await store.get("b") is None
+    await store.put("c", b"after")
+    await store.close()
+    
+    store = LogStructuredBodyStore(str(tmp_path))
+    assert bytes(await store.get("c")) == b"after"
+    await store.close()
+
+async def test_log_store_compaction(tmp_path):
+    """Test that compaction reclaims overwritten values and survives a restart."""
+    store = LogStructuredBodyStore(str(tmp_path), segment_size=256)
+    for round_ in range(10):
+        for i in range(4):
+            await store.put(f"key-{i}", f"{round_}-{i}".encode() * 4)
+    old_view = await store.get("key-0")
+    before = sum(path.stat().st_size for path in tmp_path.glob("segment-*.log"))
+    
+    store.compact()
+    after = sum(path.stat().st_size for path in tmp_path.glob("segment-*.log"))
+    assert after < before / 2
+    assert store.garbage_ratio() == 0
+    assert bytes(old_view) == b"9-0" * 4  # Views taken before compaction stay valid
+    await store.close()
+    
+    store = LogStructuredBodyStore(str(tmp_path), segment_size=256)
+    for i in range(4):
+        assert bytes(await store.get(f"key-{i}")) == f"9-{i}".encode() * 4
+    await store.close()
+
+@pytest.mark.parametrize("unlinked", [0, 1, 3])
+async def test_log_store_compaction_crash(tmp_path, monkeypatch, unlinked):
+    """Test that a crash part way through compaction loses no write and revives no delete."""
+    store = LogStructuredBodyStore(str(tmp_path), segment_size=64)
+    await store.put("gone", b"deleted later" * 4)
+    for i in range(12):
+        await store.put(f"key-{i % 3}", f"value-{i}".encode() * 4)
+    await store.put("key-0", b"newest")
+    await store.delete("gone")
+    await store.put("pad", b"x" * 40)  # Closes the segment holding the tombstone
+
+    removed = []
+    unlink = Path.unlink
+    def crashing_unlink(path, missing_ok=False):
+        if path.suffix == ".log":
+            if len(removed) == unlinked:
+                raise OSError("crashed")
+            removed.append(path)
+        unlink(path, missing_ok=missing_ok)
+
+    monkeypatch.setattr(Path, "unlink", crashing_unlink)
+    with pytest.raises(OSError):
+        store.compact()
+    monkeypatch.undo()
+
+    store = LogStructuredBodyStore(str(tmp_path), segment_size=64)
+    assert await store.get("gone") is None
+    assert bytes(await store.get("key-0")) == b"newest"
+    assert bytes(await store.get("key-2")) == b"value-11" * 4
+    await store.close()
+
+async def test_log_store_ignores_stale_hints(tmp_path):
+    """Test that hints not matching their segment fall back to scanning it."""
+    store = LogStructuredBodyStore(str(tmp_path), segment_size=64)
+    for i in range(10):
+        await store.put(f"key-{i}", f"value-{i}".encode() * 8)
+    await store.close()
+
+    hints = sorted(tmp_path.glob("*.hint"))
+    hints[0].write_bytes(hints[-1].read_bytes())
+    hints[1].write_bytes(hints[1].read_bytes()[:-3])
+
+    store = LogStructuredBodyStore(str(tmp_path), segment_size=64)
+    for i in range(10):
+        assert bytes(await store.get(f"key-{i}")) == f"value-{i}".encode() * 8
+    await store.close()
+
+async def test_bodies_in_store(async_client, auth_headers, test_session, monkeypatch):
+    """Test that note bodies go to the body store instead of the notes table."""
+    monkeypatch.setattr(note_bodies, "store", MemoryBodyStore())
+    
+    response = await async_client.post(
+        "/v1/notes",
+        json={"title": "Stored", "body": "Large body linking [[Other]]"},
+        headers=auth_headers
+    )
+    note_id = response.json()["id"]
+    assert response.json()["body"] == "Large body linking [[Other]]"
+    
+    result = await test_session.execute(select(Note.body).where(Note.id == note_id))
+    assert result.scalar_one() == ""
+    assert bytes(note_bodies.store.values[f"note:{note_id}"]) == b"Large body linking [[Other]]"
+    
+    response = await async_client.get(f"/v1/notes/{note_id}", headers=auth_headers)
+    assert response.json()["body"] == "Large body linking [[Other]]"
+    
+    other = await async_client.post("/v1/notes", json={"title": "Other"}, headers=auth_headers)
+    response = await async_client.get(f"/v1/notes/{other.json()['id']}/backlinks", headers=auth_headers)
+    assert [note["id"] for note in response.json()] == [note_id]
+    
+    await async_client.delete(f"/v1/notes/{note_id}", headers=auth_headers)
+    assert f"note:{note_id}" not in note_bodies.store.values
+
+async def test_failed_commit_stores_no_body(async_client, auth_headers, test_session, monkeypatch):
+    """Test that a note whose commit fails leaves no body in the store."""
+    monkeypatch.setattr(note_bodies, "store", MemoryBodyStore())
+
+    async def failing_commit():
+        raise ConnectionError("database went away")
+
+    monkeypatch.setattr(test_session, "commit", failing_commit)
+    with pytest.raises(ConnectionError):
+        await async_client.post(
+            "/v1/notes", json={"title": "Lost", "body": "Never committed"}, headers=auth_headers
+        )
+    assert note_bodies.store.values == {}
+
+async def test_failed_store_write_keeps_body(async_client, auth_headers, monkeypatch):
+    """Test that a body the store refused leaves the note's committed body readable."""
+    response = await async_client.post(
+        "/v1/notes", json={"title": "Legacy", "body": "In the column"}, headers=auth_headers
+    )
+    note_id = response.json()["id"]
+
+    store = MemoryBodyStore()
+    monkeypatch.setattr(note_bodies, "store", store)
+
+    async def failing_put(key, value):
+        raise ConnectionError("store unavailable")
+
+    monkeypatch.setattr(store, "put", failing_put)
+    with pytest.raises(ConnectionError):
+        await async_client.patch(
+            f"/v1/notes/{note_id}", json={"title": "Edited", "body": "Lost"}, headers=auth_headers
+        )
+
+    response = await async_client.get(f"/v1/notes/{note_id}", headers=auth_headers)
+    assert response.json()["title"] == "Legacy"
+    assert response.json()["body"] == "In the column"